@@ -508,6 +508,10 @@ if __name__ == "__main__":
     # .save_state() the values hold inside the local individuals can be
     # changed, as they now hold the same values as the live state on Fiware
 
+    # The semantic_manager keeps one pool of clients for each Fiware location
+    # and reuses them for all requests. The connections are closed with
+    # semantic_manager.close() or by using the manager as context manager
+
     # ## 4.3 Deleting instances
     #
     # to delete an instance, we can simply call:
@@ -8,6 +8,7 @@ from typing import Dict, ByteString, List, IO, Tuple, Union
 import requests
 from filip.models.base import FiwareHeader, FiwareLDHeader
 from filip.utils import validate_http_url
+from filip.utils.serializer import dumpb, loads
 from enum import Enum
 
 
@@ -200,10 +201,15 @@ class BaseHttpClient:
             merged_kwargs["params"] = params
         if data is not None:
             merged_kwargs["data"] = data
-        if json is not None:
-            merged_kwargs["json"] = json
 
         merged_kwargs = self._inject_fiware_headers(merged_kwargs)
+        if json is not None and data is None:
+            # serialize with the json backend of FiLiP instead of requests
+            merged_kwargs["data"] = dumpb(json)
+            if not any(
+                key.lower() == "content-type" for key in merged_kwargs["headers"]
+            ):
+                merged_kwargs["headers"]["Content-Type"] = "application/json"
 
         if self.session:
             return self.session.request(method=method, url=url, **merged_kwargs)
@@ -349,6 +355,26 @@ class BaseHttpClient:
         """
         return self.request(method="DELETE", url=url, **kwargs)
 
+    @staticmethod
+    def parse_json(response: requests.Response):
+        """
+        Deserializes the json body of a response with the json backend of
+        FiLiP (see `filip.utils.serializer`).
+
+        Args:
+            response: Response of a request
+
+        Returns:
+            Deserialized body
+
+        Raises:
+            requests.JSONDecodeError: if the body is not valid json
+        """
+        try:
+            return loads(response.content)
+        except ValueError as err:
+            raise requests.JSONDecodeError(str(err), response.text, 0) from err
+
     def log_error(self, err: requests.RequestException, msg: str = None) -> None:
         """
         Outputs the error messages from the client request function. If
@@ -3,3 +3,4 @@ MQTT client for streaming data via FIWARE's IoT-Agent
 """
 
 from .client import IoTAMQTTClient
+from .async_client import AsyncIoTAMQTTClient
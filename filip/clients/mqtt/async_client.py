@@ -0,0 +1,568 @@
+"""
+Asyncio variant of the MQTT client for FIWARE's IoT-Agent
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Tuple, Union
+import paho.mqtt.client as mqtt
+from filip.clients.mqtt.client import IoTAMQTTClient
+from filip.clients.mqtt.encoder import BaseEncoder
+from filip.models.mqtt import PublishStats
+from filip.models.ngsi_v2.iot import Device, PayloadProtocol, ServiceGroup
+
+
+class Command(NamedTuple):
+    """
+    Command received from the IoT-Agent
+    """
+
+    apikey: str
+    device_id: str
+    payload: Any
+
+
+class AsyncIoTAMQTTClient:
+    """
+    Asyncio variant of the `IoTAMQTTClient`. The network traffic of the
+    paho client is driven by the running event loop instead of a network
+    thread. Hence, all callbacks are executed in the event loop and publishes
+    can be awaited.
+
+    Device and service group registry, encoders and topics are the same as
+    for the `IoTAMQTTClient`, which is available as `client`.
+
+    Example::
+
+        mqttc = AsyncIoTAMQTTClient(devices=[device],
+                                    service_groups=[service_group])
+        await mqttc.connect(host="localhost", port=1883)
+
+        # publish a multi-measurement and wait for the broker
+        await mqttc.publish(device_id='MyDevice', payload={'t': 50}, qos=1)
+
+        # consume commands and acknowledge them
+        async for command in mqttc.commands():
+            await mqttc.publish(device_id=command.device_id,
+                                command_name=next(iter(command.payload)),
+                                payload=command.payload)
+
+        await mqttc.disconnect()
+
+    Args:
+        client_id: Unique client id string used when connecting to the broker
+        clean_session: See `IoTAMQTTClient`
+        userdata: See `IoTAMQTTClient`
+        protocol: MQTT protocol version
+        transport: 'tcp' or 'websockets'
+        devices: Device configurations registered with the client
+        service_groups: Service group configurations registered with the
+            client
+        custom_encoder: Custom encoders for additional payload protocols
+        command_queue_size: Maximum number of received commands that were
+            not consumed yet. 0 means unbounded. If the queue is full, new
+            commands are dropped.
+    """
+
+    def __init__(
+        self,
+        client_id="",
+        clean_session=None,
+        userdata=None,
+        protocol=mqtt.MQTTv311,
+        transport="tcp",
+        devices: List[Device] = None,
+        service_groups: List[ServiceGroup] = None,
+        custom_encoder: Dict[str, BaseEncoder] = None,
+        command_queue_size: int = 0,
+    ):
+        self.logger = logging.getLogger(name=f"{self.__class__.__name__}")
+        self.logger.addHandler(logging.NullHandler())
+
+        self.client = IoTAMQTTClient(
+            client_id=client_id,
+            clean_session=clean_session,
+            userdata=userdata,
+            protocol=protocol,
+            transport=transport,
+            service_groups=service_groups,
+            custom_encoder=custom_encoder,
+        )
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_publish = self._on_publish
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+
+        self._loop: asyncio.AbstractEventLoop = None
+        self._misc_task: asyncio.Task = None
+        self._connected: asyncio.Future = None
+        self._disconnected: asyncio.Future = None
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self.command_queue_size = command_queue_size
+        self._commands = asyncio.Queue()
+
+        for device in devices or []:
+            self.add_device(device=device)
+
+    # registry of the synchronous client
+    @property
+    def devices(self) -> List[Device]:
+        """
+        Returns as list of all registered device configurations
+        """
+        return self.client.devices
+
+    @property
+    def service_groups(self) -> Dict[str, ServiceGroup]:
+        """
+        Returns the registered service group configurations
+        """
+        return self.client.service_groups
+
+    def get_device(self, device_id: str) -> Device:
+        """
+        Returns the configuration of a registered device
+
+        Args:
+            device_id: Id of the requested device
+
+        Returns:
+            Device: The requested device configuration
+
+        Raises:
+            KeyError: if requested device is not registered with the client
+        """
+        return self.client.get_device(device_id=device_id)
+
+    def add_device(self, device: Union[Device, Dict]) -> None:
+        """
+        Registers a device configuration. Its commands are delivered via
+        `commands()`.
+
+        Args:
+            device: Configuration of an IoT device
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: if device configuration already exists
+        """
+        self.client.add_device(device=device)
+        self._route_commands(device=device)
+
+    def update_device(self, device: Union[Device, Dict]) -> None:
+        """
+        Updates a registered device configuration
+
+        Args:
+            device: Configuration of an IoT device
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: if device not yet registered
+        """
+        self.client.update_device(device=device)
+        self._route_commands(device=device)
+
+    def delete_device(self, device_id: str) -> None:
+        """
+        Unregisters a device
+
+        Args:
+            device_id: id of and IoT device
+
+        Returns:
+            None
+        """
+        self.client.delete_device(device_id=device_id)
+
+    def get_service_group(self, apikey: str) -> ServiceGroup:
+        """
+        Returns registered service group configuration
+
+        Args:
+            apikey: Unique APIKey of the service group
+
+        Returns:
+            ServiceGroup
+        """
+        return self.client.get_service_group(apikey=apikey)
+
+    def add_service_group(self, service_group: Union[ServiceGroup, Dict]) -> None:
+        """
+        Registers a service group configuration
+
+        Args:
+            service_group: Service group configuration
+
+        Returns:
+            None
+        """
+        self.client.add_service_group(service_group=service_group)
+
+    def update_service_group(self, service_group: Union[ServiceGroup, Dict]) -> None:
+        """
+        Updates a registered service group configuration
+
+        Args:
+            service_group: Service group configuration
+
+        Returns:
+            None
+        """
+        self.client.update_service_group(service_group=service_group)
+
+    def delete_service_group(self, apikey: str) -> None:
+        """
+        Unregisters a service group
+
+        Args:
+            apikey: Unique APIKey of the service group
+
+        Returns:
+            None
+        """
+        self.client.delete_service_group(apikey=apikey)
+
+    def get_encoder(self, encoder: Union[str, PayloadProtocol]) -> BaseEncoder:
+        """
+        Returns the encoder by key
+
+        Args:
+            encoder: encoder name
+
+        Returns:
+            Subclass of BaseEncoder
+        """
+        return self.client.get_encoder(encoder=encoder)
+
+    def add_encoder(self, encoder: Dict[str, BaseEncoder]) -> None:
+        """
+        Registers additional encoders
+
+        Args:
+            encoder: Encoders by payload protocol
+
+        Returns:
+            None
+        """
+        self.client.add_encoder(encoder=encoder)
+
+    def _route_commands(self, device: Union[Device, Dict]) -> None:
+        """
+        Routes the commands of a registered device into the command queue
+        """
+        if isinstance(device, dict):
+            device = Device.model_validate(device)
+        device_id = device.device_id
+        if not device.commands:
+            return
+        route = self.client.command_dispatcher.get_route(device.apikey, device_id)
+        if route is None:
+            self.client.add_command_handler(
+                device_id=device_id, handler=self._on_command
+            )
+
+    # connection handling
+    async def connect(
+        self, host: str, port: int = 1883, keepalive: int = 60, **kwargs
+    ) -> None:
+        """
+        Connects to a broker and subscribes to the command topics of all
+        registered devices.
+
+        Note:
+            Establishing the TCP connection itself is blocking, all further
+            communication is driven by the event loop.
+
+        Args:
+            host: Hostname or IP address of the broker
+            port: Network port of the broker
+            keepalive: Maximum period in seconds between communications
+            **kwargs: Further arguments of paho's `connect()`
+
+        Returns:
+            None
+
+        Raises:
+            ConnectionError: if the broker refuses the connection
+        """
+        self._loop = asyncio.get_running_loop()
+        self._connected = self._loop.create_future()
+        self._disconnected = self._loop.create_future()
+        self._commands = asyncio.Queue()
+        self.client.connect(host=host, port=port, keepalive=keepalive, **kwargs)
+        await self._connected
+        self.client.subscribe()
+
+    async def disconnect(self) -> None:
+        """
+        Disconnects from the broker. Iterators over `commands()` end.
+
+        Returns:
+            None
+        """
+        if self._disconnected is None or self._disconnected.done():
+            return
+        self.client.disconnect()
+        await self._disconnected
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if self._connected.done():
+            return
+        if reason_code.is_failure:
+            self._connected.set_exception(
+                ConnectionError(f"Connection refused: {reason_code}")
+            )
+        else:
+            self._connected.set_result(None)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self.logger.info("Disconnected: %s", reason_code)
+        error = RuntimeError(f"Disconnected before confirmation: {reason_code}")
+        for future in self._inflight.values():
+            if not future.done():
+                future.set_exception(error)
+        self._inflight.clear()
+        if not self._connected.done():
+            self._connected.set_exception(ConnectionError(str(reason_code)))
+        if not self._disconnected.done():
+            self._disconnected.set_result(None)
+        self._commands.put_nowait(None)
+
+    def _on_socket_open(self, client, userdata, sock):
+        self._loop.add_reader(sock, client.loop_read)
+        self._misc_task = self._loop.create_task(self._misc_loop())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._loop.remove_reader(sock)
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._loop.remove_writer(sock)
+
+    async def _misc_loop(self) -> None:
+        """
+        Handles keep alive and retries of the paho client
+        """
+        while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(1)
+
+    # publishing
+    def _on_publish(self, client, userdata, mid, reason_code, properties):
+        future = self._inflight.pop(mid, None)
+        if future is None or future.done():
+            return
+        if reason_code.is_failure:
+            future.set_exception(RuntimeError(f"Publish failed: {reason_code}"))
+        else:
+            future.set_result(None)
+
+    async def _publish(
+        self,
+        topic: str,
+        payload: Any,
+        qos: int,
+        retain: bool,
+        properties,
+        timeout: float,
+    ) -> None:
+        """
+        Publishes an encoded message and waits for its confirmation
+        """
+        info = mqtt.Client.publish(
+            self.client,
+            topic=topic,
+            payload=payload,
+            qos=qos,
+            retain=retain,
+            properties=properties,
+        )
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            raise RuntimeError(mqtt.error_string(info.rc))
+        if info.is_published():
+            return
+        future = self._loop.create_future()
+        self._inflight[info.mid] = future
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._inflight.pop(info.mid, None)
+
+    async def publish(
+        self,
+        topic: str = None,
+        payload: Union[Dict, Any] = None,
+        qos: int = 0,
+        retain: bool = False,
+        properties=None,
+        device_id: str = None,
+        attribute_name: str = None,
+        command_name: str = None,
+        timestamp: bool = False,
+        timeout: float = None,
+    ) -> None:
+        """
+        Publishes a message and waits until the broker acknowledged it
+        (QoS 1 and 2) or it was written to the socket (QoS 0). See
+        `IoTAMQTTClient.publish` for the meaning of the arguments.
+
+        Args:
+            topic: The topic that the message should be published on.
+            payload: The actual message to send.
+            qos: The quality of service level to use.
+            retain: If set to true, the message will be retained.
+            properties: (MQTT v5.0 only) the MQTT v5.0 properties
+            device_id: Id of the IoT device you want to publish for.
+            attribute_name: Name of an attribute for single measurements
+            command_name: Name of a command that should be acknowledged
+            timestamp: If `true` a timestamp is added to multi measurements
+            timeout: Maximal time in seconds to wait for the confirmation
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: if device configuration is not registered with client
+            RuntimeError: if the client is not connected or the message was
+                rejected
+            asyncio.TimeoutError: if the message was not confirmed in time
+        """
+        if device_id:
+            topic, payload = self.client.encode_message(
+                device_id=device_id,
+                payload=payload,
+                attribute_name=attribute_name,
+                command_name=command_name,
+                timestamp=timestamp,
+            )
+        await self._publish(
+            topic=topic,
+            payload=payload,
+            qos=qos,
+            retain=retain,
+            properties=properties,
+            timeout=timeout,
+        )
+
+    async def publish_many(
+        self,
+        messages: Iterable[Tuple[str, Dict]],
+        qos: int = 0,
+        retain: bool = False,
+        properties=None,
+        timestamp: bool = False,
+        max_inflight: int = 20,
+        timeout: float = None,
+    ) -> PublishStats:
+        """
+        Publishes multi measurements for many registered devices. All
+        messages are encoded first, hence an invalid message raises before
+        anything is sent. At most `max_inflight` messages are unconfirmed at
+        any time, further messages wait until a slot becomes free.
+
+        Args:
+            messages: Pairs of device ids and multi measurement payloads
+            qos: The quality of service level to use.
+            retain: If set to true, the messages will be retained.
+            properties: (MQTT v5.0 only) the MQTT v5.0 properties
+            timestamp: If `true` the client will add a timestamp to payloads
+                that do not contain a `timeInstant` yet.
+            max_inflight: Size of the in-flight window
+            timeout: Maximal time in seconds to wait for the confirmation of
+                a single message.
+
+        Returns:
+            Aggregated delivery statistics and latency percentiles
+
+        Raises:
+            KeyError: if a device is not registered with the client or a
+                payload key does not match its device configuration
+        """
+        encoded = [
+            self.client.encode_message(
+                device_id=device_id, payload=payload, timestamp=timestamp
+            )
+            for device_id, payload in messages
+        ]
+        stats = PublishStats(messages=len(encoded))
+        latencies = []
+
+        async def send(topic: str, payload: Any) -> None:
+            start = time.perf_counter()
+            try:
+                await self._publish(
+                    topic=topic,
+                    payload=payload,
+                    qos=qos,
+                    retain=retain,
+                    properties=properties,
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                stats.timed_out += 1
+            except RuntimeError as err:
+                self.logger.debug("Message failed: %s", err)
+                stats.failed += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+                stats.published += 1
+
+        pending = set()
+        start_time = time.perf_counter()
+        for topic, payload in encoded:
+            if len(pending) >= max_inflight:
+                _, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+            pending.add(asyncio.ensure_future(send(topic, payload)))
+        if pending:
+            await asyncio.wait(pending)
+        stats.duration = time.perf_counter() - start_time
+        stats.set_latencies(latencies)
+        self.logger.info(
+            "Published %s of %s messages in %.3f s",
+            stats.published,
+            stats.messages,
+            stats.duration,
+        )
+        return stats
+
+    # commands
+    def _on_command(self, client, apikey: str, device_id: str, payload: Any):
+        # the size is limited here, so that the end marker always fits
+        if 0 < self.command_queue_size <= self._commands.qsize():
+            self.logger.warning(
+                "Command queue is full, dropped command for '%s'", device_id
+            )
+            return
+        self._commands.put_nowait(Command(apikey, device_id, payload))
+
+    async def commands(self) -> AsyncIterator[Command]:
+        """
+        Iterates over the received commands of all registered devices. The
+        iteration ends when the client disconnects.
+
+        Returns:
+            Asynchronous iterator over the received commands
+        """
+        queue = self._commands
+        while True:
+            command = await queue.get()
+            if command is None:
+                # let other consumers end as well
+                queue.put_nowait(None)
+                return
+            yield command
@@ -5,14 +5,19 @@ topic subscription for FIWARE's IoT communication pattern.
 
 import itertools
 import logging
+import threading
+import time
 import warnings
+from collections import deque
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
 
 import paho.mqtt.client as mqtt
 
+from filip.clients.mqtt.dispatcher import CommandDispatcher
 from filip.clients.mqtt.encoder import BaseEncoder, Json, Ultralight
-from filip.models.mqtt import IoTAMQTTMessageType
+from filip.clients.mqtt.publish_plan import PublishPlan
+from filip.models.mqtt import IoTAMQTTMessageType, PublishStats
 from filip.models.ngsi_v2.iot import (
     Device,
     PayloadProtocol,
@@ -134,6 +139,7 @@ class IoTAMQTTClient(mqtt.Client):
         devices: List[Device] = None,
         service_groups: List[ServiceGroup] = None,
         custom_encoder: Dict[str, BaseEncoder] = None,
+        command_workers: int = 0,
     ):
         """
         Args:
@@ -188,6 +194,10 @@ class IoTAMQTTClient(mqtt.Client):
                 Custom encoder class that will automatically parse the supported
                 payload formats to a dictionary and vice versa. This
                 essentially saves boiler plate code.
+            command_workers:
+                Number of worker threads that handle incoming commands. If
+                0, command callbacks are executed in the network loop. See
+                `CommandDispatcher` for details.
         """
         # initialize parent client
         super().__init__(
@@ -211,15 +221,25 @@ class IoTAMQTTClient(mqtt.Client):
         else:
             self.service_groups = {}
 
+        # create dict with available encoders
+        self._encoders = {"IoTA-JSON": Json(), "PDI-IoTA-UltraLight": Ultralight()}
+
+        # create dictionary holding the compiled publish plans of the
+        # registered devices. Plans are compiled on first use.
+        self._publish_plans: Dict[str, PublishPlan] = {}
+
+        # a single message callback routes the commands of all devices
+        self._command_dispatcher = CommandDispatcher(workers=command_workers)
+        self.message_callback_add(
+            CommandDispatcher.topic_filter, self._command_dispatcher.on_message
+        )
+
         # create dictionary holding the registered device configurations
         # check if all _devices have the right transport protocol
         self._devices: Dict[str, Device] = {}
         if devices:
             self.devices = devices
 
-        # create dict with available encoders
-        self._encoders = {"IoTA-JSON": Json(), "PDI-IoTA-UltraLight": Ultralight()}
-
         # add custom encoder for message parsing
         if custom_encoder:
             self.add_encoder(custom_encoder)
@@ -272,6 +292,61 @@ class IoTAMQTTClient(mqtt.Client):
             ), f"Encoder must be a subclass of {type(BaseEncoder)}"
 
         self._encoders.update(encoder)
+        # plans and command routes hold references to the encoders
+        self._publish_plans.clear()
+        for device in self._devices.values():
+            self.__rebind_command_route(device=device, apikey=device.apikey)
+
+    @property
+    def command_dispatcher(self) -> CommandDispatcher:
+        """
+        Dispatcher that routes incoming commands to the registered callbacks
+        """
+        return self._command_dispatcher
+
+    def __rebind_command_route(self, *, device: Device, apikey: str) -> None:
+        """
+        Registers the command route of a device again, e.g. after its apikey
+        or its protocol changed.
+
+        Args:
+            device: Current configuration of the device
+            apikey: Apikey the route is currently registered with
+
+        Returns:
+            None
+        """
+        route = self._command_dispatcher.unregister(apikey, device.device_id)
+        if route is None:
+            return
+        encoder = None
+        if route.encoder is not None:
+            encoder = self._encoders[device.protocol]
+        self._command_dispatcher.register(
+            device.apikey, device.device_id, route.callback, encoder
+        )
+
+    def get_publish_plan(self, device_id: str) -> PublishPlan:
+        """
+        Returns the compiled publish plan of a registered device. The plan
+        is compiled on first use and dropped whenever the device
+        configuration or the encoders change.
+
+        Args:
+            device_id: Id of the requested device
+
+        Returns:
+            PublishPlan: Precomputed topics and payload key mapping
+
+        Raises:
+            KeyError: if requested device is not registered with the client
+        """
+        plan = self._publish_plans.get(device_id)
+        if plan is None:
+            device = self.get_device(device_id=device_id)
+            plan = PublishPlan(device=device, encoder=self._encoders[device.protocol])
+            self._publish_plans[device_id] = plan
+        return plan
 
     def __validate_device(self, device: Union[Device, Dict]) -> Device:
         """
@@ -578,6 +653,7 @@ class IoTAMQTTClient(mqtt.Client):
             raise ValueError("Device already exists! %s", device.device_id)
         # add device configuration to the device list
         self._devices[device.device_id] = device
+        self._publish_plans.pop(device.device_id, None)
         # subscribes to the command topic
         self.__subscribe_commands(
             device=device, qos=qos, options=options, properties=properties
@@ -594,12 +670,13 @@ class IoTAMQTTClient(mqtt.Client):
             None
         """
         device = self._devices.pop(device_id, None)
+        self._publish_plans.pop(device_id, None)
         if device:
             topic = self.__create_topic(
                 device=device, topic_type=IoTAMQTTMessageType.CMD
             )
             self.unsubscribe(topic=topic)
-            self.message_callback_remove(sub=topic)
+            self._command_dispatcher.unregister(device.apikey, device_id)
             self.logger.info("Successfully unregistered Device '%s'!", device_id)
         else:
             self.logger.error("Could not unregister device '%s'", device_id)
@@ -626,11 +703,14 @@ class IoTAMQTTClient(mqtt.Client):
         """
         device = self.__validate_device(device=device)
 
-        if self._devices.get(device.device_id, None) is None:
+        previous = self._devices.get(device.device_id, None)
+        if previous is None:
             raise KeyError("Device not found! %s", device.device_id)
 
         # update device configuration in the device list
         self._devices[device.device_id] = device
+        self._publish_plans.pop(device.device_id, None)
+        self.__rebind_command_route(device=device, apikey=previous.apikey)
         # subscribes to the command topic
         self.__subscribe_commands(
             device=device, qos=qos, options=options, properties=properties
@@ -638,7 +718,10 @@ class IoTAMQTTClient(mqtt.Client):
 
     def add_command_callback(self, device_id: str, callback: Callable):
         """
-        Adds callback function for a device configuration.
+        Adds callback function for a device configuration. The callback
+        receives the raw message. Use `add_command_handler` to receive the
+        decoded payload instead. A device has at most one callback,
+        hence an existing callback or handler is replaced.
 
         Args:
             device_id:
@@ -672,8 +755,50 @@ class IoTAMQTTClient(mqtt.Client):
         if device is None:
             raise KeyError("Device does not exist! %s", device_id)
         self.__subscribe_commands(device=device)
-        topic = self.__create_topic(device=device, topic_type=IoTAMQTTMessageType.CMD)
-        self.message_callback_add(topic, callback)
+        self._command_dispatcher.register(device.apikey, device_id, callback)
+
+    def add_command_handler(self, device_id: str, handler: Callable):
+        """
+        Adds a handler for the commands of a device configuration. In
+        contrast to `add_command_callback`, the payload is decoded once
+        by the encoder of the device before the handler is called. A
+        device has at most one handler, hence an existing callback or
+        handler is replaced.
+
+        Args:
+            device_id:
+                id of and IoT device
+            handler:
+                function that will be called for incoming commands.
+                This function should have the following format:
+
+        Example::
+
+            def on_command(client, apikey, device_id, payload):
+                # do_something with the command.
+                # For instance write into a queue.
+
+                # acknowledge the command
+                client.publish(device_id=device_id,
+                               command_name=next(iter(payload)),
+                               payload=payload)
+
+            mqttc.add_command_handler(device_id="MyDevice",
+                                      handler=on_command)
+
+        Returns:
+            None
+
+        Raises:
+            KeyError: if device is not registered with the client
+        """
+        device = self._devices.get(device_id, None)
+        if device is None:
+            raise KeyError("Device does not exist! %s", device_id)
+        self.__subscribe_commands(device=device)
+        self._command_dispatcher.register(
+            device.apikey, device_id, handler, self._encoders[device.protocol]
+        )
 
     def publish(
         self,
@@ -749,92 +874,195 @@ class IoTAMQTTClient(mqtt.Client):
         # TODO: time stamps are not tested yet
 
         if device_id:
-            device = self.get_device(device_id=device_id)
+            topic, payload = self.encode_message(
+                device_id=device_id,
+                payload=payload,
+                attribute_name=attribute_name,
+                command_name=command_name,
+                timestamp=timestamp,
+            )
 
-            # create message for multi measurement payload
-            if attribute_name is None and command_name is None:
-                assert isinstance(payload, dict), "Payload must be a dictionary"
+        super().publish(
+            topic=topic, payload=payload, qos=qos, retain=retain, properties=properties
+        )
 
-                if timestamp and "timeInstant" not in payload.keys():
-                    payload["timeInstant"] = datetime.utcnow()
-                # validate if dict keys match device configuration
+    def encode_message(
+        self,
+        device_id: str,
+        payload: Union[Dict, Any],
+        attribute_name: str = None,
+        command_name: str = None,
+        timestamp: bool = False,
+    ) -> Tuple[str, Any]:
+        """
+        Creates topic and encoded payload of a device message without
+        publishing it. See `publish` for the meaning of the arguments.
 
-                msg_payload = payload.copy()
-                for key in payload.keys():
-                    for attr in device.attributes:
-                        key_constraint = key == "timeInstant"
+        Args:
+            device_id: Id of the IoT device you want to publish for.
+            payload: Message payload
+            attribute_name: Name of an attribute for single measurements
+            command_name: Name of a command that should be acknowledged
+            timestamp: If `true` a timestamp is added to multi measurements
 
-                        def elif_action(msg):
-                            None
+        Returns:
+            Topic and encoded payload
 
-                        if attr.object_id is not None:
-                            key_constraint = key_constraint or (key in attr.object_id)
+        Raises:
+            KeyError: if device configuration is not registered with client
+            ValueError: if the passed arguments are inconsistent
+            AssertionError: if the message payload does not match the device
+                configuration.
+        """
+        plan = self.get_publish_plan(device_id=device_id)
 
-                            def elif_action(msg):
-                                msg[attr.object_id] = msg.pop(key)
+        # create message for multi measurement payload
+        if attribute_name is None and command_name is None:
+            assert isinstance(payload, dict), "Payload must be a dictionary"
 
-                        # could be made more compact by pulling up the second condition
-                        # but would probably make the code less readable...
-                        if key_constraint:
-                            break
+            if timestamp and "timeInstant" not in payload.keys():
+                payload["timeInstant"] = datetime.utcnow()
+            return plan.encode_multi(payload=payload)
 
-                        elif key == attr.name:
-                            elif_action(msg_payload)
-                            break
+        # create message for command acknowledgement
+        elif attribute_name is None and command_name:
+            return plan.encode_command_ack(payload=payload)
 
-                    else:
-                        err_msg = (
-                            f"Attribute key '{key}' is not allowed "
-                            f"in the message payload for this "
-                            f"device configuration with device_id "
-                            f"'{device_id}'"
-                        )
-                        raise KeyError(err_msg)
-                topic = self.__create_topic(
-                    device=device, topic_type=IoTAMQTTMessageType.MULTI
-                )
-                payload = self._encoders[device.protocol].encode_msg(
-                    device_id=device_id,
-                    payload=msg_payload,
-                    msg_type=IoTAMQTTMessageType.MULTI,
-                )
+        # create message for single measurement
+        elif attribute_name and command_name is None:
+            return plan.encode_single(attribute_name=attribute_name, payload=payload)
+        raise ValueError("Inconsistent arguments!")
 
-            # create message for command acknowledgement
-            elif attribute_name is None and command_name:
-                assert isinstance(payload, Dict), "Payload must be a dictionary"
-                assert (
-                    len(payload.keys()) == 1
-                ), "Cannot acknowledge multiple commands simultaneously"
-                assert next(iter(payload.keys())) in [
-                    cmd.name for cmd in device.commands
-                ], "Unknown command for this device!"
-                topic = self.__create_topic(
-                    device=device, topic_type=IoTAMQTTMessageType.CMDEXE
-                )
-                payload = self._encoders[device.protocol].encode_msg(
-                    device_id=device_id,
-                    payload=payload,
-                    msg_type=IoTAMQTTMessageType.CMDEXE,
-                )
+    def publish_many(
+        self,
+        messages: Iterable[Tuple[str, Dict]],
+        qos: int = 0,
+        retain: bool = False,
+        properties=None,
+        timestamp: bool = False,
+        max_inflight: int = None,
+        timeout: float = None,
+    ) -> PublishStats:
+        """
+        Publishes multi measurements for many registered devices. All
+        messages are encoded first using the compiled publish plans of the
+        devices. Hence, an invalid message raises before anything is sent.
 
-            # create message for single measurement
-            elif attribute_name and command_name is None:
-                topic = self.__create_topic(
-                    device=device,
-                    topic_type=IoTAMQTTMessageType.SINGLE,
-                    attribute=attribute_name,
-                )
-                payload = self._encoders[device.protocol].encode_msg(
-                    device_id=device_id,
+        For QoS 1 and 2 at most `max_inflight` messages are unconfirmed at
+        any time. If the window is full, the client blocks until the oldest
+        message was acknowledged by the broker. This provides back-pressure
+        instead of growing the outgoing queue of the client without limit.
+
+        Note:
+            Confirmations are processed by the network loop. Hence, the
+            loop must run in the background, e.g. via `loop_start()`.
+
+        Args:
+            messages:
+                Pairs of device ids and multi measurement payloads
+            qos:
+                The quality of service level to use.
+            retain:
+                If set to true, the messages will be set as the "last known
+                good"/retained message for their topics.
+            properties:
+                (MQTT v5.0 only) the MQTT v5.0 properties to be included.
+            timestamp:
+                If `true` the client will add a timestamp to payloads that
+                do not contain a `timeInstant` yet.
+            max_inflight:
+                Size of the in-flight window for QoS 1 and 2. Defaults to
+                the value set via `max_inflight_messages_set()`.
+            timeout:
+                Maximal time in seconds to wait for the confirmation of a
+                single message. If omitted, the client waits forever.
+
+        Returns:
+            Aggregated delivery statistics and latency percentiles
+
+        Raises:
+            KeyError: if a device is not registered with the client or a
+                payload key does not match its device configuration
+        """
+        plans = self._publish_plans
+        encoded = []
+        for device_id, payload in messages:
+            plan = plans.get(device_id) or self.get_publish_plan(device_id)
+            if timestamp and "timeInstant" not in payload:
+                payload["timeInstant"] = datetime.utcnow()
+            encoded.append(plan.encode_multi(payload=payload))
+
+        if max_inflight is None:
+            # paho uses 0 for an unlimited number of in-flight messages
+            max_inflight = self._max_inflight_messages or len(encoded) or 1
+        stats = PublishStats(messages=len(encoded))
+        latencies = []
+        # the broker may confirm a message before its mid is known here
+        sent_at, confirmed_at = {}, {}
+        lock = threading.Lock()
+        user_on_publish = self.on_publish
+
+        def on_publish(client, userdata, mid, *args):
+            now = time.perf_counter()
+            with lock:
+                start = sent_at.pop(mid, None)
+                if start is None:
+                    confirmed_at[mid] = now
+                else:
+                    latencies.append(now - start)
+            if user_on_publish is not None:
+                user_on_publish(client, userdata, mid, *args)
+
+        def settle(info: mqtt.MQTTMessageInfo):
+            try:
+                info.wait_for_publish(timeout=timeout)
+            except (RuntimeError, ValueError) as err:
+                self.logger.debug("Message %s failed: %s", info.mid, err)
+                stats.failed += 1
+                return
+            if info.is_published():
+                stats.published += 1
+            else:
+                stats.timed_out += 1
+
+        publish = super().publish
+        pending = deque()
+        start_time = time.perf_counter()
+        self.on_publish = on_publish
+        try:
+            for topic, payload in encoded:
+                if qos > 0:
+                    while len(pending) >= max_inflight:
+                        settle(pending.popleft())
+                start = time.perf_counter()
+                info = publish(
+                    topic=topic,
                     payload=payload,
-                    msg_type=IoTAMQTTMessageType.SINGLE,
+                    qos=qos,
+                    retain=retain,
+                    properties=properties,
                 )
-            else:
-                raise ValueError("Inconsistent arguments!")
-
-        super().publish(
-            topic=topic, payload=payload, qos=qos, retain=retain, properties=properties
+                with lock:
+                    end = confirmed_at.pop(info.mid, None)
+                    if end is None:
+                        sent_at[info.mid] = start
+                    else:
+                        latencies.append(end - start)
+                pending.append(info)
+            while pending:
+                settle(pending.popleft())
+        finally:
+            self.on_publish = user_on_publish
+        stats.duration = time.perf_counter() - start_time
+
+        stats.set_latencies(latencies)
+        self.logger.info(
+            "Published %s of %s messages in %.3f s",
+            stats.published,
+            stats.messages,
+            stats.duration,
         )
+        return stats
 
     def subscribe(self, topic=None, qos=0, options=None, properties=None):
         """
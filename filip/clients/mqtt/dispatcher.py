@@ -0,0 +1,234 @@
+"""
+Dispatcher for incoming IoT-Agent commands of the MQTT client
+"""
+
+import logging
+import queue
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from paho.mqtt.client import MQTTMessage
+from filip.clients.mqtt.encoder import BaseEncoder
+
+# Sentinel that stops a worker thread
+_STOP = object()
+
+
+class CommandRoute(NamedTuple):
+    """
+    Registered receiver of the commands of a single device.
+
+    If `encoder` is None, the callback is a plain paho message callback
+    `callback(client, userdata, msg)`. Otherwise, the payload is decoded
+    once by the encoder and the callback is called as
+    `callback(client, apikey, device_id, payload)`.
+    """
+
+    callback: Callable
+    encoder: Optional[BaseEncoder] = None
+
+
+class CommandDispatcher:
+    """
+    Routes incoming command messages to the callbacks of the registered
+    devices. The command topics `/<apikey>/<device_id>/cmd` are indexed by
+    `(apikey, device_id)`, hence a single message callback serves any
+    number of devices and matching a message is a single dictionary lookup.
+
+    By default, callbacks are executed in paho's network loop. If `workers`
+    is larger than zero, decoding and callbacks are executed by a pool of
+    worker threads instead, so that slow callbacks do not block the network
+    loop. Messages of the same device are always handled by the same worker
+    and therefore in order of arrival.
+
+    Args:
+        workers: Number of worker threads. 0 executes callbacks in the
+            network loop.
+        queue_size: Maximum number of pending messages per worker. 0 means
+            unbounded. If a queue is full, the network loop blocks until
+            the worker catches up.
+    """
+
+    #: Topic filter that matches the command topics of all devices
+    topic_filter = "/+/+/cmd"
+
+    def __init__(self, workers: int = 0, queue_size: int = 0):
+        if workers < 0:
+            raise ValueError("Number of workers must not be negative")
+        self.logger = logging.getLogger(
+            name=f"{self.__class__.__module__}." f"{self.__class__.__name__}"
+        )
+        self.logger.addHandler(logging.NullHandler())
+        self.workers = workers
+        self.queue_size = queue_size
+        self._routes: Dict[Tuple[str, str], CommandRoute] = {}
+        self._queues: List[queue.Queue] = []
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    def register(
+        self,
+        apikey: str,
+        device_id: str,
+        callback: Callable,
+        encoder: BaseEncoder = None,
+    ) -> None:
+        """
+        Registers the command callback of a device. An existing callback of
+        the device is replaced.
+
+        Args:
+            apikey: Apikey of the device
+            device_id: Id of the device
+            callback: Function called for incoming commands (see
+                `CommandRoute`)
+            encoder: Encoder used to decode the payload. If omitted, the
+                raw message is passed to the callback.
+
+        Returns:
+            None
+        """
+        self._routes[(apikey, device_id)] = CommandRoute(callback, encoder)
+
+    def unregister(self, apikey: str, device_id: str) -> Optional[CommandRoute]:
+        """
+        Removes the command callback of a device
+
+        Args:
+            apikey: Apikey of the device
+            device_id: Id of the device
+
+        Returns:
+            The removed route or None if the device was not registered
+        """
+        return self._routes.pop((apikey, device_id), None)
+
+    def get_route(self, apikey: str, device_id: str) -> Optional[CommandRoute]:
+        """
+        Returns the registered route of a device
+
+        Args:
+            apikey: Apikey of the device
+            device_id: Id of the device
+
+        Returns:
+            The route or None if the device is not registered
+        """
+        return self._routes.get((apikey, device_id))
+
+    def on_message(self, client, userdata, msg: MQTTMessage) -> None:
+        """
+        Message callback for paho. Messages without a registered route are
+        passed on to the `on_message` callback of the client.
+
+        Args:
+            client: MQTT client that received the message
+            userdata: Userdata of the client
+            msg: Received message
+
+        Returns:
+            None
+        """
+        # topic: /<apikey>/<device_id>/cmd
+        parts = msg.topic.split("/")
+        route = None
+        if len(parts) == 4 and parts[3] == "cmd":
+            route = self._routes.get((parts[1], parts[2]))
+        if route is None:
+            if client.on_message is not None:
+                client.on_message(client, userdata, msg)
+            return
+        if not self.workers:
+            self._handle(client, userdata, msg, parts[1], parts[2], route)
+            return
+        if not self._threads:
+            self._start()
+        index = hash(parts[2]) % self.workers
+        self._queues[index].put((client, userdata, msg, parts[1], parts[2], route))
+
+    def _handle(
+        self,
+        client,
+        userdata,
+        msg: MQTTMessage,
+        apikey: str,
+        device_id: str,
+        route: CommandRoute,
+    ) -> None:
+        """
+        Decodes a message and calls the callback of its route
+        """
+        if route.encoder is None:
+            route.callback(client, userdata, msg)
+            return
+        try:
+            payload = route.encoder.decode_payload(msg.payload)
+        except ValueError:
+            self.logger.error(
+                "Could not decode command for device '%s': %s", device_id, msg.payload
+            )
+            return
+        route.callback(client, apikey, device_id, payload)
+
+    def _start(self) -> None:
+        """
+        Starts the worker threads
+        """
+        with self._lock:
+            if self._threads:
+                return
+            self._queues = [
+                queue.Queue(maxsize=self.queue_size) for _ in range(self.workers)
+            ]
+            for index, work_queue in enumerate(self._queues):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(work_queue,),
+                    name=f"{self.__class__.__name__}-{index}",
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self, work_queue: queue.Queue) -> None:
+        """
+        Main loop of a worker thread
+        """
+        while True:
+            item = work_queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._handle(*item)
+            except Exception:
+                self.logger.exception("Error in command callback")
+            finally:
+                work_queue.task_done()
+
+    def join(self) -> None:
+        """
+        Blocks until all pending messages are handled
+
+        Returns:
+            None
+        """
+        for work_queue in self._queues:
+            work_queue.join()
+
+    def close(self) -> None:
+        """
+        Handles all pending messages and stops the worker threads. Workers
+        are restarted on the next incoming message.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            for work_queue in self._queues:
+                work_queue.put(_STOP)
+            for thread in self._threads:
+                thread.join()
+            self._queues = []
+            self._threads = []
@@ -1,3 +1,4 @@
 from .base_encoder import BaseEncoder
 from .json import Json
 from .ulralight import Ultralight
+from .messagepack import MessagePack
@@ -5,7 +5,7 @@ Abstract class for all IoTA MQTT message encoders
 import logging
 from abc import ABC
 from datetime import datetime
-from typing import Dict, Tuple
+from typing import Any, Dict, Tuple
 from paho.mqtt.client import MQTTMessage
 from filip.models.mqtt import IoTAMQTTMessageType
 from filip.utils import convert_datetime_to_iso_8601_with_z_suffix
@@ -53,6 +53,19 @@ class BaseEncoder(ABC):
 
         return apikey, device_id, payload
 
+    def decode_payload(self, payload: bytes, decoder: str = "utf-8") -> Any:
+        """
+        Decodes the payload of an ingoing command without parsing its topic
+
+        Args:
+            payload: Raw message payload
+            decoder: encoding identifier
+
+        Returns:
+            Decoded payload
+        """
+        return payload.decode(decoder)
+
     def encode_msg(
         self, device_id: str, payload: Dict, msg_type: IoTAMQTTMessageType
     ) -> str:
@@ -84,7 +97,7 @@ class BaseEncoder(ABC):
                 timestamp = datetime.fromisoformat(payload["timeInstant"])
             if isinstance(timestamp, datetime):
                 payload["timeInstant"] = convert_datetime_to_iso_8601_with_z_suffix(
-                    payload["timeInstant"]
+                    timestamp
                 )
             else:
                 raise ValueError("Not able to parse datetime")
@@ -104,7 +117,7 @@ class BaseEncoder(ABC):
         Raises:
             ValueError
         """
-        ValueError(
+        raise ValueError(
             f"Message format not supported! \n "
             f"Message Type: {msg_type} \n "
             f"Payload: {payload}"
@@ -2,15 +2,17 @@
 Json encoder class for all IoTA-JSON MQTT message encoders
 """
 
-import json
 from typing import Any, Dict, Tuple
 from filip.clients.mqtt.encoder import BaseEncoder
 from filip.models.mqtt import IoTAMQTTMessageType
+from filip.utils.serializer import dumps, loads
 
 
 class Json(BaseEncoder):
     """
-    Json encoder class for all IoTA-JSON MQTT message encoders
+    Json encoder class for all IoTA-JSON MQTT message encoders. The
+    serialization uses the json backend of FiLiP
+    (see `filip.utils.serializer`).
     """
 
     prefix = "/json"
@@ -20,15 +22,18 @@ class Json(BaseEncoder):
 
     def decode_message(self, msg, decoder="utf-8") -> Tuple[str, str, Dict]:
         apikey, device_id, payload = super().decode_message(msg=msg, decoder=decoder)
-        payload = json.loads(payload)
+        payload = loads(payload)
         return apikey, device_id, payload
 
+    def decode_payload(self, payload: bytes, decoder: str = "utf-8") -> Any:
+        return loads(payload)
+
     def encode_msg(self, device_id, payload: Any, msg_type: IoTAMQTTMessageType) -> str:
         if msg_type == IoTAMQTTMessageType.SINGLE:
             return payload
         elif msg_type == IoTAMQTTMessageType.MULTI:
             payload = super()._parse_timestamp(payload=payload)
-            return json.dumps(payload, default=str)
+            return dumps(payload)
         elif msg_type == IoTAMQTTMessageType.CMDEXE:
-            return json.dumps(payload)
+            return dumps(payload)
         super()._raise_encoding_error(payload=payload, msg_type=msg_type)
@@ -0,0 +1,150 @@
+"""
+MessagePack encoder class for compact binary MQTT messages
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Tuple
+from filip.clients.mqtt.encoder import BaseEncoder
+from filip.models.mqtt import IoTAMQTTMessageType
+from filip.utils import convert_datetime_to_iso_8601_with_z_suffix
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class MessagePack(BaseEncoder):
+    """
+    MessagePack encoder for high-rate devices, e.g. vibration sensors that
+    send hundreds of samples per message. Messages are encoded into compact
+    binary payloads instead of text.
+
+    If NumPy is installed, arrays can be used as measurement values. They
+    are encoded as mapping with the keys `nd`, `type`, `shape` and `data`
+    (the layout of msgpack-numpy), where `data` is packed directly from the
+    buffer of the array without intermediate copies. Decoded arrays are
+    read-only views on the received payload.
+
+    Note:
+        The IoT-Agents of FIWARE do not support MessagePack. The encoder is
+        meant for gateways or custom agents that decode the payload, e.g.
+        with `decode_payload`. Register it with
+        `IoTAMQTTClient.add_encoder({"MessagePack": MessagePack()})` and
+        set the protocol of the devices to "MessagePack".
+
+    Raises:
+        ImportError: if msgpack is not installed
+    """
+
+    prefix = "/msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError(
+                "The MessagePack encoder requires msgpack. Install it via "
+                "'pip install filip[msgpack]'"
+            )
+        super().__init__()
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        """
+        Converts objects that msgpack does not support natively
+
+        Args:
+            obj: Object to convert
+
+        Returns:
+            Serializable representation
+
+        Raises:
+            TypeError: if the object is not supported
+            ValueError: for arrays of python objects
+        """
+        if np is not None:
+            if isinstance(obj, np.ndarray):
+                if obj.dtype.hasobject:
+                    raise ValueError("Arrays of python objects are not supported")
+                # only copies if the array is not contiguous. Unlike
+                # np.ascontiguousarray this keeps the shape of 0-d arrays
+                if not obj.flags.c_contiguous:
+                    obj = obj.copy(order="C")
+                return {
+                    "nd": True,
+                    "type": obj.dtype.str,
+                    "shape": obj.shape,
+                    # empty buffers cannot be cast
+                    "data": (
+                        obj.tobytes() if obj.size == 0 else memoryview(obj).cast("B")
+                    ),
+                }
+            if isinstance(obj, np.generic):
+                return obj.item()
+        if isinstance(obj, datetime):
+            return convert_datetime_to_iso_8601_with_z_suffix(obj)
+        raise TypeError(f"Cannot serialize object of type {type(obj)}")
+
+    @staticmethod
+    def _object_hook(obj: Dict) -> Any:
+        """
+        Restores arrays from decoded mappings
+        """
+        if np is not None and obj.get("nd") is True and "data" in obj:
+            return np.frombuffer(obj["data"], dtype=np.dtype(obj["type"])).reshape(
+                tuple(obj["shape"])
+            )
+        return obj
+
+    def pack(self, obj: Any) -> bytes:
+        """
+        Packs an object into MessagePack
+
+        Args:
+            obj: Object to pack
+
+        Returns:
+            Packed bytes
+        """
+        return msgpack.packb(obj, default=self._default, use_bin_type=True)
+
+    def unpack(self, data: bytes) -> Any:
+        """
+        Unpacks MessagePack data
+
+        Args:
+            data: Packed bytes
+
+        Returns:
+            Unpacked object
+
+        Raises:
+            ValueError: if the data is not valid MessagePack
+        """
+        return msgpack.unpackb(data, raw=False, object_hook=self._object_hook)
+
+    def decode_message(self, msg, decoder="utf-8") -> Tuple[str, str, Dict]:
+        topic = msg.topic.strip("/").split("/")
+        if topic[-1] != "cmd":
+            raise ValueError(f"Not a command topic: {msg.topic}")
+        return topic[0], topic[1], self.decode_payload(msg.payload)
+
+    def decode_payload(self, payload: bytes, decoder: str = "utf-8") -> Any:
+        return self.unpack(payload)
+
+    def encode_msg(
+        self, device_id: str, payload: Any, msg_type: IoTAMQTTMessageType
+    ) -> bytes:
+        if msg_type == IoTAMQTTMessageType.SINGLE:
+            return self.pack(payload)
+        elif msg_type == IoTAMQTTMessageType.MULTI:
+            payload = super()._parse_timestamp(payload=payload)
+            return self.pack(payload)
+        elif msg_type == IoTAMQTTMessageType.CMDEXE:
+            return self.pack(payload)
+        super()._raise_encoding_error(payload=payload, msg_type=msg_type)
@@ -1,54 +1,179 @@
-from pydantic import validate_arguments
-from typing import Any, Dict, Tuple, Union
+"""
+Ultralight 2.0 encoder class for all IoTA-UL MQTT message encoders
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Tuple, Union
 from filip.clients.mqtt.encoder import BaseEncoder
 from filip.models.mqtt import IoTAMQTTMessageType
+from filip.utils import convert_datetime_to_iso_8601_with_z_suffix
+
+# Coercion table for literals in received messages. Numbers are coerced
+# separately, everything else remains a string.
+UL_LITERALS = {"true": True, "false": False}
+
+# Characters that start a numeric literal. Python specific literals with
+# underscores are not coerced.
+_NUMERIC_START = frozenset("+-.0123456789")
 
 
 class Ultralight(BaseEncoder):
+    """
+    Ultralight 2.0 encoder class for all IoTA-UL MQTT message encoders.
+
+    Messages are encoded directly into bytes. Received values are coerced
+    to bool, int or float if possible (see `UL_LITERALS`), otherwise they
+    are returned as strings.
+    """
+
     prefix = "/ul"
 
     def __init__(self):
         super().__init__()
 
     @staticmethod
-    @validate_arguments
-    def __eval_value(value: Union[bool, float, str]):
+    def coerce_value(value: str) -> Union[bool, int, float, str]:
+        """
+        Coerces a received value into its python type
+
+        Args:
+            value: Raw value of an ultralight message
+
+        Returns:
+            bool, int or float if the value is a corresponding literal,
+            otherwise the string itself
+        """
+        if value in UL_LITERALS:
+            return UL_LITERALS[value]
+        if value.isdecimal():
+            return int(value)
+        if value[:1] in _NUMERIC_START and "_" not in value:
+            try:
+                if "." in value or "e" in value or "E" in value:
+                    return float(value)
+                return int(value)
+            except ValueError:
+                pass
+        return value
+
+    @staticmethod
+    def format_value(value: Any) -> str:
+        """
+        Formats a value for an ultralight message
+
+        Args:
+            value: Value to send
+
+        Returns:
+            String representation of the value
+
+        Raises:
+            ValueError: if the value contains a separator of the protocol
+        """
+        if value is True:
+            return "true"
+        if value is False:
+            return "false"
+        if value is None:
+            return ""
+        if isinstance(value, datetime):
+            return convert_datetime_to_iso_8601_with_z_suffix(value)
+        value = str(value)
+        if "|" in value or "#" in value:
+            raise ValueError(f"Ultralight values must not contain '|' or '#': {value}")
         return value
 
+    def decode_command(self, payload: Union[str, bytes]) -> Tuple[str, Dict]:
+        """
+        Decodes a command or a command acknowledgement of the form
+        `<device_id>@<command>|<value>` or
+        `<device_id>@<command>|<param>=<value>|...`
+
+        Args:
+            payload: Raw message payload
+
+        Returns:
+            Device id and a dictionary with the command name as key. The
+            value is either a single value, a dictionary of parameters or
+            a list of values.
+        """
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8")
+        device_id, _, body = payload.partition("@")
+        command, _, params = body.partition("|")
+        coerce = self.coerce_value
+        tokens = params.split("|") if params else []
+        if not tokens:
+            value = ""
+        elif len(tokens) == 1 and "=" not in tokens[0]:
+            value = coerce(tokens[0])
+        elif all("=" in token for token in tokens):
+            value = {}
+            for token in tokens:
+                key, _, raw = token.partition("=")
+                value[key] = coerce(raw)
+        else:
+            value = [coerce(token) for token in tokens]
+        return device_id, {command: value}
+
+    def decode_measurements(self, payload: Union[str, bytes]) -> List[Dict]:
+        """
+        Decodes (multi) measurements of the form
+        `[<timestamp>|]<key>|<value>|...`. Several measurement groups can be
+        separated by `#`.
+
+        Args:
+            payload: Raw message payload
+
+        Returns:
+            One dictionary per measurement group. Timestamps are returned
+            as `timeInstant`.
+        """
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8")
+        coerce = self.coerce_value
+        groups = []
+        for group in payload.split("#"):
+            tokens = group.split("|")
+            measurement = {}
+            if len(tokens) % 2:
+                measurement["timeInstant"] = tokens.pop(0)
+            for i in range(0, len(tokens), 2):
+                measurement[tokens[i]] = coerce(tokens[i + 1])
+            groups.append(measurement)
+        return groups
+
     def decode_message(self, msg, decoder="utf-8") -> Tuple[str, str, Dict]:
         apikey, device_id, payload = super().decode_message(msg=msg, decoder=decoder)
-        payload = payload.split("@")
-        if not device_id == payload[0]:
+        cmd_device_id, payload = self.decode_command(payload)
+        if not device_id == cmd_device_id:
             self.logger.warning("Received invalid command")
-
-        payload = payload[1].split("|")
-        payload = {
-            payload[i]: self.__eval_value(payload[i + 1])
-            for i in range(0, len(payload), 2)
-        }
-
         return apikey, device_id, payload
 
+    def decode_payload(self, payload: bytes, decoder: str = "utf-8") -> Dict:
+        return self.decode_command(payload.decode(decoder))[1]
+
     def encode_msg(
         self, device_id: str, payload: Any, msg_type: IoTAMQTTMessageType
-    ) -> str:
+    ) -> bytes:
+        fmt = self.format_value
         if msg_type == IoTAMQTTMessageType.SINGLE:
-            return payload
+            return fmt(payload).encode()
         elif msg_type == IoTAMQTTMessageType.MULTI:
-            payload = super()._parse_timestamp(payload=payload)
-            timestamp = str(payload.pop("timeInstant", ""))
-            data = "|".join([f"{key}|{value}" for key, value in payload.items()])
-            data = "|".join([timestamp, data]).strip("|")
-            return data
-        elif msg_type == IoTAMQTTMessageType.CMDEXE:
+            parts = []
+            timestamp = payload.get("timeInstant")
+            if timestamp:
+                if isinstance(timestamp, str):
+                    timestamp = datetime.fromisoformat(timestamp)
+                parts.append(fmt(timestamp))
             for key, value in payload.items():
-                if isinstance(value, bool):
-                    value = str(value).lower()
-                elif isinstance(value, (float, int)):
-                    value = str(value)
-                elif isinstance(value, str):
-                    pass
-                else:
-                    raise ValueError("Cannot parse command acknowledgement!")
-                return f"{device_id}@{key}|{value}"
+                if key != "timeInstant":
+                    parts.append(key)
+                    parts.append(fmt(value))
+            return "|".join(parts).encode()
+        elif msg_type == IoTAMQTTMessageType.CMDEXE:
+            key, value = next(iter(payload.items()))
+            if not isinstance(value, (bool, int, float, str)):
+                raise ValueError("Cannot parse command acknowledgement!")
+            return f"{device_id}@{key}|{fmt(value)}".encode()
         super()._raise_encoding_error(payload=payload, msg_type=msg_type)
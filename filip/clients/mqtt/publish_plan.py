@@ -0,0 +1,145 @@
+"""
+Precompiled publish information of IoT devices for the MQTT client
+"""
+
+from typing import Any, Dict, Tuple
+from filip.clients.mqtt.encoder import BaseEncoder
+from filip.models.mqtt import IoTAMQTTMessageType
+from filip.models.ngsi_v2.iot import Device
+
+
+class PublishPlan:
+    """
+    Compiled publish information of a single device configuration. All
+    topics and the mapping of payload keys to object_ids are computed once,
+    so that encoding a message only requires dictionary lookups.
+
+    The plan must be rebuilt whenever the device configuration or its
+    encoder changes.
+
+    Args:
+        device: Configuration of an IoT device
+        encoder: Encoder matching the payload protocol of the device
+    """
+
+    __slots__ = (
+        "device_id",
+        "encoder",
+        "multi_topic",
+        "cmdexe_topic",
+        "single_topics",
+        "key_map",
+        "commands",
+    )
+
+    def __init__(self, device: Device, encoder: BaseEncoder):
+        self.device_id = device.device_id
+        self.encoder = encoder
+        base_topic = "/".join((encoder.prefix, device.apikey, device.device_id))
+        self.multi_topic = f"{base_topic}/attrs"
+        self.cmdexe_topic = f"{base_topic}/cmdexe"
+
+        # Attributes are processed in reverse order, so that the first
+        # matching attribute wins if names or object_ids are ambiguous
+        self.single_topics: Dict[str, str] = {}
+        self.key_map: Dict[str, str] = {}
+        for attr in reversed(device.attributes):
+            suffix = attr.object_id or attr.name
+            self.single_topics[attr.name] = f"{self.multi_topic}/{suffix}"
+            self.key_map[attr.name] = suffix
+            if attr.object_id:
+                self.key_map[attr.object_id] = attr.object_id
+        self.key_map["timeInstant"] = "timeInstant"
+        self.commands = frozenset(cmd.name for cmd in device.commands)
+
+    def map_payload(self, payload: Dict) -> Dict:
+        """
+        Replaces attribute names in a multi measurement payload by their
+        object_ids
+
+        Args:
+            payload: Multi measurement payload with attribute names or
+                object_ids as keys
+
+        Returns:
+            New payload with object_ids as keys
+
+        Raises:
+            KeyError: if a key does not match the device configuration
+        """
+        key_map = self.key_map
+        try:
+            return {key_map[key]: value for key, value in payload.items()}
+        except KeyError as err:
+            raise KeyError(
+                f"Attribute key '{err.args[0]}' is not allowed "
+                f"in the message payload for this "
+                f"device configuration with device_id "
+                f"'{self.device_id}'"
+            ) from None
+
+    def encode_multi(self, payload: Dict) -> Tuple[str, Any]:
+        """
+        Encodes a multi measurement
+
+        Args:
+            payload: Multi measurement payload
+
+        Returns:
+            Topic and encoded payload
+        """
+        return self.multi_topic, self.encoder.encode_msg(
+            device_id=self.device_id,
+            payload=self.map_payload(payload),
+            msg_type=IoTAMQTTMessageType.MULTI,
+        )
+
+    def encode_single(self, attribute_name: str, payload: Any) -> Tuple[str, Any]:
+        """
+        Encodes a single measurement
+
+        Args:
+            attribute_name: Name of the measured attribute
+            payload: Measured value
+
+        Returns:
+            Topic and encoded payload
+
+        Raises:
+            KeyError: if the attribute is unknown
+        """
+        try:
+            topic = self.single_topics[attribute_name]
+        except KeyError:
+            raise KeyError(
+                f"Unknown attribute '{attribute_name}' for device "
+                f"'{self.device_id}'"
+            ) from None
+        return topic, self.encoder.encode_msg(
+            device_id=self.device_id,
+            payload=payload,
+            msg_type=IoTAMQTTMessageType.SINGLE,
+        )
+
+    def encode_command_ack(self, payload: Dict) -> Tuple[str, Any]:
+        """
+        Encodes a command acknowledgement
+
+        Args:
+            payload: Dictionary with the command name as only key
+
+        Returns:
+            Topic and encoded payload
+        """
+        assert isinstance(payload, Dict), "Payload must be a dictionary"
+        assert (
+            len(payload.keys()) == 1
+        ), "Cannot acknowledge multiple commands simultaneously"
+        assert (
+            next(iter(payload.keys())) in self.commands
+        ), "Unknown command for this device!"
+        return self.cmdexe_topic, self.encoder.encode_msg(
+            device_id=self.device_id,
+            payload=payload,
+            msg_type=IoTAMQTTMessageType.CMDEXE,
+        )
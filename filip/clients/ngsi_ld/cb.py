@@ -28,6 +28,7 @@ from filip.models.ngsi_ld.context import (
     UpdateLD,
 )
 from filip.models.ngsi_v2.context import Query
+from filip.utils.serializer import dumpb
 
 
 class ContextBrokerLDClient(BaseHttpClient):
@@ -137,7 +138,7 @@ class ContextBrokerLDClient(BaseHttpClient):
 
             res = do_request(params)
             if res.ok:
-                items = res.json()
+                items = self.parse_json(res)
                 count = int(res.headers["NGSILD-Results-Count"])
 
                 while len(items) < limit and len(items) < count:
@@ -145,7 +146,7 @@ class ContextBrokerLDClient(BaseHttpClient):
                     params["limit"] = min(1000, (limit - len(items)))
                     res = do_request(params)
                     if res.ok:
-                        items.extend(res.json())
+                        items.extend(self.parse_json(res))
                     else:
                         res.raise_for_status()
                 self.logger.debug("Received: %s", items)
@@ -166,7 +167,7 @@ class ContextBrokerLDClient(BaseHttpClient):
         try:
             res = self.get(url=url)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -196,7 +197,7 @@ class ContextBrokerLDClient(BaseHttpClient):
         try:
             res = self.get(url=url)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -313,11 +314,11 @@ class ContextBrokerLDClient(BaseHttpClient):
             res = self.get(url=url, params=params, headers=headers)
             if res.ok:
                 self.logger.info("Entity successfully retrieved!")
-                self.logger.debug("Received: %s", res.json())
+                self.logger.debug("Received: %s", self.parse_json(res))
                 if options == "keyValues":
-                    return ContextLDEntityKeyValues(**res.json())
+                    return ContextLDEntityKeyValues(**self.parse_json(res))
                 else:
-                    return ContextLDEntity(**res.json())
+                    return ContextLDEntity(**self.parse_json(res))
             res.raise_for_status()
         except requests.RequestException as err:
             msg = f"Could not load entity {entity_id}"
@@ -743,8 +744,8 @@ class ContextBrokerLDClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=headers)
             if res.ok:
-                self.logger.debug("Received: %s", res.json())
-                return SubscriptionLD(**res.json())
+                self.logger.debug("Received: %s", self.parse_json(res))
+                return SubscriptionLD(**self.parse_json(res))
             res.raise_for_status()
         except requests.RequestException as err:
             msg = f"Could not load subscription {subscription_id}"
@@ -835,7 +836,7 @@ class ContextBrokerLDClient(BaseHttpClient):
         try:
             res.raise_for_status()
             if res.text:
-                response_data = res.json()
+                response_data = self.parse_json(res)
                 if "errors" in response_data:
                     errors = response_data["errors"]
                     self.log_multi_errors(errors)
@@ -925,14 +926,14 @@ class ContextBrokerLDClient(BaseHttpClient):
             if action_type == ActionTypeLD.DELETE:
                 id_list = [entity.id for entity in entities]
                 res = self.post(
-                    url=url, headers=headers, params=params, data=json.dumps(id_list)
+                    url=url, headers=headers, params=params, data=dumpb(id_list)
                 )
             else:
                 res = self.post(
                     url=url,
                     headers=headers,
                     params=params,
-                    data=json.dumps(
+                    data=dumpb(
                         update.model_dump(
                             by_alias=True,
                             exclude_none=True,
@@ -6,6 +6,7 @@ from __future__ import annotations
 
 import copy
 import json
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from enum import Enum
 from math import inf
@@ -43,6 +44,7 @@ from filip.models.ngsi_v2.base import AttrsFormat
 from filip.models.ngsi_v2.subscriptions import Subscription, Message
 from filip.models.ngsi_v2.registrations import Registration
 from filip.clients.exceptions import BaseHttpClientException
+from filip.utils.canonical import canonicalize, subscription_hash
 
 if TYPE_CHECKING:
     from filip.clients.ngsi_v2.iota import IoTAClient
@@ -85,6 +87,11 @@ class ContextBrokerClient(BaseHttpClient):
         super().__init__(
             url=url, session=session, fiware_header=fiware_header, **kwargs
         )
+        # fingerprint -> id of the subscriptions known to the context broker.
+        # Of subscriptions sharing a fingerprint the first one is indexed
+        self._subscription_index: Optional[Dict[str, str]] = None
+        # id -> fingerprint of the subscriptions known to the context broker
+        self._subscription_fingerprints: Dict[str, str] = {}
         self._check_correct_cb_version()
 
     def __pagination(
@@ -138,7 +145,7 @@ class ContextBrokerClient(BaseHttpClient):
                 data=data,
             )
             if res.ok:
-                items = res.json()
+                items = self.parse_json(res)
                 count = int(res.headers["Fiware-Total-Count"])
 
                 while len(items) < limit and len(items) < count:
@@ -152,7 +159,7 @@ class ContextBrokerClient(BaseHttpClient):
                         data=data,
                     )
                     if res.ok:
-                        items.extend(res.json())
+                        items.extend(self.parse_json(res))
                     else:
                         res.raise_for_status()
                 self.logger.debug("Received: %s", items)
@@ -162,6 +169,7 @@ class ContextBrokerClient(BaseHttpClient):
             if temporary_session is not None:
                 temporary_session.close()
                 self.session = original_session
+
     # MANAGEMENT API
     def get_version(self) -> Dict:
         """
@@ -173,7 +181,7 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=self.headers)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -204,7 +212,7 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=self.headers)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -221,7 +229,7 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=self.headers)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -548,12 +556,12 @@ class ContextBrokerClient(BaseHttpClient):
             res = self.get(url=url, params=params, headers=headers)
             if res.ok:
                 self.logger.info("Entity successfully retrieved!")
-                self.logger.debug("Received: %s", res.json())
+                self.logger.debug("Received: %s", self.parse_json(res))
                 if response_format == AttrsFormat.NORMALIZED:
-                    return ContextEntity(**res.json())
+                    return ContextEntity(**self.parse_json(res))
                 if response_format == AttrsFormat.KEY_VALUES:
-                    return ContextEntityKeyValues(**res.json())
-                return res.json()
+                    return ContextEntityKeyValues(**self.parse_json(res))
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             msg = f"Could not load entity {entity_id}"
@@ -613,9 +621,9 @@ class ContextBrokerClient(BaseHttpClient):
                 if response_format == AttrsFormat.NORMALIZED:
                     return {
                         key: ContextAttribute(**values)
-                        for key, values in res.json().items()
+                        for key, values in self.parse_json(res).items()
                     }
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             msg = f"Could not load attributes from entity {entity_id} !"
@@ -1152,8 +1160,8 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, params=params, headers=headers)
             if res.ok:
-                self.logger.debug("Received: %s", res.json())
-                return ContextAttribute(**res.json())
+                self.logger.debug("Received: %s", self.parse_json(res))
+                return ContextAttribute(**self.parse_json(res))
             res.raise_for_status()
         except requests.RequestException as err:
             msg = (
@@ -1311,8 +1319,8 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, params=params, headers=headers)
             if res.ok:
-                self.logger.debug("Received: %s", res.json())
-                return res.json()
+                self.logger.debug("Received: %s", self.parse_json(res))
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             msg = (
@@ -1409,8 +1417,8 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, params=params, headers=headers)
             if res.ok:
-                self.logger.debug("Received: %s", res.json())
-                return res.json()
+                self.logger.debug("Received: %s", self.parse_json(res))
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             msg = "Could not load entity types!"
@@ -1431,8 +1439,8 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, params=params, headers=headers)
             if res.ok:
-                self.logger.debug("Received: %s", res.json())
-                return res.json()
+                self.logger.debug("Received: %s", self.parse_json(res))
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             msg = f"Could not load entities of type" f"'{entity_type}' "
@@ -1495,37 +1503,9 @@ class ContextBrokerClient(BaseHttpClient):
         """
         existing_subscriptions = self.get_subscription_list()
 
-        sub_dict = subscription.model_dump(
-            include={"subject", "notification"},
-            exclude={
-                "notification": {
-                    "lastSuccess": True,
-                    "lastFailure": True,
-                    "lastSuccessCode": True,
-                    "lastFailureReason": True,
-                    "mqtt": {"passwd"},
-                    "mqttCustom": {"passwd"},
-                }
-            },
-        )
-
+        sub_hash = subscription_hash(subscription)
         for ex_sub in existing_subscriptions:
-            if self._subscription_dicts_are_equal(
-                sub_dict,
-                ex_sub.model_dump(
-                    include={"subject", "notification"},
-                    exclude={
-                        "notification": {
-                            "lastSuccess": True,
-                            "lastFailure": True,
-                            "lastSuccessCode": True,
-                            "lastFailureReason": True,
-                            "mqtt": {"passwd"},
-                            "mqttCustom": {"passwd"},
-                        }
-                    },
-                ),
-            ):
+            if sub_hash == subscription_hash(ex_sub):
                 self.logger.info("Subscription already exists")
                 if update:
                     self.logger.info("Updated subscription")
@@ -1537,6 +1517,104 @@ class ContextBrokerClient(BaseHttpClient):
                     )
                 return ex_sub.id
 
+        params = self._get_skip_initial_notification_params(
+            skip_initial_notification=skip_initial_notification
+        )
+        return self._create_subscription(subscription=subscription, params=params)
+
+    def post_subscriptions(
+        self,
+        subscriptions: List[Subscription],
+        update: bool = False,
+        skip_initial_notification: bool = False,
+        max_workers: PositiveInt = 1,
+        refresh_index: bool = False,
+    ) -> List[str]:
+        """
+        Bulk version of `post_subscription`. Only subscriptions that do not
+        exist yet are created.
+
+        Instead of comparing every new subscription with every existing one,
+        the subject and notification of each subscription are reduced to a
+        fingerprint (see `filip.utils.canonical.subscription_hash`). The
+        fingerprints of the existing subscriptions are loaded once and kept
+        in an index on the client, so that subsequent calls do not need to
+        fetch the subscription list again. The index is maintained by this client's
+        subscription operations. If subscriptions are changed by other
+        clients, use `refresh_index` to reload it.
+
+        Args:
+            subscriptions: List of subscriptions to post
+            update: True - If a subscription already exists, update it
+                    False- If a subscription already exists, throw warning
+            skip_initial_notification: see `post_subscription`
+            max_workers: Number of parallel requests used to create and
+                update the subscriptions.
+            refresh_index: If True, the index of existing subscriptions is
+                reloaded from the context broker before posting.
+
+        Returns:
+            List of the ids of the (created) subscriptions in the order of
+            the given subscriptions
+        """
+        if refresh_index or self._subscription_index is None:
+            self._build_subscription_index()
+        params = self._get_skip_initial_notification_params(
+            skip_initial_notification=skip_initial_notification
+        )
+
+        fingerprints = [subscription_hash(sub) for sub in subscriptions]
+        # subscriptions that share a fingerprint are only created once
+        to_create: Dict[str, Subscription] = {}
+        to_update: Dict[str, Subscription] = {}
+        for fingerprint, subscription in zip(fingerprints, subscriptions):
+            if fingerprint in to_create or fingerprint in to_update:
+                continue
+            ex_id = self._subscription_index.get(fingerprint)
+            if ex_id is None:
+                to_create[fingerprint] = subscription
+            elif update:
+                # the given subscriptions are not changed
+                to_update[fingerprint] = subscription.model_copy(update={"id": ex_id})
+            else:
+                warnings.warn(f"Subscription existed already with the id {ex_id}")
+        self.logger.info(
+            "Creating %s and updating %s of %s subscriptions",
+            len(to_create),
+            len(to_update),
+            len(subscriptions),
+        )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.update_subscription, subscription=sub)
+                for sub in to_update.values()
+            ]
+            futures.extend(
+                executor.submit(
+                    self._create_subscription, subscription=sub, params=params
+                )
+                for sub in to_create.values()
+            )
+            # propagate errors of the single requests
+            for future in futures:
+                future.result()
+        return [self._subscription_index[fingerprint] for fingerprint in fingerprints]
+
+    def _get_skip_initial_notification_params(
+        self, skip_initial_notification: bool
+    ) -> Dict:
+        """
+        Returns the query parameters required to skip the initial
+        notification of a new subscription.
+
+        Args:
+            skip_initial_notification: Whether the initial notification
+                should be skipped
+
+        Returns:
+            Dictionary with query parameters
+        """
         params = {}
         if skip_initial_notification:
             version = self.get_version()["orion"]["version"]
@@ -1553,7 +1631,19 @@ class ContextBrokerClient(BaseHttpClient):
                 f"refactoring and updating your services",
                 DeprecationWarning,
             )
+        return params
 
+    def _create_subscription(self, subscription: Subscription, params: Dict) -> str:
+        """
+        Creates a new subscription without checking for duplicates.
+
+        Args:
+            subscription: Subscription to create
+            params: Query parameters of the request
+
+        Returns:
+            str: Id of the created subscription
+        """
         url = urljoin(self.base_url, "v2/subscriptions")
         headers = self.headers.copy()
         headers.update({"Content-Type": "application/json"})
@@ -1577,12 +1667,65 @@ class ContextBrokerClient(BaseHttpClient):
             )
             if res.ok:
                 self.logger.info("Subscription successfully created!")
-                return res.headers["Location"].split("/")[-1]
+                subscription_id = res.headers["Location"].split("/")[-1]
+                self._add_to_subscription_index(
+                    subscription_id, subscription_hash(subscription)
+                )
+                return subscription_id
             res.raise_for_status()
         except requests.RequestException as err:
             msg = "Could not send subscription!"
             raise BaseHttpClientException(message=msg, response=err.response) from err
 
+    def _build_subscription_index(self) -> None:
+        """
+        Loads all existing subscriptions and indexes their ids by their
+        fingerprints.
+
+        Returns:
+            None
+        """
+        self._subscription_index = {}
+        self._subscription_fingerprints = {}
+        for sub in self.get_subscription_list():
+            self._add_to_subscription_index(sub.id, subscription_hash(sub))
+
+    def _add_to_subscription_index(
+        self, subscription_id: str, fingerprint: str
+    ) -> None:
+        """
+        Adds a subscription to the index of existing subscriptions. If
+        another subscription with the same fingerprint is indexed already,
+        that one is kept.
+
+        Args:
+            subscription_id: id of the subscription
+            fingerprint: fingerprint of the subscription
+
+        Returns:
+            None
+        """
+        if self._subscription_index is None:
+            return
+        self._subscription_index.setdefault(fingerprint, subscription_id)
+        self._subscription_fingerprints[subscription_id] = fingerprint
+
+    def _drop_from_subscription_index(self, subscription_id: str) -> None:
+        """
+        Removes a subscription from the index of existing subscriptions.
+
+        Args:
+            subscription_id: id of the subscription
+
+        Returns:
+            None
+        """
+        if self._subscription_index is None:
+            return
+        fingerprint = self._subscription_fingerprints.pop(subscription_id, None)
+        if self._subscription_index.get(fingerprint) == subscription_id:
+            del self._subscription_index[fingerprint]
+
     def get_subscription(self, subscription_id: str) -> Subscription:
         """
         Retrieves a subscription from
@@ -1599,8 +1742,8 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=headers)
             if res.ok:
-                self.logger.debug("Received: %s", res.json())
-                return Subscription(**res.json())
+                self.logger.debug("Received: %s", self.parse_json(res))
+                return Subscription(**self.parse_json(res))
             res.raise_for_status()
         except requests.RequestException as err:
             msg = f"Could not load subscription {subscription_id}"
@@ -1663,6 +1806,11 @@ class ContextBrokerClient(BaseHttpClient):
             )
             if res.ok:
                 self.logger.info("Subscription successfully updated!")
+                # subject and notification are always replaced as a whole
+                self._drop_from_subscription_index(subscription.id)
+                self._add_to_subscription_index(
+                    subscription.id, subscription_hash(subscription)
+                )
             else:
                 res.raise_for_status()
         except requests.RequestException as err:
@@ -1685,6 +1833,7 @@ class ContextBrokerClient(BaseHttpClient):
                 self.logger.info(
                     f"Subscription '{subscription_id}' " f"successfully deleted!"
                 )
+                self._drop_from_subscription_index(subscription_id)
             else:
                 res.raise_for_status()
         except requests.RequestException as err:
@@ -1764,8 +1913,8 @@ class ContextBrokerClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=headers)
             if res.ok:
-                self.logger.debug("Received: %s", res.json())
-                return Registration(**res.json())
+                self.logger.debug("Received: %s", self.parse_json(res))
+                return Registration(**self.parse_json(res))
             res.raise_for_status()
         except requests.RequestException as err:
             msg = f"Could not load registration {registration_id} !"
@@ -2203,85 +2352,9 @@ class ContextBrokerClient(BaseHttpClient):
         Compares two lists ignoring order.
         Handles unhashable types like dictionaries and mixed types.
         """
-        # 1. Quick check: if lengths differ, they are not equal
+        # Quick check: if lengths differ, they are not equal
         if len(list_a) != len(list_b):
             return False
-
-        # 2. Define a helper to create a comparable string signature for any item
-        def get_canonical_key(item):
-            # For lists, we recursively sort them so nested lists are also order-independent
-            if isinstance(item, list):
-                return json.dumps(sorted(item, key=lambda x: get_canonical_key(x)))
-
-            # For everything else (int, str, dict, obj), just use the string representation
-            return str(item)
-
-        # 3. Sort both lists using the canonical key and compare
-        return sorted(list_a, key=get_canonical_key) == sorted(
-            list_b, key=get_canonical_key
+        return canonicalize(list_a, ignore_empty=False) == canonicalize(
+            list_b, ignore_empty=False
         )
-
-    def _subscription_dicts_are_equal(self, first: dict, second: dict):
-        """
-        Check if two dictionaries and all sub-dictionaries are equal.
-        Logs a warning if the keys are not equal, but ignores the
-        comparison of such keys.
-
-        Args:
-            first dict: Dictionary of first subscription
-            second dict: Dictionary of second subscription
-
-        Returns:
-            True if equal, else False
-        """
-
-        def _value_is_not_none(value):
-            """
-            Recursive function to check if a value equals none.
-            If the value is a dict and any value of the dict is not none,
-            the value is not none.
-            If the value is a list and any item is not none, the value is not none.
-            If it's neither dict nore list, bool is used.
-            """
-            if isinstance(value, dict):
-                return any([_value_is_not_none(value=_v) for _v in value.values()])
-            if isinstance(value, list):
-                return any([_value_is_not_none(value=_v) for _v in value])
-            else:
-                return bool(value)
-
-        if first.keys() != second.keys():
-            warnings.warn(
-                "Subscriptions contain a different set of fields. "
-                "Only comparing to new fields of the new one."
-            )
-        for k, v in first.items():
-            ex_value = second.get(k, None)
-            if isinstance(v, dict) and isinstance(ex_value, dict):
-                equal = self._subscription_dicts_are_equal(v, ex_value)
-                if equal:
-                    continue
-                else:
-                    return False
-            elif isinstance(v, list) and isinstance(ex_value, list):
-                equal = self.compare_lists_ignore_order(v, ex_value)
-                if equal:
-                    continue
-                else:
-                    return False
-            else:
-                equal = v == ex_value
-                if equal:
-                    continue
-                else:
-                    self.logger.debug(
-                        f"Not equal fields for key {k}: ({v}, {ex_value})"
-                    )
-                    if (
-                        not _value_is_not_none(v)
-                        and not _value_is_not_none(ex_value)
-                        or k == "timesSent"
-                    ):
-                        continue
-                    return False
-        return True
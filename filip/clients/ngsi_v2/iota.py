@@ -4,13 +4,24 @@ IoT-Agent Module for API Client
 
 from __future__ import annotations
 
-import json
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
-from typing import List, Dict, Set, TYPE_CHECKING, Union, Optional
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    List,
+    Dict,
+    Set,
+    TYPE_CHECKING,
+    Tuple,
+    Union,
+    Optional,
+)
 import warnings
 from urllib.parse import urljoin
 import requests
-from pydantic import AnyHttpUrl, ValidationError
+from pydantic import AnyHttpUrl, PositiveInt, ValidationError
 from pydantic.type_adapter import TypeAdapter
 from filip.config import settings
 from filip.clients.base_http_client import BaseHttpClient
@@ -21,12 +32,36 @@ from filip.models.ngsi_v2.iot import (
     ServiceGroup,
     DeviceValidationList,
     DeviceList,
+    VALIDATE_EXPRESSIONS,
 )
 
 from filip.utils.filter import filter_device_list, filter_group_list
 
 if TYPE_CHECKING:
     from filip.clients.ngsi_v2.cb import ContextBrokerClient
+    from filip.models.ngsi_v2.context import ContextEntity
+
+# Device fields that can only be changed by deleting and reposting the device
+DEVICE_SETTINGS_FIELDS = {
+    "device_id",
+    "service",
+    "service_path",
+    "entity_name",
+    "entity_type",
+    "timestamp",
+    "apikey",
+    "endpoint",
+    "protocol",
+    "transport",
+    "expressionLanguage",
+}
+
+# Device fields that are changed by `update_device`
+DEVICE_UPDATE_FIELDS = {"attributes", "lazy", "commands", "static_attributes"}
+
+# Default maximal body size in bytes of bulk provisioning requests. The
+# IoT-Agents parse request bodies with the default limit of body-parser (100kb)
+MAX_BULK_PAYLOAD_SIZE = 100_000
 
 
 class IoTAClient(BaseHttpClient):
@@ -39,6 +74,9 @@ class IoTAClient(BaseHttpClient):
         url: Url of IoT-Agent
         session (requests.Session):
         fiware_header (FiwareHeader): fiware service and fiware service path
+        validate_expressions (bool): If False, the expressions of devices
+            that are retrieved from the IoT-Agent are not validated. The
+            agent already validated them on provisioning.
         **kwargs (Optional): Optional arguments that ``request`` takes.
     """
 
@@ -48,6 +86,7 @@ class IoTAClient(BaseHttpClient):
         *,
         session: requests.Session = None,
         fiware_header: FiwareHeader = None,
+        validate_expressions: bool = True,
         **kwargs,
     ):
         # set service url
@@ -55,6 +94,14 @@ class IoTAClient(BaseHttpClient):
         super().__init__(
             url=url, session=session, fiware_header=fiware_header, **kwargs
         )
+        self.validate_expressions = validate_expressions
+
+    @property
+    def _device_context(self) -> Dict[str, Any]:
+        """
+        Validation context for devices retrieved from the IoT-Agent
+        """
+        return {VALIDATE_EXPRESSIONS: self.validate_expressions}
 
     # ABOUT API
     def get_version(self) -> Dict:
@@ -68,7 +115,7 @@ class IoTAClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=self.headers)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -82,16 +129,25 @@ class IoTAClient(BaseHttpClient):
         self,
         service_groups: Union[ServiceGroup, List[ServiceGroup]],
         update: bool = False,
+        max_payload_size: PositiveInt = MAX_BULK_PAYLOAD_SIZE,
+        existing_group_keys: Set[Tuple[str, str]] = None,
     ):
         """
         Creates a set of service groups for the given service and service_path.
         The service_group and subservice information will taken from the
         headers, overwriting any preexisting values.
 
+        The service groups are posted in chunks that respect the given
+        payload size (see `_post_bulk`).
+
         Args:
             service_groups (list of ServiceGroup): Service groups that will be
             posted to the agent's API
             update (bool): If service group already exists try to update its
+            max_payload_size: Maximal body size of a single request in bytes
+            existing_group_keys: (resource, apikey) of the service groups
+                that are known to exist. If omitted, the service groups are
+                listed before several service groups are posted
 
         Returns:
             None
@@ -109,31 +165,29 @@ class IoTAClient(BaseHttpClient):
                 ), "Service group subservice does not match fiware service path"
 
         url = urljoin(self.base_url, "iot/services")
-        headers = self.headers
-        data = {
-            "services": [
-                group.model_dump(exclude={"service", "subservice"}, exclude_none=True)
-                for group in service_groups
-            ]
-        }
+        payloads = [
+            group.model_dump_json(exclude={"service", "subservice"}, exclude_none=True)
+            for group in service_groups
+        ]
         try:
-            res = self.post(url=url, headers=headers, json=data)
-            if res.ok:
-                self.logger.info("Services successfully posted")
-            elif res.status_code == 409:
-                self.logger.warning(res.text)
-                if len(service_groups) > 1:
-                    self.logger.info(
-                        "Trying to split bulk operation into " "single operations"
-                    )
-                    for group in service_groups:
-                        self.post_group(service_group=group, update=update)
-                elif update is True:
-                    self.update_group(service_group=service_groups[0], fields=None)
+            failed = self._post_bulk(
+                url=url,
+                key="services",
+                payloads=payloads,
+                keys=[(group.resource, group.apikey) for group in service_groups],
+                existing_keys=existing_group_keys,
+                get_existing_keys=lambda: {
+                    (group.resource, group.apikey) for group in self.get_group_list()
+                },
+                max_payload_size=max_payload_size,
+            )
+            for index, res in failed.items():
+                if update and res.status_code == 409:
+                    self.update_group(service_group=service_groups[index], fields=None)
                 else:
+                    self.logger.warning(res.text)
                     res.raise_for_status()
-            else:
-                res.raise_for_status()
+            self.logger.info("Services successfully posted")
         except requests.RequestException as err:
             self.logger.error(err)
             msg = "Could not post group because of following reason: " + str(
@@ -171,7 +225,7 @@ class IoTAClient(BaseHttpClient):
             res = self.get(url=url, headers=headers)
             if res.ok:
                 ta = TypeAdapter(List[ServiceGroup])
-                return ta.validate_python(res.json()["services"])
+                return ta.validate_python(self.parse_json(res)["services"])
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -314,44 +368,70 @@ class IoTAClient(BaseHttpClient):
 
     # DEVICE API
     def post_devices(
-        self, *, devices: Union[Device, List[Device]], update: bool = False
+        self,
+        *,
+        devices: Union[Device, List[Device]],
+        update: bool = False,
+        max_payload_size: PositiveInt = MAX_BULK_PAYLOAD_SIZE,
+        existing_device_ids: Set[str] = None,
     ) -> None:
         """
         Post a device from the device registry. No payload is required
         or received.
         If a device already exists in can be updated with update = True
+
+        Every device is serialized once and the devices are posted in chunks
+        that respect the given payload size. If a chunk is rejected, it is
+        bisected until the conflicting devices are isolated
+        (see `_post_bulk`).
+
         Args:
             devices (list of Devices):
             update (bool):  Whether if the device is already existent it
             should be updated
+            max_payload_size: Maximal body size of a single request in bytes
+            existing_device_ids: Ids of the devices that are known to exist.
+                If omitted, the devices are listed before several devices
+                are posted
         Returns:
             None
         """
         if not isinstance(devices, list):
             devices = [devices]
         url = urljoin(self.base_url, "iot/devices")
-        headers = self.headers
-
-        data = {
-            "devices": [
-                json.loads(device.model_dump_json(exclude_none=True))
-                for device in devices
-            ]
-        }
+        payloads = [device.model_dump_json(exclude_none=True) for device in devices]
         try:
-            res = self.post(url=url, headers=headers, json=data)
-            if res.ok:
-                self.logger.info("Devices successfully posted!")
-            else:
-                res.raise_for_status()
+            failed = self._post_bulk(
+                url=url,
+                key="devices",
+                payloads=payloads,
+                keys=[device.device_id for device in devices],
+                existing_keys=existing_device_ids,
+                get_existing_keys=lambda: {
+                    device.device_id for device in self.get_device_list()
+                },
+                max_payload_size=max_payload_size,
+            )
+            conflicts = []
+            for index, res in failed.items():
+                if update and res.status_code == 409:
+                    conflicts.append(devices[index])
+                else:
+                    self.logger.warning(
+                        "Could not post device '%s': %s",
+                        devices[index].device_id,
+                        res.text,
+                    )
+                    res.raise_for_status()
+            self.logger.info("Devices successfully posted!")
         except requests.RequestException as err:
-            if update:
-                return self.update_devices(devices=devices, add=False)
             self.logger.error(err)
             msg = "Could not post devices because of following reason: " + str(
                 err.args[0]
             )
             raise BaseHttpClientException(message=msg, response=err.response) from err
+        if conflicts:
+            self.update_devices(devices=conflicts, add=False)
 
     def post_device(self, *, device: Device, update: bool = False) -> None:
         """
@@ -423,9 +503,11 @@ class IoTAClient(BaseHttpClient):
                     valid_devices = []
                     invalid_devices = []
                     ta = TypeAdapter(Device)
-                    for device in res.json()["devices"]:
+                    for device in self.parse_json(res)["devices"]:
                         try:
-                            valid_device = ta.validate_python(device)
+                            valid_device = ta.validate_python(
+                                device, context=self._device_context
+                            )
                             valid_devices.append(valid_device)
                         except ValidationError:
                             invalid_devices.append(device.get("device_id"))
@@ -444,7 +526,8 @@ class IoTAClient(BaseHttpClient):
                 else:
                     return filter_device_list(
                         devices=DeviceList.model_validate(
-                            {"devices": res.json()["devices"]}
+                            {"devices": self.parse_json(res)["devices"]},
+                            context=self._device_context,
                         ).devices,
                         device_ids=device_ids,
                         entity_names=entity_names,
@@ -476,7 +559,9 @@ class IoTAClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=headers)
             if res.ok:
-                return Device.model_validate(res.json())
+                return Device.model_validate(
+                    self.parse_json(res), context=self._device_context
+                )
             res.raise_for_status()
         except requests.RequestException as err:
             self.logger.error(err)
@@ -506,7 +591,7 @@ class IoTAClient(BaseHttpClient):
                 url=url,
                 headers=headers,
                 json=device.model_dump(
-                    include={"attributes", "lazy", "commands", "static_attributes"},
+                    include=DEVICE_UPDATE_FIELDS,
                     exclude_none=True,
                 ),
             )
@@ -522,21 +607,32 @@ class IoTAClient(BaseHttpClient):
             raise BaseHttpClientException(message=msg, response=err.response) from err
 
     def update_devices(
-        self, *, devices: Union[Device, List[Device]], add: False
+        self,
+        *,
+        devices: Union[Device, List[Device]],
+        add: False,
+        max_workers: PositiveInt = 1,
     ) -> None:
         """
         Bulk operation for device update.
         Args:
             devices:
             add:
+            max_workers: Number of devices that are updated in parallel
 
         Returns:
 
         """
         if not isinstance(devices, list):
             devices = [devices]
-        for device in devices:
-            self.update_device(device=device, add=add)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.update_device, device=device, add=add)
+                for device in devices
+            ]
+            # propagate errors of the single requests
+            for future in futures:
+                future.result()
 
     def delete_device(
         self,
@@ -679,22 +775,8 @@ class IoTAClient(BaseHttpClient):
 
         # if the device settings were changed we need to delete the device
         # and repost it
-        settings_dict = {
-            "device_id",
-            "service",
-            "service_path",
-            "entity_name",
-            "entity_type",
-            "timestamp",
-            "apikey",
-            "endpoint",
-            "protocol",
-            "transport",
-            "expressionLanguage",
-        }
-
-        live_settings = live_device.model_dump(include=settings_dict)
-        new_settings = device.model_dump(include=settings_dict)
+        live_settings = live_device.model_dump(include=DEVICE_SETTINGS_FIELDS)
+        new_settings = device.model_dump(include=DEVICE_SETTINGS_FIELDS)
 
         if not live_settings == new_settings:
             self.delete_device(
@@ -718,68 +800,372 @@ class IoTAClient(BaseHttpClient):
         # update context entry
         # 1. build context entity from information in device
         # 2. patch it
-        from filip.models.ngsi_v2.context import ContextEntity, NamedContextAttribute
+        if patch_entity:
+            cb_client_local = self._get_local_cb_client(
+                cb_client=cb_client, cb_url=cb_url
+            )
+            cb_client_local.override_entity(
+                entity=self._build_context_entity_from_device(device)
+            )
+            cb_client_local.close()
 
-        def build_context_entity_from_device(device: Device) -> ContextEntity:
-            from filip.models.base import DataType
-
-            entity = ContextEntity(id=device.entity_name, type=device.entity_type)
-
-            for command in device.commands:
-                entity.add_attributes(
-                    [
-                        # Command attribute will be registered by the device_update
-                        NamedContextAttribute(
-                            name=f"{command.name}_info", type=DataType.COMMAND_RESULT
-                        ),
-                        NamedContextAttribute(
-                            name=f"{command.name}_status", type=DataType.COMMAND_STATUS
-                        ),
-                    ]
-                )
-            for attribute in device.attributes:
-                entity.add_attributes(
-                    [
-                        NamedContextAttribute(
-                            name=attribute.name,
-                            type=DataType.STRUCTUREDVALUE,
-                            metadata=attribute.metadata,
-                        )
-                    ]
+    def patch_devices(
+        self,
+        devices: List[Device],
+        patch_entity: bool = True,
+        cb_client: ContextBrokerClient = None,
+        cb_url: AnyHttpUrl = settings.CB_URL,
+        max_workers: PositiveInt = 1,
+        chunk_size: PositiveInt = 100,
+        plan: Dict[str, List[str]] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Bulk version of `patch_device`. The current state of all devices is
+        fetched with a single request. Afterwards, each device is classified
+        (see `plan_device_changes`):
+
+        - 'create': the device is posted
+        - 'recreate': the device and its entity are deleted and the device is
+          reposted
+        - 'update': the device is updated
+        - 'unchanged': nothing to do
+
+        Devices are deleted and updated concurrently and posted with a single
+        bulk request. The corresponding context entities are deleted and
+        overridden with chunked batch operations on the context broker.
+
+        Args:
+            devices (List[Device]): Devices to be posted to /updated in Fiware
+            patch_entity (bool): If true the corresponding entities of
+                updated devices are completely synced
+            cb_client (ContextBrokerClient):
+                Corresponding ContextBrokerClient object for entity manipulation
+            cb_url (AnyHttpUrl):
+                Url of the ContextBroker where the entity is found.
+                This will autogenerate an CB-Client, mirroring the information
+                of the IoTA-Client, e.g. FiwareHeader, and other headers
+                (not recommended!)
+            max_workers: Number of parallel requests to the IoT-Agent
+            chunk_size: Maximal number of entities per batch operation
+            plan: Result of `plan_device_changes` for the given devices. If
+                omitted, the plan is computed from the live devices.
+                Otherwise, only the live state of the devices to recreate is
+                fetched, because their old entities need to be deleted.
+
+        Returns:
+            Dictionary with the device ids per action
+        """
+        from filip.models.ngsi_v2.context import ActionType, ContextEntity
+
+        live_devices = None
+        if plan is None:
+            live_devices = self.get_device_list()
+            plan = self.plan_device_changes(devices=devices, live_devices=live_devices)
+        elif plan["recreate"]:
+            live_devices = self.get_device_list(device_ids=plan["recreate"])
+        devices_by_id = {device.device_id: device for device in devices}
+        # the entities of recreated devices are deleted by their live state,
+        # as the entity name or type may have changed
+        live_devices_by_id = {device.device_id: device for device in live_devices or []}
+        self.logger.info(
+            "Patching devices: %s",
+            {action: len(device_ids) for action, device_ids in plan.items()},
+        )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.delete,
+                    url=urljoin(self.base_url, f"iot/devices/{device_id}"),
+                    headers=self.headers,
                 )
-            for static_attribute in device.static_attributes:
-                entity.add_attributes(
-                    [
-                        NamedContextAttribute(
-                            name=static_attribute.name,
-                            type=static_attribute.type,
-                            value=static_attribute.value,
-                            metadata=static_attribute.metadata,
-                        )
-                    ]
+                for device_id in plan["recreate"]
+            ]
+            futures.extend(
+                executor.submit(
+                    self.update_device, device=devices_by_id[device_id], add=False
                 )
-            return entity
+                for device_id in plan["update"]
+            )
+            for future in futures:
+                res = future.result()
+                if res is not None and not res.ok:
+                    try:
+                        res.raise_for_status()
+                    except requests.RequestException as err:
+                        msg = "Could not delete device before reposting it!"
+                        raise BaseHttpClientException(
+                            message=msg, response=err.response
+                        ) from err
+
+        recreated = [devices_by_id[device_id] for device_id in plan["recreate"]]
+        deleted = [
+            live_devices_by_id.get(device_id, devices_by_id[device_id])
+            for device_id in plan["recreate"]
+        ]
+        updated = [devices_by_id[device_id] for device_id in plan["update"]]
+        if recreated or (updated and patch_entity):
+            cb_client_local = self._get_local_cb_client(
+                cb_client=cb_client, cb_url=cb_url
+            )
+            # delete the entities of the recreated devices
+            for chunk in self._chunks(deleted, chunk_size):
+                try:
+                    cb_client_local.update(
+                        entities=[
+                            ContextEntity(
+                                id=device.entity_name, type=device.entity_type
+                            )
+                            for device in chunk
+                        ],
+                        action_type=ActionType.DELETE,
+                    )
+                except requests.RequestException as err:
+                    # It is only important that the entities do not exist
+                    # anymore, not if this method actively deleted them
+                    self.logger.debug(err)
+            if patch_entity:
+                for chunk in self._chunks(updated, chunk_size):
+                    cb_client_local.update(
+                        entities=[
+                            self._build_context_entity_from_device(device)
+                            for device in chunk
+                        ],
+                        action_type=ActionType.REPLACE,
+                    )
+            cb_client_local.close()
 
-        if patch_entity:
-            from filip.clients.ngsi_v2 import ContextBrokerClient
+        new_devices = [
+            devices_by_id[device_id] for device_id in plan["create"] + plan["recreate"]
+        ]
+        if new_devices:
+            # according to the plan none of the new devices exists
+            self.post_devices(devices=new_devices, existing_device_ids=set())
+        return plan
+
+    def plan_device_changes(
+        self, devices: List[Device], live_devices: List[Device] = None
+    ) -> Dict[str, List[str]]:
+        """
+        Compares the given devices with their live state in the IoT-Agent
+        and classifies them by the action required to sync them:
+
+        - 'create': the device does not exist yet
+        - 'recreate': the device settings changed
+        - 'update': only the attributes changed
+        - 'unchanged': nothing to do
 
-            if cb_client:
-                cb_client_local = deepcopy(cb_client)
+        Args:
+            devices: Desired device configurations
+            live_devices: Current device configurations. If omitted, they
+                are fetched from the IoT-Agent.
+
+        Returns:
+            Dictionary with the device ids for the actions 'create',
+            'recreate', 'update' and 'unchanged'
+        """
+        if live_devices is None:
+            live_devices = self.get_device_list()
+        live_devices = {device.device_id: device for device in live_devices}
+        plan = {"create": [], "recreate": [], "update": [], "unchanged": []}
+        for device in devices:
+            live_device = live_devices.get(device.device_id)
+            if live_device is None:
+                plan["create"].append(device.device_id)
+            elif live_device.model_dump(
+                include=DEVICE_SETTINGS_FIELDS
+            ) != device.model_dump(include=DEVICE_SETTINGS_FIELDS):
+                plan["recreate"].append(device.device_id)
+            elif live_device.model_dump(
+                include=DEVICE_UPDATE_FIELDS, exclude_none=True
+            ) != device.model_dump(include=DEVICE_UPDATE_FIELDS, exclude_none=True):
+                plan["update"].append(device.device_id)
             else:
-                warnings.warn(
-                    "No `ContextBrokerClient` object provided! "
-                    "Will try to generate one. "
-                    "This usage is not recommended."
-                )
+                plan["unchanged"].append(device.device_id)
+        return plan
 
-                cb_client_local = ContextBrokerClient(
-                    url=cb_url, fiware_header=self.fiware_headers, headers=self.headers
-                )
+    @staticmethod
+    def _chunks(items: List, chunk_size: int):
+        """
+        Yields successive chunks of a list
+        """
+        for i in range(0, len(items), chunk_size):
+            yield items[i : i + chunk_size]
 
-            cb_client_local.override_entity(
-                entity=build_context_entity_from_device(device)
+    def _post_bulk(
+        self,
+        *,
+        url: str,
+        key: str,
+        payloads: List[str],
+        keys: List[Hashable],
+        existing_keys: Optional[Set[Hashable]],
+        get_existing_keys: Callable[[], Set[Hashable]],
+        max_payload_size: int,
+    ) -> Dict[int, requests.Response]:
+        """
+        Posts serialized items as `{key: [items]}` in chunks whose bodies do
+        not exceed `max_payload_size`. Single items that exceed the limit are
+        sent on their own.
+
+        The IoT-Agent does not roll back the valid items of a rejected chunk.
+        Hence, if a chunk is rejected with a client error (e.g. a conflict),
+        the existing items are read again. Items that existed before are
+        reported as conflicts with the response of the chunk, items that were
+        created are done. Only the missing items are posted again and split in
+        halves, until the failing items are isolated. Hence, a single conflict
+        among n items costs at most about 2*log2(n) additional requests.
+
+        Args:
+            url: Url of the bulk endpoint
+            key: Name of the list in the request body
+            payloads: Json serialized items
+            keys: Identifying keys of the items, e.g. the device ids
+            existing_keys: Keys of the items that existed before posting, if
+                known by the caller. Only the given keys need to be included.
+            get_existing_keys: Function returning the keys of all existing
+                items. It is called after each rejected chunk and, if
+                `existing_keys` is omitted, once before posting several
+                items.
+            max_payload_size: Maximal body size in bytes
+
+        Returns:
+            Dictionary of the indices of failed items and their responses
+
+        Raises:
+            requests.RequestException: If a request fails for any other reason
+        """
+        headers = self.headers.copy()
+        headers.update({"Content-Type": "application/json"})
+        prefix = f'{{"{key}":['.encode()
+        suffix = b"]}"
+        payloads = [payload.encode() for payload in payloads]
+
+        # pack the items into chunks that respect the size limit
+        chunks = []
+        chunk, size = [], len(prefix) + len(suffix)
+        for index, payload in enumerate(payloads):
+            # items are separated by a comma
+            if chunk and size + len(payload) + 1 > max_payload_size:
+                chunks.append(chunk)
+                chunk, size = [], len(prefix) + len(suffix)
+            chunk.append(index)
+            size += len(payload) + 1
+        if chunk:
+            chunks.append(chunk)
+        # chunks are used as stack, hence the reversal keeps the input order
+        chunks.reverse()
+
+        # a rejected single item is the culprit, no need to tell the items
+        # created by this method from existing ones
+        if existing_keys is not None:
+            existing_before = existing_keys
+        elif len(payloads) > 1:
+            existing_before = get_existing_keys()
+        else:
+            existing_before = set()
+
+        failed = {}
+        while chunks:
+            chunk = chunks.pop()
+            res = self.post(
+                url=url,
+                headers=headers,
+                data=prefix + b",".join(payloads[i] for i in chunk) + suffix,
             )
-            cb_client_local.close()
+            if res.ok:
+                continue
+            if not 400 <= res.status_code < 500:
+                res.raise_for_status()
+            if len(chunk) == 1:
+                failed[chunk[0]] = res
+                continue
+
+            existing = get_existing_keys()
+            missing = []
+            for index in chunk:
+                if keys[index] not in existing:
+                    missing.append(index)
+                elif keys[index] in existing_before:
+                    failed[index] = res
+            self.logger.debug(
+                "Bulk request with %s items rejected, %s items are missing",
+                len(chunk),
+                len(missing),
+            )
+            if len(missing) == len(chunk):
+                middle = len(missing) // 2
+                chunks.extend([missing[middle:], missing[:middle]])
+            elif missing:
+                chunks.append(missing)
+        return dict(sorted(failed.items()))
+
+    def _get_local_cb_client(
+        self,
+        cb_client: ContextBrokerClient = None,
+        cb_url: AnyHttpUrl = settings.CB_URL,
+    ) -> ContextBrokerClient:
+        """
+        Returns a copy of the given context broker client or creates a new
+        one that mirrors the settings of this client.
+        """
+        from filip.clients.ngsi_v2 import ContextBrokerClient
+
+        if cb_client:
+            return deepcopy(cb_client)
+        warnings.warn(
+            "No `ContextBrokerClient` object provided! "
+            "Will try to generate one. "
+            "This usage is not recommended."
+        )
+        return ContextBrokerClient(
+            url=cb_url, fiware_header=self.fiware_headers, headers=self.headers
+        )
+
+    @staticmethod
+    def _build_context_entity_from_device(device: Device) -> ContextEntity:
+        """
+        Builds the context entity that the IoT-Agent creates for a device.
+        """
+        from filip.models.base import DataType
+        from filip.models.ngsi_v2.context import ContextEntity, NamedContextAttribute
+
+        entity = ContextEntity(id=device.entity_name, type=device.entity_type)
+
+        for command in device.commands:
+            entity.add_attributes(
+                [
+                    # Command attribute will be registered by the device_update
+                    NamedContextAttribute(
+                        name=f"{command.name}_info", type=DataType.COMMAND_RESULT
+                    ),
+                    NamedContextAttribute(
+                        name=f"{command.name}_status", type=DataType.COMMAND_STATUS
+                    ),
+                ]
+            )
+        for attribute in device.attributes:
+            entity.add_attributes(
+                [
+                    NamedContextAttribute(
+                        name=attribute.name,
+                        type=DataType.STRUCTUREDVALUE,
+                        metadata=attribute.metadata,
+                    )
+                ]
+            )
+        for static_attribute in device.static_attributes:
+            entity.add_attributes(
+                [
+                    NamedContextAttribute(
+                        name=static_attribute.name,
+                        type=static_attribute.type,
+                        value=static_attribute.value,
+                        metadata=static_attribute.metadata,
+                    )
+                ]
+            )
+        return entity
 
     def does_device_exists(self, device_id: str) -> bool:
         """
@@ -817,7 +1203,7 @@ class IoTAClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=headers)
             if res.ok:
-                return res.json()["level"]
+                return self.parse_json(res)["level"]
             res.raise_for_status()
         except requests.RequestException as err:
             self.log_error(err=err)
@@ -72,7 +72,7 @@ class QuantumLeapClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=self.headers)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.exceptions.RequestException as err:
             self.logger.error(err)
@@ -97,7 +97,7 @@ class QuantumLeapClient(BaseHttpClient):
         try:
             res = self.get(url=url, headers=self.headers)
             if res.ok:
-                return res.json()
+                return self.parse_json(res)
             res.raise_for_status()
         except requests.exceptions.RequestException as err:
             self.logger.error(err)
@@ -385,13 +385,13 @@ class QuantumLeapClient(BaseHttpClient):
                 res = self.get(url=url, params=params, headers=headers)
 
                 if res.ok:
-                    self.logger.debug("Received: %s", res.json())
+                    self.logger.debug("Received: %s", self.parse_json(res))
 
                     # revert append direction when using last_n
                     if last_n:
-                        res_q.appendleft(res.json())
+                        res_q.appendleft(self.parse_json(res))
                     else:
-                        res_q.append(res.json())
+                        res_q.append(self.parse_json(res))
                 res.raise_for_status()
 
             except requests.exceptions.RequestException as err:
@@ -5,6 +5,7 @@ example for other applications such as webapp that use the library. Using
 provides a convenient and clean way to manage environments.
 """
 
+from typing import Literal
 from pydantic import Field, AnyHttpUrl, AliasChoices, AnyUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
@@ -67,6 +68,12 @@ class Settings(BaseSettings):
 
     MINIMUM_ORION_VERSION: str = "3.6.0"
 
+    JSON_BACKEND: Literal["auto", "orjson", "json"] = Field(
+        default="auto",
+        description="Json backend of the clients and encoders. 'auto' uses "
+        "orjson if it is installed.",
+    )
+
 
 # create settings object
 settings = Settings()
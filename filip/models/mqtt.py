@@ -2,7 +2,9 @@
 Module contains models for MQTT communication with FIWARE's IoT-Agents.
 """
 
+from typing import List, Optional
 from aenum import Enum
+from pydantic import BaseModel, Field
 
 
 class IoTAMQTTMessageType(str, Enum):
@@ -16,3 +18,66 @@ class IoTAMQTTMessageType(str, Enum):
     MULTI = "multi", "Multi measurement"
     SINGLE = "single", "Single measurement"
     CONFIG = "configuration", "Configuration message"
+
+
+class PublishStats(BaseModel):
+    """
+    Aggregated delivery statistics of a bulk publish. Latencies are measured
+    from handing a message to the client until the broker acknowledged it
+    (QoS 1 and 2) or it was written to the socket (QoS 0).
+    """
+
+    messages: int = Field(default=0, description="Number of messages to publish")
+    published: int = Field(
+        default=0, description="Number of messages that were confirmed as published"
+    )
+    failed: int = Field(
+        default=0,
+        description="Number of messages that were rejected by the client, "
+        "e.g. because it is not connected or its queue is full",
+    )
+    timed_out: int = Field(
+        default=0,
+        description="Number of messages that were not confirmed within the " "timeout",
+    )
+    duration: float = Field(default=0.0, description="Total duration in seconds")
+    latency_p50: Optional[float] = Field(
+        default=None, description="Median latency in seconds"
+    )
+    latency_p90: Optional[float] = Field(
+        default=None, description="90th percentile of the latency in seconds"
+    )
+    latency_p99: Optional[float] = Field(
+        default=None, description="99th percentile of the latency in seconds"
+    )
+    latency_max: Optional[float] = Field(
+        default=None, description="Maximal latency in seconds"
+    )
+
+    def set_latencies(self, latencies: List[float]) -> None:
+        """
+        Sets the latency percentiles (nearest rank) from measured latencies
+
+        Args:
+            latencies: Latencies of the confirmed messages in seconds
+
+        Returns:
+            None
+        """
+        if not latencies:
+            return
+        latencies = sorted(latencies)
+        last = len(latencies) - 1
+        self.latency_p50 = latencies[round(0.5 * last)]
+        self.latency_p90 = latencies[round(0.9 * last)]
+        self.latency_p99 = latencies[round(0.99 * last)]
+        self.latency_max = latencies[-1]
+
+    @property
+    def throughput(self) -> float:
+        """
+        Confirmed messages per second
+        """
+        if not self.duration:
+            return 0.0
+        return self.published / self.duration
@@ -4,10 +4,10 @@ Module contains models for accessing and interaction with FIWARE's IoT-Agents.
 
 from __future__ import annotations
 import logging
-import itertools
 import warnings
 from enum import Enum
-from typing import Any, Dict, Optional, List, Union
+from collections import Counter
+from typing import Any, Dict, Optional, List, Tuple, Union
 import pytz
 from pydantic import (
     field_validator,
@@ -17,6 +17,8 @@ from pydantic import (
     Field,
     AnyHttpUrl,
     OnErrorOmit,
+    PrivateAttr,
+    ValidationInfo,
 )
 from filip.models.base import NgsiVersion, DataType
 from filip.models.ngsi_v2.base import (
@@ -34,6 +36,10 @@ from filip.utils.validators import (
 
 logger = logging.getLogger()
 
+# Key of the validation context to disable the validation of expressions,
+# e.g. `Device.model_validate(data, context={VALIDATE_EXPRESSIONS: False})`
+VALIDATE_EXPRESSIONS = "validate_expressions"
+
 
 class ExpressionLanguage(str, Enum):
     """
@@ -441,6 +447,11 @@ class Device(DeviceSettings):
         "v2 or ld. The default is v2. When not running in "
         "mixed mode, this field is ignored.",
     )
+    # Fingerprint of the attribute lists and index of all attributes by
+    # name, see `get_attribute`
+    _attribute_index: Optional[Tuple[Tuple, Dict[str, Tuple[int, int]]]] = PrivateAttr(
+        default=None
+    )
 
     @field_validator("timezone")
     @classmethod
@@ -454,17 +465,21 @@ class Device(DeviceSettings):
         return value
 
     @model_validator(mode="after")
-    def validate_device_attributes_expression(self):
+    def validate_device_attributes_expression(self, info: ValidationInfo):
         """
         Validates device attributes expressions based on the expression language (JEXL or Legacy, where Legacy is
-        deprecated).
+        deprecated). The validation is skipped if `VALIDATE_EXPRESSIONS` is
+        set to False in the validation context.
 
         Args:
             self: The Device instance.
+            info: Validation info including the context
 
         Returns:
             The Device instance after validation.
         """
+        if info.context and not info.context.get(VALIDATE_EXPRESSIONS, True):
+            return self
         if self.expressionLanguage == ExpressionLanguage.JEXL:
             for attribute in self.attributes:
                 if attribute.expression:
@@ -488,10 +503,16 @@ class Device(DeviceSettings):
         Returns:
             The dict of Device instance after validation.
         """
-        for i, attr in enumerate(self.attributes):
-            for other_attr in self.attributes[:i] + self.attributes[i + 1 :]:
-                if attr.model_dump() == other_attr.model_dump():
+        # Only attributes with equal name, type and object_id can be
+        # identical, hence full comparisons are limited to these groups
+        groups: Dict[Tuple, List[DeviceAttribute]] = {}
+        for attr in self.attributes:
+            group = groups.setdefault((attr.name, attr.type, attr.object_id), [])
+            if group:
+                dump = attr.model_dump()
+                if any(dump == other.model_dump() for other in group):
                     raise ValueError(f"Duplicated attributes found: {attr.name}")
+            group.append(attr)
         return self
 
     @model_validator(mode="after")
@@ -509,16 +530,95 @@ class Device(DeviceSettings):
         Returns:
             The dict of Device instance after validation.
         """
-        for i, attr in enumerate(self.attributes):
-            for other_attr in self.attributes[:i] + self.attributes[i + 1 :]:
-                if (
-                    attr.object_id
-                    and other_attr.object_id
-                    and attr.object_id == other_attr.object_id
-                ):
-                    raise ValueError(f"object_id {attr.object_id} is not unique")
-                if attr.object_id and attr.object_id == other_attr.name:
-                    raise ValueError(f"object_id {attr.object_id} is not unique")
+        object_ids = Counter(attr.object_id for attr in self.attributes)
+        names = Counter(attr.name for attr in self.attributes)
+        for attr in self.attributes:
+            if not attr.object_id:
+                continue
+            # the object_id may be equal to the name of the same attribute
+            same_name = attr.name == attr.object_id
+            if object_ids[attr.object_id] > 1 or names[attr.object_id] > same_name:
+                raise ValueError(f"object_id {attr.object_id} is not unique")
+        return self
+
+    def _get_attribute_lists(self) -> Tuple[List, ...]:
+        """
+        Returns the lists of attributes in the order of their precedence:
+        attributes, lazy, static attributes, internal attributes and commands
+        """
+        return (
+            self.attributes,
+            self.lazy,
+            self.static_attributes or [],
+            self.internal_attributes or [],
+            self.commands,
+        )
+
+    def _get_attribute_index(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the index of all attributes by name. The values are the
+        position of the list in `_get_attribute_lists` and the position of
+        the attribute in that list. If several attributes share a name, the
+        first one wins.
+
+        The index is dropped by `add_attribute`, `update_attribute`,
+        `delete_attribute` and assignments. Lists that were replaced or
+        changed in length are detected by their identity and length. Elements
+        that were replaced in place must be checked by the caller.
+
+        Returns:
+            Dictionary of the positions of the attributes by name
+        """
+        lists = self._get_attribute_lists()
+        key = tuple((id(items), len(items)) for items in lists)
+        cache = self._attribute_index
+        if cache is not None and cache[0] == key:
+            return cache[1]
+        index = {}
+        for list_position, items in enumerate(lists):
+            for position, attribute in enumerate(items):
+                index.setdefault(
+                    self._attribute_name(attribute), (list_position, position)
+                )
+        self._attribute_index = (key, index)
+        return index
+
+    @staticmethod
+    def _attribute_name(attribute: Union[BaseModel, Dict]) -> Optional[str]:
+        """
+        Returns the name of an attribute. Internal attributes are plain
+        dictionaries.
+        """
+        if isinstance(attribute, dict):
+            return attribute.get("name")
+        return attribute.name
+
+    def _invalidate_attribute_index(self) -> None:
+        """
+        Drops the index of attributes by name
+        """
+        self._attribute_index = None
+
+    def __eq__(self, other):
+        # the attribute index is a cache, hence it must not affect equality
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return (
+            self.__class__ is other.__class__
+            and self.__dict__ == other.__dict__
+            and self.__pydantic_extra__ == other.__pydantic_extra__
+        )
+
+    @model_validator(mode="after")
+    def validate_attribute_index(self):
+        """
+        Drops the index of attributes after (re-)validation, e.g. after an
+        assignment
+
+        Returns:
+            The Device instance
+        """
+        self._invalidate_attribute_index()
         return self
 
     def get_attribute(
@@ -527,21 +627,29 @@ class Device(DeviceSettings):
         DeviceAttribute, LazyDeviceAttribute, StaticDeviceAttribute, DeviceCommand
     ]:
         """
+        Returns an attribute or command of the device by name. The lookup
+        uses a cached index (see `_get_attribute_index`).
 
         Args:
-            attribute_name:
+            attribute_name: Name of the attribute
 
         Returns:
+            The attribute
 
+        Raises:
+            KeyError: if the device has no attribute with this name
         """
-        for attribute in itertools.chain(
-            self.attributes,
-            self.lazy,
-            self.static_attributes,
-            self.internal_attributes,
-            self.commands,
-        ):
-            if attribute.name == attribute_name:
+        for rebuild in (False, True):
+            if rebuild:
+                # the index is outdated if attributes were renamed or
+                # replaced in place
+                self._invalidate_attribute_index()
+            location = self._get_attribute_index().get(attribute_name)
+            if location is None:
+                continue
+            list_position, position = location
+            attribute = self._get_attribute_lists()[list_position][position]
+            if self._attribute_name(attribute) == attribute_name:
                 return attribute
         msg = (
             f"Device: {self.device_id}: Could not "
@@ -566,6 +674,7 @@ class Device(DeviceSettings):
         Returns:
             None
         """
+        self._invalidate_attribute_index()
         try:
             if type(attribute) == DeviceAttribute:
                 if attribute.model_dump(exclude_none=True) in [
@@ -628,6 +737,7 @@ class Device(DeviceSettings):
         Returns:
             None
         """
+        self._invalidate_attribute_index()
         try:
             if type(attribute) == DeviceAttribute:
                 idx = self.attributes.index(attribute)
@@ -670,6 +780,7 @@ class Device(DeviceSettings):
         Returns:
 
         """
+        self._invalidate_attribute_index()
         try:
             if type(attribute) == DeviceAttribute:
                 self.attributes.remove(attribute)
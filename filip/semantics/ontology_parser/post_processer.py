@@ -8,7 +8,7 @@ information as: duplicate labels or sort relations
 
 import datetime
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 import stringcase
 
@@ -588,33 +588,77 @@ class PostProcessor:
     def _compute_ancestor_classes(cls, voc_builder: VocabularyBuilder):
         """Compute all ancestor classes of classes
 
+        The ancestors of a class are its parents followed by their ancestors,
+        the ancestors of each class are only computed once and shared with all
+        its children.
+
         Args:
             voc_builder: Builder object for Vocabulary
         Returns:
             None
         """
         vocabulary = voc_builder.vocabulary
-        # clear state
-        for class_ in vocabulary.get_classes():
-            class_.ancestor_class_iris = []
-
+        ancestors: Dict[str, List[str]] = {}
         for class_ in vocabulary.get_classes():
-            queue: List[str] = []
-            queue.extend(class_.parent_class_iris)
+            class_.ancestor_class_iris = cls._get_ancestor_iris(
+                voc_builder, class_.iri, ancestors, set()
+            )[0]
 
-            while len(queue) > 0:
-                parent = queue.pop()
+    @classmethod
+    def _get_ancestor_iris(
+        cls,
+        voc_builder: VocabularyBuilder,
+        class_iri: str,
+        ancestors: Dict[str, List[str]],
+        in_progress: Set[str],
+    ) -> Tuple[List[str], Set[str]]:
+        """Get the ancestors of a class, depth first with the last parent
+        first. Each ancestor is only contained once.
 
-                if not voc_builder.entity_is_known(parent):
-                    continue
+        Args:
+            voc_builder: Builder object for Vocabulary
+            class_iri: Iri of the class
+            ancestors: Ancestors of already computed classes, results are
+                added to it
+            in_progress: Iris of the classes whose ancestors are currently
+                computed
 
-                class_.ancestor_class_iris.append(parent)
-                grand_parents = vocabulary.get_class_by_iri(parent).parent_class_iris
+        Returns:
+            Tuple[List[str], Set[str]], the ancestors and the iris of the
+            classes in progress that were reached over an inheritance circle.
+            In that case the ancestors are incomplete for the classes in
+            between and are not stored
+        """
+        if class_iri in ancestors:
+            return ancestors[class_iri], set()
 
-                for grand_parent in grand_parents:
-                    if grand_parent not in class_.ancestor_class_iris:
-                        # prevent infinite loop if inheritance circle
-                        queue.append(grand_parent)
+        vocabulary = voc_builder.vocabulary
+        in_progress.add(class_iri)
+        result: Dict[str, None] = {}
+        circle_iris: Set[str] = set()
+        for parent in reversed(
+            vocabulary.get_class_by_iri(class_iri).parent_class_iris
+        ):
+            if not voc_builder.entity_is_known(parent):
+                continue
+            result[parent] = None
+            if parent in in_progress:
+                # inheritance circle, the ancestors of parent are added when
+                # parent is finished
+                circle_iris.add(parent)
+                continue
+            parent_ancestors, parent_circle_iris = cls._get_ancestor_iris(
+                voc_builder, parent, ancestors, in_progress
+            )
+            result.update(dict.fromkeys(parent_ancestors))
+            circle_iris.update(parent_circle_iris)
+        in_progress.remove(class_iri)
+
+        circle_iris.discard(class_iri)
+        result_list = list(result)
+        if len(circle_iris) == 0:
+            ancestors[class_iri] = result_list
+        return result_list, circle_iris
 
     @classmethod
     def _compute_child_classes(cls, voc_builder: VocabularyBuilder):
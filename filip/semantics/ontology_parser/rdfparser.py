@@ -1,9 +1,11 @@
 """Module contains the RDFParser that can create a Vocabulary object out of a
 given ontology"""
 
+import hashlib
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
-from typing import List, Tuple
+from typing import ClassVar, Dict, Iterable, List, Optional, Tuple
 
 import rdflib
 
@@ -85,11 +87,48 @@ def get_base_out_of_iri(iri: str) -> str:
         return iri[:index]
 
 
+def get_content_hash(content: str) -> str:
+    """Get the hash of a source content, used as key of the graph cache
+
+    Args:
+        content: Content of a source
+
+    Returns:
+        str
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _parse_turtle(content: str) -> List[Tuple[rdflib.term.Node, ...]]:
+    """Parse a turtle document into its triples. Used in the worker processes
+    of RdfParser.load_graphs, as triples can be pickled
+
+    Args:
+        content: Turtle document
+
+    Returns:
+        List[Tuple[rdflib.term.Node, ...]]
+    """
+    graph = rdflib.Graph()
+    graph.parse(data=content, format="turtle")
+    return list(graph)
+
+
 class RdfParser:
     """
     Class that parses a given source into a vocabulary.
+
+    The graphs parsed out of the source contents are cached by the hash of
+    the content, so that sources that are parsed again, e.g. when a new
+    source is added to a vocabulary, do not need to be read again.
     """
 
+    graph_cache_size: ClassVar[int] = 32
+    """Maximal number of graphs held in the cache"""
+
+    _graph_cache: ClassVar[Dict[str, rdflib.Graph]] = {}
+    """Parsed graphs by the hash of their content, in order of last use"""
+
     def __init__(self):
         self.current_source = None
         """Current source which is parsed, used for Log entries"""
@@ -115,6 +154,78 @@ class RdfParser:
                 level, entity_type, entity_iri, msg
             )
 
+    @classmethod
+    def _cache_graph(cls, content_hash: str, graph: rdflib.Graph):
+        """Add a graph to the cache and drop the least recently used graphs
+
+        Args:
+            content_hash (str): Hash of the content of the graph
+            graph (rdflib.Graph): Parsed graph
+
+        Returns:
+            None
+        """
+        cls._graph_cache.pop(content_hash, None)
+        cls._graph_cache[content_hash] = graph
+        while len(cls._graph_cache) > cls.graph_cache_size:
+            del cls._graph_cache[next(iter(cls._graph_cache))]
+
+    @classmethod
+    def get_graph(cls, content: str) -> rdflib.Graph:
+        """Get the graph of a turtle document, out of the cache if the
+        document was already parsed. The graph must not be modified.
+
+        Args:
+            content (str): Turtle document
+
+        Returns:
+            rdflib.Graph
+        """
+        content_hash = get_content_hash(content)
+        graph = cls._graph_cache.get(content_hash)
+        if graph is None:
+            graph = rdflib.Graph()
+            graph.parse(data=content, format="turtle")
+        cls._cache_graph(content_hash, graph)
+        return graph
+
+    @classmethod
+    def load_graphs(cls, sources: Iterable[Source], max_workers: Optional[int] = 1):
+        """Parse the contents of the sources that are not yet cached into the
+        graph cache. If several sources need to be parsed and max_workers is
+        not 1, they are parsed in parallel processes.
+
+        Args:
+            sources (Iterable[Source]): Sources to parse
+            max_workers (Optional[int]): Maximal number of worker processes.
+                Defaults to 1, the sources are then parsed in the current
+                process. If None the number of processors is used
+
+        Returns:
+            None
+        """
+        contents: Dict[str, str] = {}
+        for source in sources:
+            if source.predefined:
+                continue
+            content_hash = get_content_hash(source.content)
+            if content_hash not in cls._graph_cache:
+                contents[content_hash] = source.content
+
+        if len(contents) == 0:
+            return
+        if len(contents) == 1 or max_workers == 1:
+            for content in contents.values():
+                cls.get_graph(content)
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(_parse_turtle, contents.values())
+            for content_hash, triples in zip(contents.keys(), results):
+                graph = rdflib.Graph()
+                graph.addN((s, p, o, graph) for s, p, o in triples)
+                cls._cache_graph(content_hash, graph)
+
     def parse_source_into_vocabulary(
         self, source: Source, vocabulary: Vocabulary
     ) -> bool:
@@ -133,13 +244,12 @@ class RdfParser:
             return True
 
         voc_builder = VocabularyBuilder(vocabulary=vocabulary)
-        g = rdflib.Graph()
 
         # format = rdflib.util.guess_format(source.source_path)
         voc_builder.add_source(source)
         voc_builder.set_current_source(source.id)
 
-        g.parse(data=source.content, format="turtle")
+        g = self.get_graph(source.content)
 
         ontology_nodes = list(
             g.subjects(
@@ -8,17 +8,30 @@ from math import inf
 
 import requests
 
-from typing import Optional, Dict, Type, List, Any, Union, Set
-from pydantic import BaseModel, Field
+from typing import (
+    Optional,
+    Dict,
+    Type,
+    List,
+    Any,
+    Union,
+    Set,
+    Tuple,
+    Iterator,
+    BinaryIO,
+)
+from pydantic import BaseModel, Field, PositiveInt
 from rapidfuzz import process
 
 from filip.models.base import NgsiVersion
 from filip.models.ngsi_v2.iot import DeviceSettings
 from filip.semantics.vocabulary import Individual
-from filip.models.ngsi_v2.context import ContextEntity
+from filip.models.ngsi_v2.base import EntityPattern
+from filip.models.ngsi_v2.context import ActionType, ContextEntity, Query
 from filip.clients.ngsi_v2 import ContextBrokerClient, IoTAClient
 from filip.models import FiwareHeader
 from filip.semantics.semantics_models import (
+    CompiledRules,
     InstanceIdentifier,
     SemanticClass,
     InstanceHeader,
@@ -31,12 +44,36 @@ from filip.semantics.semantics_models import (
     Command,
     DeviceAttributeField,
     DeviceAttribute,
+    DevicePropertyInstanceLink,
 )
 from filip.utils.simple_ql import QueryString
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 
 logger = logging.getLogger("semantics")
 
+STATE_FORMAT = "filip.semantics.state"
+"""Name of the binary state format, written at the start of each snapshot"""
+
+STATE_FORMAT_VERSION = 1
+"""Version of the binary state format"""
+
+
+def _require_msgpack():
+    """
+    Raises:
+        ImportError: if msgpack is not installed
+    """
+    if msgpack is None:
+        raise ImportError(
+            "The binary local state requires msgpack. Install it via "
+            "'pip install filip[msgpack]'"
+        )
+
 
 class InstanceRegistry(BaseModel):
     """
@@ -49,8 +86,31 @@ class InstanceRegistry(BaseModel):
     """ Dict of the references to the local SemanticClass instances. 
         Instances are saved with their identifier as key """
 
-    _deleted_identifiers: List[InstanceIdentifier] = []
-    """List of all identifiers that were deleted"""
+    _class_index: Dict[str, Dict[InstanceIdentifier, "SemanticClass"]] = {}
+    """ Secondary index of the class names to the registered instances """
+
+    _header_index: Dict[InstanceHeader, Dict[InstanceIdentifier, "SemanticClass"]] = {}
+    """ Secondary index of the headers to the registered instances """
+
+    _deleted_identifiers: Dict[InstanceIdentifier, None] = {}
+    """Insertion ordered set of all identifiers that were deleted"""
+
+    _dirty_identifiers: Dict[InstanceIdentifier, None] = {}
+    """ Insertion ordered set of the identifiers of all instances whose
+        fields or references changed since they were loaded or saved """
+
+    _state_hashes: Dict[InstanceIdentifier, int] = {}
+    """ Cached hashes of the fields and references of the instances """
+
+    _logged_hashes: Dict[InstanceIdentifier, int] = {}
+    """ Hashes of the instances at the time they were last dumped """
+
+    _logged_deleted_identifiers: Set[InstanceIdentifier] = set()
+    """ Deleted identifiers at the time they were last dumped """
+
+    _unlogged_identifiers: Dict[InstanceIdentifier, None] = {}
+    """ Insertion ordered set of the identifiers of all instances that were
+        marked dirty or clean since they were last dumped """
 
     def delete(self, instance: "SemanticClass"):
         """Delete an instance from the registry
@@ -73,9 +133,18 @@ class InstanceRegistry(BaseModel):
         # to delete it on save, and do not load it again from Fiware
 
         if instance.old_state.state is not None:
-            self._deleted_identifiers.append(identifier)
+            self._deleted_identifiers[identifier] = None
 
         del self._registry[identifier]
+        self._dirty_identifiers.pop(identifier, None)
+        self._state_hashes.pop(identifier, None)
+        for index, key in (
+            (self._class_index, identifier.type),
+            (self._header_index, identifier.header),
+        ):
+            del index[key][identifier]
+            if not index[key]:
+                del index[key]
 
     def instance_was_deleted(self, identifier: InstanceIdentifier) -> bool:
         """
@@ -104,6 +173,8 @@ class InstanceRegistry(BaseModel):
             raise AttributeError("Instance already exists")
         else:
             self._registry[identifier] = instance
+            self._class_index.setdefault(identifier.type, {})[identifier] = instance
+            self._header_index.setdefault(identifier.header, {})[identifier] = instance
 
     def get(self, identifier: InstanceIdentifier) -> "SemanticClass":
         """Retrieve an registered instance with its identifier
@@ -133,6 +204,110 @@ class InstanceRegistry(BaseModel):
         """
         return list(self._registry.values())
 
+    def iter_all(self) -> Iterator["SemanticClass"]:
+        """Iterate over all registered instances without copying them.
+        The registry must not be changed during the iteration.
+
+        Returns:
+            Iterator[SemanticClass]
+        """
+        return iter(self._registry.values())
+
+    def get_class_names(self) -> List[str]:
+        """Get the class names of all registered instances
+
+        Returns:
+            List[str]
+        """
+        return list(self._class_index)
+
+    def iter_instances_of_class(self, class_name: str) -> Iterator["SemanticClass"]:
+        """Iterate over the registered instances of exactly the given class
+
+        Args:
+            class_name(str): Name of the class
+        Returns:
+            Iterator[SemanticClass]
+        """
+        return iter(self._class_index.get(class_name, {}).values())
+
+    def get_headers(self) -> List[InstanceHeader]:
+        """Get the headers of all registered instances
+
+        Returns:
+            List[InstanceHeader]
+        """
+        return list(self._header_index)
+
+    def iter_instances_of_header(
+        self, header: InstanceHeader
+    ) -> Iterator["SemanticClass"]:
+        """Iterate over the registered instances with the given header
+
+        Args:
+            header(InstanceHeader): Header of the instances
+        Returns:
+            Iterator[SemanticClass]
+        """
+        return iter(self._header_index.get(header, {}).values())
+
+    def mark_dirty(self, identifier: InstanceIdentifier):
+        """
+        Note that the fields or references of an instance changed
+
+        Args:
+            identifier (InstanceIdentifier): Identifier of the instance
+        Returns:
+            None
+        """
+        self._dirty_identifiers[identifier] = None
+        self._state_hashes.pop(identifier, None)
+        self._unlogged_identifiers[identifier] = None
+
+    def mark_clean(self, identifier: InstanceIdentifier):
+        """
+        Note that an instance equals its old_state, e.g. after it was loaded
+        or saved
+
+        Args:
+            identifier (InstanceIdentifier): Identifier of the instance
+        Returns:
+            None
+        """
+        self._dirty_identifiers.pop(identifier, None)
+        self._state_hashes.pop(identifier, None)
+        self._unlogged_identifiers[identifier] = None
+
+    def is_marked_dirty(self, identifier: InstanceIdentifier) -> bool:
+        """
+        Check if the fields or references of an instance changed since it
+        was loaded or saved
+
+        Args:
+            identifier (InstanceIdentifier): Identifier of the instance
+        Returns:
+            bool
+        """
+        return identifier in self._dirty_identifiers
+
+    def get_state_hash(self, instance: "SemanticClass") -> int:
+        """
+        Get the hash of the fields and references of an instance. The hash
+        is cached until the instance changes.
+
+        Args:
+            instance (SemanticClass): Registered instance
+        Returns:
+            int
+        """
+        identifier = instance.get_identifier()
+        state_hash = self._state_hashes.get(identifier)
+        if state_hash is None:
+            state_hash = instance.compute_state_hash()
+            if identifier in self._registry:
+                self._state_hashes[identifier] = state_hash
+        return state_hash
+
     def get_all_deleted_identifiers(self) -> List["InstanceIdentifier"]:
         """
         Get all identifiers that were deleted by the user
@@ -140,7 +315,16 @@ class InstanceRegistry(BaseModel):
         Returns:
             List[InstanceIdentifier]
         """
-        return self._deleted_identifiers
+        return list(self._deleted_identifiers)
+
+    def iter_deleted_identifiers(self) -> Iterator["InstanceIdentifier"]:
+        """
+        Iterate over all identifiers that were deleted by the user
+
+        Returns:
+            Iterator[InstanceIdentifier]
+        """
+        return iter(self._deleted_identifiers)
 
     def save(self) -> str:
         """
@@ -155,10 +339,17 @@ class InstanceRegistry(BaseModel):
             old_state = None
             if instance.old_state.state is not None:
                 old_state = instance.old_state.state.model_dump_json()
+            # unchanged instances equal their old_state
+            dirty = instance.is_dirty()
+            if dirty:
+                entity = instance.build_context_entity().model_dump_json()
+            else:
+                entity = old_state
             instance_dict = {
-                "entity": instance.build_context_entity().model_dump_json(),
+                "entity": entity,
                 "header": instance.header.model_dump_json(),
                 "old_state": old_state,
+                "dirty": dirty,
             }
             res["instances"].append(instance_dict)
 
@@ -170,7 +361,14 @@ class InstanceRegistry(BaseModel):
     def clear(self):
         """Clear the local state"""
         self._registry.clear()
+        self._class_index.clear()
+        self._header_index.clear()
         self._deleted_identifiers.clear()
+        self._dirty_identifiers.clear()
+        self._state_hashes.clear()
+        self._logged_hashes.clear()
+        self._logged_deleted_identifiers.clear()
+        self._unlogged_identifiers.clear()
 
     def load(self, json_string: str, semantic_manager: "SemanticsManager"):
         """
@@ -202,12 +400,221 @@ class InstanceRegistry(BaseModel):
                     instance_dict["old_state"]
                 )
 
-            self._registry[instance.get_identifier()] = instance
+            # the instance registers itself on construction
+            if not self.contains(instance.get_identifier()):
+                self.register(instance)
+            # states saved without dirty flag are treated as changed
+            if instance_dict.get("dirty", True):
+                self.mark_dirty(instance.get_identifier())
+
+        for identifier_json in save["deleted_identifiers"]:
+            identifier = InstanceIdentifier.model_validate(identifier_json)
+            self._deleted_identifiers[identifier] = None
+
+    @staticmethod
+    def _instance_record(instance: "SemanticClass") -> Dict[str, Any]:
+        """
+        Build the record of an instance in the binary state format. The
+        entity of unchanged instances is omitted, as it equals the old_state
+
+        Args:
+            instance (SemanticClass): Instance to convert
+        Returns:
+            Dict[str, Any]
+        """
+        old_state = None
+        if instance.old_state.state is not None:
+            old_state = instance.old_state.state.model_dump(mode="json")
+        dirty = instance.is_dirty()
+        entity = None
+        if dirty or old_state is None:
+            entity = instance.build_context_entity().model_dump(mode="json")
+        return {
+            "kind": "instance",
+            "identifier": instance.get_identifier().model_dump(mode="json"),
+            "entity": entity,
+            "old_state": old_state,
+            "dirty": dirty,
+        }
+
+    def _deleted_identifiers_record(self) -> Dict[str, Any]:
+        """
+        Build the record of the deleted identifiers in the binary state format
+
+        Returns:
+            Dict[str, Any]
+        """
+        return {
+            "kind": "deleted_identifiers",
+            "identifiers": [
+                identifier.model_dump(mode="json")
+                for identifier in self._deleted_identifiers
+            ],
+        }
+
+    def _reset_log(self):
+        """Note that the current state was dumped"""
+        self._logged_hashes = {
+            identifier: hash(instance)
+            for identifier, instance in self._registry.items()
+        }
+        self._logged_deleted_identifiers = set(self._deleted_identifiers)
+        self._unlogged_identifiers.clear()
+
+    def dump(self, stream: BinaryIO):
+        """
+        Write a snapshot of the registry state to a binary stream. The
+        records are written one by one in the MessagePack format, hence the
+        snapshot is never held in memory as a whole.
+
+        Changes made afterwards can be appended to the same stream with
+        dump_changes.
+
+        Args:
+            stream (BinaryIO): Writable binary stream, e.g. a file opened
+                with "wb"
+        Raises:
+            ImportError: if msgpack is not installed
+        Returns:
+            None
+        """
+        _require_msgpack()
+        packer = msgpack.Packer(use_bin_type=True)
+        stream.write(
+            packer.pack({"format": STATE_FORMAT, "version": STATE_FORMAT_VERSION})
+        )
+        for instance in self._registry.values():
+            stream.write(packer.pack(self._instance_record(instance)))
+        stream.write(packer.pack(self._deleted_identifiers_record()))
+        self._reset_log()
+
+    def dump_changes(self, stream: BinaryIO) -> int:
+        """
+        Append the changes made since the last dump, dump_changes or
+        load_stream to a binary stream, that already contains a snapshot of
+        the registry state
 
-        for identifier in save["deleted_identifiers"]:
-            self._deleted_identifiers.append(
-                InstanceIdentifier.model_validate(identifier)
+        Args:
+            stream (BinaryIO): Writable binary stream, e.g. the file of the
+                snapshot opened with "ab"
+        Raises:
+            ImportError: if msgpack is not installed
+        Returns:
+            int, number of written records
+        """
+        _require_msgpack()
+        packer = msgpack.Packer(use_bin_type=True)
+        records = 0
+        for identifier, instance in self._registry.items():
+            instance_hash = hash(instance)
+            if (
+                identifier in self._unlogged_identifiers
+                or self._logged_hashes.get(identifier) != instance_hash
+            ):
+                stream.write(packer.pack(self._instance_record(instance)))
+                self._logged_hashes[identifier] = instance_hash
+                records += 1
+
+        removed = [
+            identifier
+            for identifier in self._logged_hashes
+            if identifier not in self._registry
+        ]
+        for identifier in removed:
+            record = {
+                "kind": "removed",
+                "identifier": identifier.model_dump(mode="json"),
+            }
+            stream.write(packer.pack(record))
+            del self._logged_hashes[identifier]
+            records += 1
+
+        if self._logged_deleted_identifiers != self._deleted_identifiers.keys():
+            stream.write(packer.pack(self._deleted_identifiers_record()))
+            self._logged_deleted_identifiers = set(self._deleted_identifiers)
+            records += 1
+
+        self._unlogged_identifiers.clear()
+        return records
+
+    def load_stream(self, stream: BinaryIO, semantic_manager: "SemanticsManager"):
+        """
+        Load the state of the registry out of a binary stream written with
+        dump and dump_changes. The current state will be discarded.
+
+        Args:
+            stream (BinaryIO): Readable binary stream, e.g. a file opened
+                with "rb"
+            semantic_manager (SemanticsManager): manager to which registry
+                belongs
+        Raises:
+            ImportError: if msgpack is not installed
+            ValueError: if the stream does not start with a snapshot
+        Returns:
+            None
+        """
+        _require_msgpack()
+        # replay the records, later records of an instance replace earlier
+        # ones. The instances are only built for the final records
+        records: Dict[InstanceIdentifier, Dict[str, Any]] = {}
+        deleted_identifiers: List[InstanceIdentifier] = []
+        started = False
+        for record in msgpack.Unpacker(stream, raw=False):
+            if record.get("format") == STATE_FORMAT:
+                if record["version"] > STATE_FORMAT_VERSION:
+                    raise ValueError(
+                        f"Unsupported state format version {record['version']}"
+                    )
+                # a new snapshot replaces everything before
+                records.clear()
+                deleted_identifiers = []
+                started = True
+                continue
+            if not started:
+                raise ValueError("The stream does not start with a snapshot")
+
+            kind = record["kind"]
+            if kind == "instance":
+                identifier = InstanceIdentifier.model_validate(record["identifier"])
+                records[identifier] = record
+            elif kind == "removed":
+                identifier = InstanceIdentifier.model_validate(record["identifier"])
+                records.pop(identifier, None)
+            elif kind == "deleted_identifiers":
+                deleted_identifiers = [
+                    InstanceIdentifier.model_validate(identifier)
+                    for identifier in record["identifiers"]
+                ]
+            else:
+                raise ValueError(f"Unknown record kind {kind}")
+
+        if not started:
+            raise ValueError("The stream does not start with a snapshot")
+
+        self.clear()
+        for identifier, record in records.items():
+            old_state = None
+            if record["old_state"] is not None:
+                old_state = ContextEntity.model_validate(record["old_state"])
+            if record["entity"] is None:
+                context_entity = old_state
+            else:
+                context_entity = ContextEntity.model_validate(record["entity"])
+
+            instance = semantic_manager._context_entity_to_semantic_class(
+                context_entity, identifier.header
             )
+            instance.old_state.state = old_state
+
+            # the instance registers itself on construction
+            if not self.contains(identifier):
+                self.register(instance)
+            if record["dirty"]:
+                self.mark_dirty(identifier)
+
+        for identifier in deleted_identifiers:
+            self._deleted_identifiers[identifier] = None
+        self._reset_log()
 
     def __hash__(self):
         values = (hash(value) for value in self._registry.values())
@@ -243,9 +650,72 @@ class SemanticsManager(BaseModel):
         "does not specify an own header",
     )
 
+    optimistic_creation: bool = Field(
+        default=False,
+        description="If True, the construction of an instance with an "
+        "explicit id does not check if the instance exists in Fiware. "
+        "Instances that exist in Fiware but were created locally are "
+        "detected as conflicts on save",
+    )
+
+    _client_pool: Dict[
+        Tuple[str, str, str, str], Tuple[ContextBrokerClient, IoTAClient]
+    ] = {}
+    """ Dict of the long-lived clients per Fiware location
+        (cb_url, iota_url, service, service_path). Each client owns its http
+        session, so that the session headers of the clients stay separate """
+
+    _compiled_rules: Dict[Tuple[str, str], CompiledRules] = {}
+    """ Compiled rules of the rule fields per class name and field name,
+        see RuleField.are_rules_fulfilled """
+
+    _absent_identifiers: Set[InstanceIdentifier] = set()
+    """ Identifiers that are known to not exist in Fiware,
+        see prefetch_instance_existence """
+
+    def _get_pooled_clients(
+        self, instance_header: InstanceHeader
+    ) -> Tuple[ContextBrokerClient, IoTAClient]:
+        """Get the pooled clients of the given header. The clients are
+        created on first use and live until the manager is closed.
+
+        Args:
+            instance_header (InstanceHeader): Header to be used with clients
+        Returns:
+            Tuple[ContextBrokerClient, IoTAClient]
+        """
+        if instance_header.ngsi_version != NgsiVersion.v2:
+            # todo LD
+            raise Exception("FiwareVersion not yet supported")
+
+        key = (
+            instance_header.cb_url,
+            instance_header.iota_url,
+            instance_header.service,
+            instance_header.service_path,
+        )
+        clients = self._client_pool.get(key)
+        if clients is None:
+            clients = (
+                ContextBrokerClient(
+                    url=instance_header.cb_url,
+                    session=requests.Session(),
+                    fiware_header=instance_header.get_fiware_header(),
+                ),
+                IoTAClient(
+                    url=instance_header.iota_url,
+                    session=requests.Session(),
+                    fiware_header=instance_header.get_fiware_header(),
+                ),
+            )
+            self._client_pool[key] = clients
+        return clients
+
     @staticmethod
     def get_client(instance_header: InstanceHeader) -> ContextBrokerClient:
-        """Get the correct ContextBrokerClient to be used with the given header
+        """Get the correct ContextBrokerClient to be used with the given header.
+        The client is newly created and owned by the caller, see
+        get_pooled_client for a client that is reused by the manager.
 
         Args:
             instance_header (InstanceHeader): Header to be used with client
@@ -263,7 +733,9 @@ class SemanticsManager(BaseModel):
 
     @staticmethod
     def get_iota_client(instance_header: InstanceHeader) -> IoTAClient:
-        """Get the correct IotaClient to be used with the given header
+        """Get the correct IotaClient to be used with the given header.
+        The client is newly created and owned by the caller, see
+        get_pooled_iota_client for a client that is reused by the manager.
 
         Args:
             instance_header (InstanceHeader): Header to be used with client
@@ -279,6 +751,48 @@ class SemanticsManager(BaseModel):
             # todo LD
             raise Exception("FiwareVersion not yet supported")
 
+    def get_pooled_client(self, instance_header: InstanceHeader) -> ContextBrokerClient:
+        """Get the pooled ContextBrokerClient to be used with the given header.
+        The client lives until the manager is closed, hence it must not be
+        closed by the caller.
+
+        Args:
+            instance_header (InstanceHeader): Header to be used with client
+        Returns:
+            ContextBrokerClient
+        """
+        return self._get_pooled_clients(instance_header)[0]
+
+    def get_pooled_iota_client(self, instance_header: InstanceHeader) -> IoTAClient:
+        """Get the pooled IotaClient to be used with the given header.
+        The client lives until the manager is closed, hence it must not be
+        closed by the caller.
+
+        Args:
+            instance_header (InstanceHeader): Header to be used with client
+        Returns:
+            IoTAClient
+        """
+        return self._get_pooled_clients(instance_header)[1]
+
+    def close(self) -> None:
+        """
+        Close the http sessions of all pooled clients
+
+        Returns:
+            None
+        """
+        for cb_client, iota_client in self._client_pool.values():
+            cb_client.session.close()
+            iota_client.session.close()
+        self._client_pool.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def _context_entity_to_semantic_class(
         self, entity: ContextEntity, header: InstanceHeader
     ) -> SemanticClass:
@@ -336,6 +850,7 @@ class SemanticsManager(BaseModel):
                     # instance and we do not want to load the instance if it
                     # is not used
                     field._set.add(converted_value)
+                    field._mark_dirty()
                 else:
                     field.add(converted_value)
 
@@ -365,6 +880,8 @@ class SemanticsManager(BaseModel):
             for key, value in device_settings.model_dump().items():
                 loaded_class.device_settings.__setattr__(key, value)
 
+        # the instance equals its old_state
+        self.instance_registry.mark_clean(loaded_class.get_identifier())
         return loaded_class
 
     @staticmethod
@@ -446,19 +963,27 @@ class SemanticsManager(BaseModel):
         class_type = self.get_class_by_name(class_name)
         return isinstance(class_type, SemanticDeviceClass)
 
-    def is_local_state_valid(self, validate_rules: bool = True) -> (bool, str):
+    def is_local_state_valid(
+        self, validate_rules: bool = True, only_dirty: bool = False
+    ) -> (bool, str):
         """
         Check if the local state is valid and can be saved.
 
         Args:
             validate_rules (bool): If true Rulefields are validated
+            only_dirty (bool): If true only the instances that changed since
+                they were loaded or saved are validated
 
         Returns:
             (bool, str): (Is valid?, Message)
         """
+        if only_dirty:
+            instances = self.get_dirty_instances()
+        else:
+            instances = self.instance_registry.get_all()
 
         if validate_rules:
-            for instance in self.instance_registry.get_all():
+            for instance in instances:
                 if isinstance(instance, Individual):
                     continue
                 if not instance.are_rule_fields_valid():
@@ -469,7 +994,7 @@ class SemanticsManager(BaseModel):
                         f"{[f.name for f in instance.get_invalid_rule_fields()]}.",
                     )
 
-        for instance in self.instance_registry.get_all():
+        for instance in instances:
             if isinstance(instance, SemanticDeviceClass):
                 if instance.device_settings.transport is None:
                     return (
@@ -479,72 +1004,261 @@ class SemanticsManager(BaseModel):
                     )
         return True, "State is valid"
 
-    def save_state(self, assert_validity: bool = True):
+    def save_state(self, assert_validity: bool = True, chunk_size: PositiveInt = 100):
         """
         Save the local state completely to Fiware.
 
+        Only the instances that changed since they were loaded or saved
+        (see `get_dirty_instances`) and the deleted instances are saved. They
+        are saved in bulk for each header: the live states of the instances
+        are fetched with paginated batch queries and merged with the local
+        state in memory (see `merge_local_and_live_instance_state`).
+        Afterwards, the entities are written back with chunked batch updates
+        and the devices are provisioned in bulk (see
+        `IoTAClient.patch_devices`).
+
         Args:
             assert_validity (bool): It true an error is raised if the
-            RuleFields of one instance are invalid
+                RuleFields of one instance are invalid
+            chunk_size: Maximal number of entities per batch request
 
         Raises:
             AssertionError: If a device endpoint or transport is not defined
+            AssertionError: If an instance was created locally, but an
+                entity with its identifier exists in Fiware
 
         Returns:
             None
         """
-        (valid, msg) = self.is_local_state_valid(validate_rules=assert_validity)
+        (valid, msg) = self.is_local_state_valid(
+            validate_rules=assert_validity, only_dirty=True
+        )
 
         if not valid:
             raise AssertionError(f"{msg}. Local state was not saved")
 
-        # delete all instance that were loaded from Fiware and then deleted
-        # wrap in try, as the entity could have been deleted by a third party
-        for identifier in self.instance_registry.get_all_deleted_identifiers():
-
-            # we need to handle devices and normal classes with different
-            # clients
-
-            client = self.get_client(instance_header=identifier.header)
-            iota_client = self.get_iota_client(instance_header=identifier.header)
-            try:
-                client.delete_entity(
-                    entity_id=identifier.id,
-                    entity_type=identifier.type,
-                    delete_devices=True,
-                    iota_client=iota_client,
-                )
-            except requests.RequestException:
-                raise
-
-            client.close()
-
-        # merge with live state
-        for instance in self.instance_registry.get_all():
-            self.merge_local_and_live_instance_state(instance)
-
-        # save, patch all local instances
-        for instance in self.instance_registry.get_all():
-            cb_client = self.get_client(instance_header=instance.header)
-            if not isinstance(instance, SemanticDeviceClass):
-                # it is important that we patch the values else the
-                # references field would reach an invalid state if we worked
-                # in parallel on an instance
-                cb_client.patch_entity(
-                    instance.build_context_entity(), instance.old_state.state
-                )
-            else:
-                iota_client = self.get_iota_client(instance_header=instance.header)
-                iota_client.patch_device(
-                    device=instance.build_context_device(),
-                    patch_entity=True,
-                    cb_client=cb_client,
+        dirty_instances = self.get_dirty_instances()
+        instances: Dict[InstanceHeader, List[SemanticClass]] = {}
+        for instance in dirty_instances:
+            instances.setdefault(instance.header, []).append(instance)
+        deleted_identifiers: Dict[InstanceHeader, List[InstanceIdentifier]] = {}
+        for identifier in self.instance_registry.iter_deleted_identifiers():
+            deleted_identifiers.setdefault(identifier.header, []).append(identifier)
+
+        headers = set(instances) | set(deleted_identifiers)
+        live_entities: Dict[InstanceIdentifier, ContextEntity] = {}
+        for header in headers:
+            live_entities.update(
+                self._get_live_entities(
+                    cb_client=self.get_pooled_client(instance_header=header),
+                    header=header,
+                    identifiers=[
+                        instance.get_identifier()
+                        for instance in instances.get(header, [])
+                    ]
+                    + deleted_identifiers.get(header, []),
+                    chunk_size=chunk_size,
                 )
-                iota_client.close()
-            cb_client.close()
+            )
+
+        # instances that were created locally (e.g. with optimistic_creation),
+        # although their entities exist in Fiware, would overwrite them
+        conflicts = [
+            instance.get_identifier()
+            for instance in dirty_instances
+            if instance.old_state.state is None
+            and instance.get_identifier() in live_entities
+            and not self.was_instance_deleted(instance.get_identifier())
+        ]
+        if conflicts:
+            raise AssertionError(
+                f"The instances {[(i.id, i.type) for i in conflicts]} were "
+                f"created locally, but already exist in Fiware. Local state "
+                f"was not saved"
+            )
+
+        for header in headers:
+            self._save_header_state(
+                instances=instances.get(header, []),
+                deleted_identifiers=deleted_identifiers.get(header, []),
+                live_entities=live_entities,
+                cb_client=self.get_pooled_client(instance_header=header),
+                iota_client=self.get_pooled_iota_client(instance_header=header),
+                chunk_size=chunk_size,
+            )
+
         # update old_state
-        for instance in self.instance_registry.get_all():
+        for instance in dirty_instances:
             instance.old_state.state = instance.build_context_entity()
+            self.instance_registry.mark_clean(instance.get_identifier())
+        self._absent_identifiers.clear()
+
+    def get_dirty_instances(self) -> List[SemanticClass]:
+        """
+        Get all local instances that changed since they were loaded from or
+        saved to Fiware, including the new instances
+
+        Returns:
+            List[SemanticClass]
+        """
+        return [
+            instance
+            for instance in self.instance_registry.iter_all()
+            if instance.is_dirty()
+        ]
+
+    def _save_header_state(
+        self,
+        instances: List[SemanticClass],
+        deleted_identifiers: List[InstanceIdentifier],
+        live_entities: Dict[InstanceIdentifier, ContextEntity],
+        cb_client: ContextBrokerClient,
+        iota_client: IoTAClient,
+        chunk_size: PositiveInt,
+    ) -> None:
+        """
+        Save the instances that belong to one header, see `save_state`
+
+        Args:
+            instances (List[SemanticClass]): Local instances to save
+            deleted_identifiers (List[InstanceIdentifier]): Identifiers of
+                the instances that were loaded from Fiware and then deleted
+            live_entities (Dict[InstanceIdentifier, ContextEntity]): Live
+                states of the instances
+            cb_client (ContextBrokerClient): Client of the header
+            iota_client (IoTAClient): Client of the header
+            chunk_size: Maximal number of entities per batch request
+
+        Returns:
+            None
+        """
+        # delete all instance that were loaded from Fiware and then deleted.
+        # Entities that were already deleted by a third party are skipped
+        if deleted_identifiers:
+            entities = [
+                ContextEntity(id=identifier.id, type=identifier.type)
+                for identifier in deleted_identifiers
+                if identifier in live_entities
+            ]
+            for i in range(0, len(entities), chunk_size):
+                cb_client.update(
+                    entities=entities[i : i + chunk_size],
+                    action_type=ActionType.DELETE,
+                )
+            deleted_entities = {
+                (identifier.id, identifier.type) for identifier in deleted_identifiers
+            }
+            for device in iota_client.get_device_list(
+                entity_names=[identifier.id for identifier in deleted_identifiers]
+            ):
+                if (device.entity_name, device.entity_type) in deleted_entities:
+                    iota_client.delete_device(device_id=device.device_id)
+
+        # merge with live state. An instance could have been deleted and
+        # created anew locally, then it is saved as new
+        deleted = set(deleted_identifiers)
+        for instance in instances:
+            identifier = instance.get_identifier()
+            live_entity = live_entities.get(identifier)
+            if live_entity is not None and identifier not in deleted:
+                self._merge_live_entity(instance=instance, live_entity=live_entity)
+
+        # save all local instances. Only the attributes that differ from the
+        # old state are appended, so that attributes changed in parallel by
+        # others are kept. For the changed attributes the last writer wins
+        entities = [
+            entity
+            for entity in (
+                self._build_changed_context_entity(instance)
+                for instance in instances
+                if not isinstance(instance, SemanticDeviceClass)
+            )
+            if entity is not None
+        ]
+        for i in range(0, len(entities), chunk_size):
+            cb_client.update(
+                entities=entities[i : i + chunk_size], action_type=ActionType.APPEND
+            )
+        devices = [
+            instance.build_context_device()
+            for instance in instances
+            if isinstance(instance, SemanticDeviceClass)
+        ]
+        if devices:
+            iota_client.patch_devices(
+                devices=devices,
+                patch_entity=True,
+                cb_client=cb_client,
+                chunk_size=chunk_size,
+            )
+
+    @staticmethod
+    def _build_changed_context_entity(
+        instance: SemanticClass,
+    ) -> Optional[ContextEntity]:
+        """
+        Build the context entity of an instance, that only contains the
+        attributes that differ from the old state
+
+        Args:
+            instance (SemanticClass): Instance to build
+
+        Returns:
+            ContextEntity, or None if no attribute changed
+        """
+        entity = instance.build_context_entity()
+        old_state = instance.old_state.state
+        if old_state is None:
+            return entity
+        attributes = entity.model_dump(exclude={"id", "type"})
+        old_attributes = old_state.model_dump(exclude={"id", "type"})
+        changed_attributes = {
+            name: attribute
+            for name, attribute in attributes.items()
+            if old_attributes.get(name) != attribute
+        }
+        if not changed_attributes:
+            return None
+        return ContextEntity(id=entity.id, type=entity.type, **changed_attributes)
+
+    @staticmethod
+    def _get_live_entities(
+        cb_client: ContextBrokerClient,
+        header: InstanceHeader,
+        identifiers: List[InstanceIdentifier],
+        chunk_size: PositiveInt = 100,
+        attrs: List[str] = None,
+    ) -> Dict[InstanceIdentifier, ContextEntity]:
+        """
+        Fetch the live states of the given instances with paginated batch
+        queries
+
+        Args:
+            cb_client (ContextBrokerClient): Client of the header
+            header (InstanceHeader): Header of the identifiers
+            identifiers (List[InstanceIdentifier]): Identifiers to fetch
+            chunk_size: Maximal number of identifiers per query
+            attrs: Attributes to fetch. If omitted, all attributes are fetched
+
+        Returns:
+            Dict of the identifiers to their live states. Identifiers
+            without live state are omitted.
+        """
+        live_entities = {}
+        for i in range(0, len(identifiers), chunk_size):
+            query = Query(
+                entities=[
+                    EntityPattern(id=identifier.id, type=identifier.type)
+                    for identifier in identifiers[i : i + chunk_size]
+                ],
+                attrs=attrs,
+            )
+            for entity in cb_client.query(query=query):
+                identifier = InstanceIdentifier(
+                    id=entity.id, type=entity.type, header=header
+                )
+                live_entities[identifier] = entity
+        return live_entities
 
     def load_instance(self, identifier: InstanceIdentifier) -> SemanticClass:
         """
@@ -561,12 +1275,11 @@ class SemanticsManager(BaseModel):
         if self.instance_registry.contains(identifier=identifier):
             return self.instance_registry.get(identifier=identifier)
         else:
-            client = self.get_client(identifier.header)
+            client = self.get_pooled_client(identifier.header)
 
             entity = client.get_entity(
                 entity_id=identifier.id, entity_type=identifier.type
             )
-            client.close()
 
             logger.info(
                 f"Instance ({identifier.id}, {identifier.type}) "
@@ -578,13 +1291,17 @@ class SemanticsManager(BaseModel):
                 entity=entity, header=identifier.header
             )
 
-    def does_instance_exists(self, identifier: InstanceIdentifier) -> bool:
+    def does_instance_exists(
+        self, identifier: InstanceIdentifier, check_fiware: bool = True
+    ) -> bool:
         """
         Check if an instance with the given identifier already exists in
         local state or in Fiware
 
         Args:
             identifier (InstanceIdentifier): Identifier to check
+            check_fiware (bool): If False, only the local state and the
+                identifiers known to be absent are checked
 
         Returns:
             bool, true if exists
@@ -594,12 +1311,54 @@ class SemanticsManager(BaseModel):
             return True
         elif self.was_instance_deleted(identifier):
             return False
+        elif not check_fiware or identifier in self._absent_identifiers:
+            return False
         else:
-            client = self.get_client(identifier.header)
+            client = self.get_pooled_client(identifier.header)
             return client.does_entity_exist(
                 entity_id=identifier.id, entity_type=identifier.type
             )
 
+    def prefetch_instance_existence(
+        self, identifiers: List[InstanceIdentifier], chunk_size: PositiveInt = 100
+    ) -> Set[InstanceIdentifier]:
+        """
+        Check with batch queries which of the given instances exist in
+        Fiware. The identifiers that do not exist are remembered until the
+        next save, hence constructing these instances is purely local, e.g.
+        before bulk-creating instances with deterministic ids.
+
+        Args:
+            identifiers (List[InstanceIdentifier]): Identifiers to check
+            chunk_size: Maximal number of identifiers per query
+
+        Returns:
+            Set of the identifiers that exist in Fiware
+        """
+        by_header: Dict[InstanceHeader, List[InstanceIdentifier]] = {}
+        for identifier in identifiers:
+            if not self.instance_registry.contains(identifier):
+                by_header.setdefault(identifier.header, []).append(identifier)
+
+        existing = set()
+        for header, header_identifiers in by_header.items():
+            # only request the small metadata attribute of the entities
+            existing.update(
+                self._get_live_entities(
+                    cb_client=self.get_pooled_client(header),
+                    header=header,
+                    identifiers=header_identifiers,
+                    chunk_size=chunk_size,
+                    attrs=["metadata"],
+                )
+            )
+            self._absent_identifiers.update(
+                identifier
+                for identifier in header_identifiers
+                if identifier not in existing
+            )
+        return existing
+
     def was_instance_deleted(self, identifier: InstanceIdentifier) -> bool:
         """
         Check if the instance with the given identifier was deleted.
@@ -667,14 +1426,12 @@ class SemanticsManager(BaseModel):
         else:
             class_ = self.get_class_by_name(class_name)
 
+        if not get_subclasses:
+            return list(self.instance_registry.iter_instances_of_class(class_name))
         res = []
-        for instance in self.instance_registry.get_all():
-            if not get_subclasses:
-                if instance.get_type() == class_name:
-                    res.append(instance)
-            else:
-                if isinstance(instance, class_):
-                    res.append(instance)
+        for name in self.instance_registry.get_class_names():
+            if issubclass(self.get_class_by_name(name), class_):
+                res.extend(self.instance_registry.iter_instances_of_class(name))
         return res
 
     def load_instances_from_fiware(
@@ -730,7 +1487,7 @@ class SemanticsManager(BaseModel):
             ngsi_version=fiware_version,
         )
 
-        client = self.get_client(header)
+        client = self.get_pooled_client(header)
 
         entities = client.get_entity_list(
             entity_ids=entity_ids,
@@ -740,7 +1497,6 @@ class SemanticsManager(BaseModel):
             q=q,
             limit=limit,
         )
-        client.close()
 
         return [self._context_entity_to_semantic_class(e, header) for e in entities]
 
@@ -759,30 +1515,102 @@ class SemanticsManager(BaseModel):
         Returns:
               ContextEntity
         """
-        client = self.get_client(instance_identifier.header)
+        client = self.get_pooled_client(instance_identifier.header)
 
         return client.get_entity(
             entity_id=instance_identifier.id, entity_type=instance_identifier.type
         )
 
     def load_instances(
-        self, identifiers: List[InstanceIdentifier]
+        self,
+        identifiers: List[InstanceIdentifier],
+        depth: int = 0,
+        chunk_size: PositiveInt = 100,
     ) -> List[SemanticClass]:
         """
         Load all instances, if no local state of it exists it will get taken
-        from Fiware and registered locally
+        from Fiware and registered locally.
+
+        The missing instances are fetched with batch queries. If depth is
+        greater than 0, the instances referenced in their RelationFields are
+        prefetched as well, up to the given number of relation hops, so that
+        traversing the relations does not require further requests. All
+        fetched instances are registered at once after the last query.
 
         Args:
             identifiers List[InstanceIdentifier]: Identifiers of instances
                 that should be loaded
+            depth (int): Number of relation hops to prefetch
+            chunk_size: Maximal number of identifiers per query
         Raises:
-            Exception, if one Entity is not present
+            KeyError, if one Entity is not present
 
         Returns:
            List[SemanticClass]
         """
-
-        return [self.load_instance(iden) for iden in identifiers]
+        entities: Dict[InstanceIdentifier, ContextEntity] = {}
+        missing = [
+            identifier
+            for identifier in dict.fromkeys(identifiers)
+            if not self.instance_registry.contains(identifier)
+        ]
+        hop = 0
+        while missing:
+            fetched: Dict[InstanceIdentifier, ContextEntity] = {}
+            by_header: Dict[InstanceHeader, List[InstanceIdentifier]] = {}
+            for identifier in missing:
+                by_header.setdefault(identifier.header, []).append(identifier)
+            for header, header_identifiers in by_header.items():
+                fetched.update(
+                    self._get_live_entities(
+                        cb_client=self.get_pooled_client(header),
+                        header=header,
+                        identifiers=header_identifiers,
+                        chunk_size=chunk_size,
+                    )
+                )
+            if hop == 0:
+                not_found = [i for i in missing if i not in fetched]
+                if not_found:
+                    raise KeyError(
+                        f"The instances {[(i.id, i.type) for i in not_found]} "
+                        f"are not present in Fiware"
+                    )
+            entities.update(fetched)
+
+            if hop == depth:
+                break
+            hop += 1
+            # dangling relations are skipped, they fail only on access
+            related = {}
+            for entity in fetched.values():
+                for attribute in entity.get_relationships():
+                    values = attribute.value
+                    if not isinstance(values, list):
+                        values = [values]
+                    for value in values:
+                        if not isinstance(value, dict):  # is an individual
+                            continue
+                        identifier = InstanceIdentifier.model_validate(value)
+                        if not (
+                            identifier in entities
+                            or self.instance_registry.contains(identifier)
+                            or self.was_instance_deleted(identifier)
+                        ):
+                            related[identifier] = None
+            missing = list(related)
+
+        for identifier, entity in entities.items():
+            self._context_entity_to_semantic_class(
+                entity=entity, header=identifier.header
+            )
+            logger.info(
+                f"Instance ({identifier.id}, {identifier.type}) "
+                f"loaded from Fiware({identifier.header.cb_url}"
+                f", {identifier.header.service}"
+                f"{identifier.header.service_path})"
+            )
+        return [self.instance_registry.get(identifier) for identifier in identifiers]
 
     def set_default_header(self, header: InstanceHeader):
         """
@@ -850,6 +1678,58 @@ class SemanticsManager(BaseModel):
         """
         self.instance_registry.load(json, self)
 
+    def save_local_state(self, stream: BinaryIO):
+        """
+        Save a snapshot of the local state with all made changes to a binary
+        stream. Compared to save_local_state_as_json the snapshot is smaller
+        and written and read record by record.
+
+        Changes made afterwards can be appended to the same stream with
+        save_local_state_changes, so that large local states do not need to
+        be rewritten on every checkpoint.
+
+        Args:
+            stream (BinaryIO): Writable binary stream, e.g. a file opened
+                with "wb"
+        Raises:
+            ImportError: if msgpack is not installed
+        Returns:
+            None
+        """
+        self.instance_registry.dump(stream)
+
+    def save_local_state_changes(self, stream: BinaryIO) -> int:
+        """
+        Append the changes of the local state since the last save or load to
+        a binary stream containing a snapshot
+
+        Args:
+            stream (BinaryIO): Writable binary stream, e.g. the file of the
+                snapshot opened with "ab"
+        Raises:
+            ImportError: if msgpack is not installed
+        Returns:
+            int, number of written records
+        """
+        return self.instance_registry.dump_changes(stream)
+
+    def load_local_state(self, stream: BinaryIO):
+        """
+        Loads the local state from a binary stream written with
+        save_local_state and save_local_state_changes. The current local
+        state gets discarded
+
+        Args:
+            stream (BinaryIO): Readable binary stream, e.g. a file opened
+                with "rb"
+        Raises:
+            ImportError: if msgpack is not installed
+            ValueError: if the stream does not contain a snapshot
+        Returns:
+            None
+        """
+        self.instance_registry.load_stream(stream, self)
+
     def visualize_local_state(self, display_individuals_rule: str = "ALL"):
         """
         Visualise all instances in the local state in a network graph that
@@ -1129,6 +2009,30 @@ class SemanticsManager(BaseModel):
               instance (SemanticClass): instanced to be treated
         """
 
+        # instance is new. Save it as is
+        client = self.get_pooled_client(instance.header)
+        if not client.does_entity_exist(
+            entity_id=instance.id, entity_type=instance.get_type()
+        ):
+            return
+        live_entity = client.get_entity(
+            entity_id=instance.id, entity_type=instance.get_type()
+        )
+
+        self._merge_live_entity(instance=instance, live_entity=live_entity)
+
+    def _merge_live_entity(
+        self, instance: SemanticClass, live_entity: ContextEntity
+    ) -> None:
+        """
+        Merge the live state of an existing instance into its local state,
+        see `merge_local_and_live_instance_state`
+
+        Args:
+            instance (SemanticClass): instanced to be treated
+            live_entity (ContextEntity): live state of the instance
+        """
+
         def converted_attribute_values(field, attribute) -> Set:
             return {
                 self._convert_value_fitting_for_field(field, value)
@@ -1157,19 +2061,6 @@ class SemanticsManager(BaseModel):
 
             return added_values, removed_values
 
-        # instance is new. Save it as is
-        client = self.get_client(instance.header)
-        if not client.does_entity_exist(
-            entity_id=instance.id, entity_type=instance.get_type()
-        ):
-            return
-
-        client = self.get_client(instance.header)
-        live_entity = client.get_entity(
-            entity_id=instance.id, entity_type=instance.get_type()
-        )
-        client.close()
-
         current_entity = instance.build_context_entity()
         old_entity = instance.old_state.state
 
@@ -1209,6 +2100,7 @@ class SemanticsManager(BaseModel):
             for value in new_values:
                 converted_value = self._convert_value_fitting_for_field(field, value)
                 field._set.add(converted_value)
+            field._mark_dirty()
 
         # ------merge references-----------------------------------------------
         merged_references: Dict = live_entity.get_attribute("referencedBy").value
@@ -1259,6 +2151,8 @@ class SemanticsManager(BaseModel):
             instance.references[
                 InstanceIdentifier.model_validate_json(key.replace("---", "."))
             ] = value
+        # the fields were changed without their setters
+        self.instance_registry.mark_dirty(instance.get_identifier())
 
         # ------merge device settings----------------------------------------
         if isinstance(instance, SemanticDeviceClass):
@@ -1300,3 +2194,8 @@ class SemanticsManager(BaseModel):
         ]
 
         return suggestions
+
+
+# the semantic_manager of DevicePropertyInstanceLink is a forward reference to
+# the SemanticsManager, it needs to be resolved after the class is defined
+DevicePropertyInstanceLink.model_rebuild()
@@ -16,6 +16,8 @@ from typing import (
     Set,
     Iterator,
     Any,
+    Hashable,
+    NamedTuple,
 )
 
 import filip.models.ngsi_v2.iot as iot
@@ -52,11 +54,11 @@ class InstanceHeader(FiwareHeader):
 
     model_config = ConfigDict(frozen=True, use_enum_values=True)
     cb_url: str = Field(
-        default=settings.CB_URL,
+        default=str(settings.CB_URL),
         description="Url of the ContextBroker from the Fiware " "setup",
     )
     iota_url: str = Field(
-        default=settings.IOTA_URL,
+        default=str(settings.IOTA_URL),
         description="Url of the IoTABroker from the Fiware " "setup",
     )
 
@@ -185,7 +187,9 @@ class DeviceProperty(BaseModel):
     model_config = ConfigDict()
 
     name: str = Field("Internally used name in the IoT Device")
-    _instance_link: DevicePropertyInstanceLink = DevicePropertyInstanceLink()
+    _instance_link: DevicePropertyInstanceLink = pyd.PrivateAttr(
+        default_factory=lambda: DevicePropertyInstanceLink()
+    )
     """Additional properties describing the instance and field where this \
     property was added"""
 
@@ -282,7 +286,7 @@ class Command(DeviceProperty):
         Raises:
             Exception: If the command was not yet saved to Fiware
         """
-        client = self._instance_link.semantic_manager.get_client(
+        client = self._instance_link.semantic_manager.get_pooled_client(
             self._instance_link.instance_identifier.header
         )
 
@@ -293,7 +297,6 @@ class Command(DeviceProperty):
             entity_type=identifier.type,
             command=context_command,
         )
-        client.close()
 
     def get_info(self) -> str:
         """
@@ -409,10 +412,8 @@ class Field(BaseModel):
     _instance_identifier: InstanceIdentifier
     "Identifier of instance, that has this field as property"
 
-    _set: Set = Field(
-        default=set(),
-        description="Internal set of the field, to which values are saved",
-    )
+    _set: Set = pyd.PrivateAttr(default_factory=set)
+    "Internal set of the field, to which values are saved"
 
     def __init__(self, name, semantic_manager):
         self._semantic_manager = semantic_manager
@@ -426,6 +427,15 @@ class Field(BaseModel):
         """
         pass
 
+    def _mark_dirty(self):
+        """
+        Note in the registry that the instance of this field changed
+        """
+        # the identifier is set after the construction of the field
+        identifier = getattr(self, "_instance_identifier", None)
+        if identifier is not None:
+            self._semantic_manager.instance_registry.mark_dirty(identifier)
+
     def build_context_attribute(self) -> NamedContextAttribute:
         """
         Convert the field to a NamedContextAttribute that can eb added to a
@@ -502,6 +512,7 @@ class Field(BaseModel):
             KeyError: if value not in field
         """
         self._set.remove(v)
+        self._mark_dirty()
 
     def add(self, v):
         """
@@ -513,6 +524,7 @@ class Field(BaseModel):
             ValueError: if v is of invalid type
         """
         self._set.add(v)
+        self._mark_dirty()
 
     def update(self, values: Union[List, Set]):
         """
@@ -858,6 +870,94 @@ class DeviceAttributeField(DeviceField):
         return attrs
 
 
+class CompiledRule(NamedTuple):
+    """
+    Rule of a RuleField in a form that can be evaluated without parsing.
+
+    A rule has the form (STATEMENT, [[a,b],[c],[a,..],..]). A value fulfills
+    the rule if it is an instance of all the classes, datatype_catalogue
+    listed in at least one innerlist. A field is fulfilled if a number of
+    values fulfill the rule, the number is depending on the statement.
+
+    The STATEMENTs and their according numbers are (STATEMENT|min|max):
+        - only | len(values) | len(values)
+        - some | 1 | len(values)
+        - min n | n | len(values)
+        - max n | 0 | n
+        - exactly n | n | n
+        - value | 1 | len(values)
+    """
+
+    readable_rule: str
+    statement: str
+    number: Optional[int]
+    outer_list: Tuple[Tuple[Any, ...], ...]
+
+    def is_fulfilled(self, fulfilling_values: int, values: int) -> bool:
+        """
+        Evaluate the statement of the rule
+
+        Args:
+            fulfilling_values: Number of values that fulfill the rule
+            values: Number of values in the field
+
+        Returns:
+            bool
+        """
+        if self.statement == "min":
+            return fulfilling_values >= self.number
+        if self.statement == "max":
+            return fulfilling_values <= self.number
+        if self.statement == "exactly":
+            return fulfilling_values == self.number
+        if self.statement in ("some", "value"):
+            return fulfilling_values >= 1
+        if self.statement == "only":
+            return fulfilling_values == values
+        return True
+
+
+class CompiledRules(NamedTuple):
+    """
+    Compiled rules of a RuleField and the cached rule results of values
+    """
+
+    rules: Tuple[CompiledRule, ...]
+    value_results: Dict[Hashable, Tuple[bool, ...]]
+
+    @classmethod
+    def compile(cls, rules: List[Tuple[str, List[List]]], rule: str) -> "CompiledRules":
+        """
+        Compile the rules of a field
+
+        Args:
+            rules: Rules formatted for machine readability
+            rule: Rules formatted for human readability, separated by ","
+
+        Returns:
+            CompiledRules
+        """
+        readable_rules = rule.split(",")
+        compiled = []
+        for index, (statement, outer_list) in enumerate(rules):
+            number = None
+            for keyword in ("min", "max", "exactly", "some", "only", "value"):
+                if keyword in statement:
+                    if keyword in ("min", "max", "exactly"):
+                        number = int(statement.split("|")[1])
+                    statement = keyword
+                    break
+            compiled.append(
+                CompiledRule(
+                    readable_rule=readable_rules[index].strip(),
+                    statement=statement,
+                    number=number,
+                    outer_list=tuple(tuple(inner_list) for inner_list in outer_list),
+                )
+            )
+        return cls(rules=tuple(compiled), value_results={})
+
+
 class RuleField(Field):
     """
     A RuleField corresponds to a CombinedRelation for a class from the
@@ -875,6 +975,9 @@ class RuleField(Field):
         default="", description="rule formatted for human readability"
     )
 
+    _rule_results: Optional[List[Tuple[str, bool]]] = None
+    """Cached result of are_rules_fulfilled, reset if the values change"""
+
     def __init__(self, rule, name, semantic_manager):
         self._semantic_manager = semantic_manager
         super().__init__(name, semantic_manager)
@@ -900,83 +1003,113 @@ class RuleField(Field):
         Check if the values present in this relationship fulfill the
         individual semantic rules.
 
+        The result is cached until the values of the field change.
+
         Returns:
             List[Tuple[str, bool]], [[readable_rule, fulfilled]]
         """
+        if self._rule_results is None:
+            self._rule_results = self._evaluate_rules()
+        return [
+            [readable_rule, fulfilled]
+            for readable_rule, fulfilled in self._rule_results
+        ]
 
-        # rule has form: (STATEMENT, [[a,b],[c],[a,..],..])
-        # A value fulfills the rule if it is an instance of all the classes,
-        #       datatype_catalogue listed in at least one innerlist
-        # A field is fulfilled if a number of values fulfill the rule,
-        #       the number is depending on the statement
+    def _evaluate_rules(self) -> List[Tuple[str, bool]]:
+        """
+        Evaluate the compiled rules against the values of the field
 
-        # The STATEMENTs and their according numbers are (STATEMENT|min|max):
-        #       - only | len(values) | len(values)
-        #       - some | 1 | len(values)
-        #       - min n | n | len(values)
-        #       - max n | 0 | n
-        #       - range n,m | n | m
+        Returns:
+            List[Tuple[str, bool]], [(readable_rule, fulfilled)]
+        """
+        compiled_rules = self._get_compiled_rules()
+
+        # count how many values fulfill each rule. Values with equal keys
+        # fulfill the same rules, hence each key is only evaluated once
+        fulfilling_values = [0] * len(compiled_rules.rules)
+        for value in self._set:
+            key = self._get_value_key(value)
+            fulfilled = None
+            if key is not None:
+                fulfilled = compiled_rules.value_results.get(key)
+            if fulfilled is None:
+                fulfilled = tuple(
+                    # A value fulfills the rule if there exists an innerlist
+                    # of which the value is an instance of each value
+                    any(
+                        all(
+                            self._raw_value_is_valid(value, rule_value)
+                            for rule_value in inner_list
+                        )
+                        for inner_list in compiled_rule.outer_list
+                    )
+                    for compiled_rule in compiled_rules.rules
+                )
+                if key is not None:
+                    compiled_rules.value_results[key] = fulfilled
+            for index, value_fulfills in enumerate(fulfilled):
+                if value_fulfills:
+                    fulfilling_values[index] += 1
 
-        res = []
+        return [
+            (
+                compiled_rule.readable_rule,
+                compiled_rule.is_fulfilled(fulfilling_values[index], len(self._set)),
+            )
+            for index, compiled_rule in enumerate(compiled_rules.rules)
+        ]
 
-        values = self.get_all()
-        readable_rules = self.rule.split(",")
-        rule_counter = 0
+    def _get_compiled_rules(self) -> "CompiledRules":
+        """
+        Get the compiled rules of the field. The rules of a field are equal
+        for all instances of a class, hence they are compiled once per class
+        and kept in the semantic manager
 
-        # loop over all rules, if a rule is not fulfilled return False
-        for rule in self._rules:
-            # rule has form: (STATEMENT, [[a,b],[c],[a,..],..])
-            statement: str = rule[0]
-            outer_list: List[List] = rule[1]
+        Returns:
+            CompiledRules
+        """
+        identifier = getattr(self, "_instance_identifier", None)
+        if identifier is None:
+            return CompiledRules.compile(rules=self._rules, rule=self.rule)
+        register = self._semantic_manager._compiled_rules
+        key = (identifier.type, self.name)
+        compiled_rules = register.get(key)
+        if compiled_rules is None:
+            compiled_rules = CompiledRules.compile(rules=self._rules, rule=self.rule)
+            register[key] = compiled_rules
+        return compiled_rules
 
-            readable_rule = readable_rules[rule_counter].strip()
-            rule_counter = rule_counter + 1
-
-            # count how  many values fulfill this rule
-            fulfilling_values = 0
-            for v in values:
-
-                # A value fulfills the rule if there exists an innerlist of
-                # which the value is an instance of each value
-                fulfilled = False
-                for inner_list in outer_list:
-                    counter = 0
-                    for rule_value in inner_list:
-                        if self._value_is_valid(v, rule_value):
-                            counter += 1
-                    if len(inner_list) == counter:
-                        fulfilled = True
-
-                if fulfilled:
-                    fulfilling_values += 1
-
-            # test if rule failed by evaluating the statement and the
-            # number of fulfilling values
-            if "min" in statement:
-                number = int(statement.split("|")[1])
-                if not fulfilling_values >= number:
-                    res.append([readable_rule, False])
-            elif "max" in statement:
-                number = int(statement.split("|")[1])
-                if not fulfilling_values <= number:
-                    res.append([readable_rule, False])
-            elif "exactly" in statement:
-                number = int(statement.split("|")[1])
-                if not fulfilling_values == number:
-                    res.append([readable_rule, False])
-            elif "some" in statement:
-                if not fulfilling_values >= 1:
-                    res.append([readable_rule, False])
-            elif "only" in statement:
-                if not fulfilling_values == len(values):
-                    res.append([readable_rule, False])
-            elif "value" in statement:
-                if not fulfilling_values >= 1:
-                    res.append([readable_rule, False])
-
-            if len(res) == 0 or not (res[-1][0] == readable_rule):
-                res.append([readable_rule, True])
-        return res
+    def _get_value_key(self, value) -> Optional[Hashable]:
+        """
+        Get the key of a value as it is hold inside the internal set.
+        Values with equal keys fulfill the same rules.
+
+        Args:
+            value: Value in the internal set
+
+        Returns:
+            Hashable, or None if the rule results of the value are not cached
+        """
+        # the possible values are unbounded, hence they are not cached
+        return None
+
+    def _raw_value_is_valid(self, value, rule_value) -> bool:
+        """
+        Test if a value as it is hold inside the internal set, fulfills a
+        part of a rule
+
+        Args:
+            value: Value in the internal set
+            rule_value: Value from inner List of rules_
+
+        Returns:
+            bool, True if valid
+        """
+        return self._value_is_valid(self._convert_value(value), rule_value)
+
+    def _mark_dirty(self):
+        self._rule_results = None
+        super()._mark_dirty()
 
     def _value_is_valid(self, value, rule_value) -> bool:
         """
@@ -1042,6 +1175,7 @@ class DataField(RuleField):
             self._set.add(v.value)
         else:
             self._set.add(v)
+        self._mark_dirty()
 
     def __str__(self):
         return "Data" + super().__str__()
@@ -1118,6 +1252,21 @@ class RelationField(RuleField):
             name=self.name, type=DataType.RELATIONSHIP, value=values
         )
 
+    def _get_value_key(self, value) -> Hashable:
+        # the rules only depend on the class of the instances
+        if isinstance(value, InstanceIdentifier):
+            return "class", value.type
+        return "individual", value
+
+    def _raw_value_is_valid(self, value, rule_value: type) -> bool:
+        # the referenced instances need not be loaded
+        if isinstance(value, InstanceIdentifier):
+            class_ = self._semantic_manager.get_class_by_name(value.type)
+            return issubclass(class_, rule_value)
+        return self._semantic_manager.get_individual(value).is_instance_of_class(
+            rule_value
+        )
+
     def _convert_value(self, v):
         """
         Returns the internal holded objects as SemanticClass or
@@ -1148,6 +1297,7 @@ class RelationField(RuleField):
                 "Only instances of a SemanticClass or a "
                 "SemanticIndividual can be given as value"
             )
+        self._mark_dirty()
 
     def remove(self, v):
         """see class description"""
@@ -1178,6 +1328,7 @@ class RelationField(RuleField):
             raise KeyError(
                 f"v is neither of type SemanticIndividual nor SemanticClass but {type(v)}"
             )
+        self._mark_dirty()
 
     def _add_inverse(self, v: "SemanticClass"):
         """
@@ -1202,6 +1353,11 @@ class RelationField(RuleField):
         return super().__iter__()
 
     def get_all(self) -> List[Union["SemanticClass", "SemanticIndividual"]]:
+        # load all referenced instances, that are not in the local state,
+        # with batch queries instead of one request per value
+        self._semantic_manager.load_instances(
+            [v for v in self._set if isinstance(v, InstanceIdentifier)]
+        )
         return super(RelationField, self).get_all()
 
     def get_all_raw(self) -> Set[Union[InstanceIdentifier, str]]:
@@ -1281,17 +1437,22 @@ class SemanticClass(BaseModel):
 
     If no, it is looked if this instance exists in Fiware, if yes it is
     loaded and returned, else a new instance of the class is initialised and
-    returned
+    returned. The lookup in Fiware is skipped for identifiers that are known
+    to be absent (see SemanticsManager.prefetch_instance_existence) and if
+    the SemanticsManager uses optimistic_creation
     """
 
-    model_config = ConfigDict(arbitrary_types_allowed=True, frozen=True)
+    # the id pattern uses look-arounds, which only the python engine supports
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True, frozen=True, regex_engine="python-re"
+    )
     header: InstanceHeader = pyd.Field(
         description="Header of instance. Holds the information where the "
         "instance is saved in Fiware"
     )
     id: str = pyd.Field(
         description="Id of the instance, equal to Fiware ContextEntity Id",
-        regex=FiwareRegex.standard.value,
+        pattern=FiwareRegex.standard.value,
     )
 
     old_state: InstanceState = pyd.Field(
@@ -1334,6 +1495,7 @@ class SemanticClass(BaseModel):
         if identifier not in self.references:
             self.references[identifier] = []
         self.references[identifier].append(relation_name)
+        self.semantic_manager.instance_registry.mark_dirty(self.get_identifier())
 
     def remove_reference(self, identifier: InstanceIdentifier, relation_name: str):
         """
@@ -1349,6 +1511,7 @@ class SemanticClass(BaseModel):
         self.references[identifier].remove(relation_name)
         if len(self.references[identifier]) == 0:
             del self.references[identifier]
+        self.semantic_manager.instance_registry.mark_dirty(self.get_identifier())
 
     def __new__(cls, *args, **kwargs):
         semantic_manager_ = kwargs["semantic_manager"]
@@ -1383,7 +1546,10 @@ class SemanticClass(BaseModel):
                 id=instance_id, type=cls.__name__, header=header_
             )
 
-            if semantic_manager_.does_instance_exists(identifier=identifier):
+            if semantic_manager_.does_instance_exists(
+                identifier=identifier,
+                check_fiware=not semantic_manager_.optimistic_creation,
+            ):
                 return semantic_manager_.load_instance(identifier=identifier)
 
         return super().__new__(cls)
@@ -1418,9 +1584,10 @@ class SemanticClass(BaseModel):
 
         # test if this instance was taken out of the instance_registry instead
         # of being newly created. If yes abort __init__(), to prevent state
-        # overwrite !
+        # overwrite ! Instances loaded from Fiware in __new__ are registered
+        # as well, hence the local registry suffices
         if not enforce_new:
-            if semantic_manager_.does_instance_exists(identifier_):
+            if semantic_manager_.instance_registry.contains(identifier_):
                 return
 
         super().__init__(
@@ -1664,7 +1831,34 @@ class SemanticClass(BaseModel):
     def __str__(self):
         return str(self.model_dump(exclude={"semantic_manager", "old_state"}))
 
-    def __hash__(self):
+    def is_dirty(self) -> bool:
+        """
+        Check if the instance changed since it was loaded from or saved to
+        Fiware. New instances are always dirty.
+
+        Returns:
+            bool
+        """
+        old_entity = self.old_state.state
+        if old_entity is None:
+            return True
+        if self.semantic_manager.instance_registry.is_marked_dirty(
+            self.get_identifier()
+        ):
+            return True
+        # the metadata can be changed without notice
+        return self.metadata != SemanticMetadata.model_validate(
+            old_entity.get_attribute("metadata").value
+        )
+
+    def compute_state_hash(self) -> int:
+        """
+        Compute the hash of the fields and references of the instance.
+        Use __hash__, which caches the result until the instance changes.
+
+        Returns:
+            int
+        """
         values = []
         for field in self.get_fields():
             values.extend((field.name, frozenset(field.get_all_raw())))
@@ -1677,14 +1871,21 @@ class SemanticClass(BaseModel):
             (
                 self.id,
                 self.header,
-                self.metadata.name,
-                self.metadata.comment,
                 frozenset(self.references.keys()),
                 ref_string,
                 frozenset(values),
             )
         )
 
+    def __hash__(self):
+        return hash(
+            (
+                self.semantic_manager.instance_registry.get_state_hash(self),
+                self.metadata.name,
+                self.metadata.comment,
+            )
+        )
+
 
 class SemanticDeviceClass(SemanticClass):
     """
@@ -1698,7 +1899,9 @@ class SemanticDeviceClass(SemanticClass):
 
     If no, it is looked if this instance exists in Fiware, if yes it is
     loaded and returned, else a new instance of the class is initialised and
-    returned
+    returned. The lookup in Fiware is skipped for identifiers that are known
+    to be absent (see SemanticsManager.prefetch_instance_existence) and if
+    the SemanticsManager uses optimistic_creation
     """
 
     device_settings: iot.DeviceSettings = pyd.Field(
@@ -1727,6 +1930,19 @@ class SemanticDeviceClass(SemanticClass):
         """
         return self.device_settings.transport is not None
 
+    def is_dirty(self) -> bool:
+        if super().is_dirty():
+            return True
+        # the device settings can be changed without notice
+        return self.device_settings != iot.DeviceSettings.model_validate(
+            self.old_state.state.get_attribute("deviceSettings").value
+        )
+
+    def __hash__(self):
+        # the device settings can be changed without notice, hence they are
+        # not part of the cached state hash
+        return hash((super().__hash__(), self.device_settings.model_dump_json()))
+
     def get_fields(self) -> List[Field]:
         """
         Get all fields of class
@@ -1869,10 +2085,8 @@ class SemanticIndividual(BaseModel):
     """
 
     model_config = ConfigDict(frozen=True)
-    _parent_classes: List[type] = pyd.Field(
-        description="List of ontology parent classes needed to validate "
-        "RelationFields"
-    )
+    _parent_classes: List[type] = pyd.PrivateAttr()
+    "List of ontology parent classes needed to validate RelationFields"
 
     def __eq__(self, other):
         """Each instance of an SemanticIndividual Class is equal"""
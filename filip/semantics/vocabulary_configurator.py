@@ -93,7 +93,10 @@ class VocabularyConfigurator:
 
     @classmethod
     def delete_source_from_vocabulary(
-        cls, vocabulary: Vocabulary, source_id: str
+        cls,
+        vocabulary: Vocabulary,
+        source_id: str,
+        max_workers: Optional[int] = 1,
     ) -> Vocabulary:
         """
         Delete a source from the vocabulary
@@ -102,6 +105,9 @@ class VocabularyConfigurator:
             vocabulary (Vocabulary): Vocabulary from which the source should
             be removed
             source_id (str): Id of source to remove
+            max_workers (Optional[int]): Maximal number of processes used to
+                parse sources, that were not parsed before. Defaults to 1,
+                the current process. If None the number of processors is used
 
         Raises:
             ValueError:  If no source with given Id exists in Vocabulary
@@ -110,15 +116,24 @@ class VocabularyConfigurator:
             New Vocabulary without the given source
         """
         new_vocabulary = Vocabulary(settings=copy.copy(vocabulary.settings))
+        remaining_sources = [
+            source for source in vocabulary.sources.values() if source.id != source_id
+        ]
+        found = len(remaining_sources) < len(vocabulary.sources)
+
+        RdfParser.load_graphs(remaining_sources, max_workers=max_workers)
         parser = RdfParser()
-        found = False
-        for source in vocabulary.sources.values():
-            if not source_id == source.id:
-                parser.parse_source_into_vocabulary(
-                    source=copy.deepcopy(source), vocabulary=new_vocabulary
-                )
-            else:
-                found = True
+        for source in remaining_sources:
+            # the content is immutable, only the logs need to be copied
+            source_copy = source.model_copy(
+                update={
+                    "parsing_log": list(source.parsing_log),
+                    "dependency_statements": list(source.dependency_statements),
+                }
+            )
+            parser.parse_source_into_vocabulary(
+                source=source_copy, vocabulary=new_vocabulary
+            )
 
         PostProcessor.post_process_vocabulary(
             vocabulary=new_vocabulary, old_vocabulary=vocabulary
@@ -234,15 +249,25 @@ class VocabularyConfigurator:
 
     @classmethod
     def _parse_sources_into_vocabulary(
-        cls, vocabulary: Vocabulary, sources: List[Source]
+        cls,
+        vocabulary: Vocabulary,
+        sources: List[Source],
+        max_workers: Optional[int] = 1,
     ) -> Vocabulary:
         """
         Parse the given source objects into the vocabulary
 
+        The graphs of the sources are cached by their content, hence only new
+        or changed sources are read. If several sources need to be read and
+        max_workers is not 1, they are read in parallel processes.
+
         Args:
             vocabulary (Vocabulary): Vocabulary to which the source should
             be added
             sources (List[Source]): Source objects to be added
+            max_workers (Optional[int]): Maximal number of processes used to
+                read the sources. Defaults to 1, the current process. If None
+                the number of processors is used
 
         Raises:
             ParsingException:  If the given source was not valid and could not
@@ -252,11 +277,21 @@ class VocabularyConfigurator:
             New Vocabulary with the given sources added to it
         """
 
+        # read all sources that are not cached, before they are parsed into
+        # the vocabulary in order
+        try:
+            RdfParser.load_graphs(
+                list(vocabulary.sources.values()) + sources, max_workers=max_workers
+            )
+        except Exception as e:
+            raise ParsingException(e.args)
+
         # create a new vocabulary by reparsing the existing sources
         new_vocabulary = Vocabulary(settings=copy.copy(vocabulary.settings))
         parser = RdfParser()
         for source in vocabulary.sources.values():
-            source_copy = copy.deepcopy(source)
+            # clear creates new logs, the original source is not changed
+            source_copy = source.model_copy()
             source_copy.clear()
             parser.parse_source_into_vocabulary(
                 source=source_copy, vocabulary=new_vocabulary
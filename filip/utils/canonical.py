@@ -0,0 +1,179 @@
+"""
+Canonical forms and hashes of FiLiP models.
+
+Two models that are considered equal get the same canonical hash. Hence,
+equality checks and the detection of duplicates reduce to dictionary lookups
+after hashing every model once, instead of comparing all pairs of models.
+"""
+
+import hashlib
+import json
+from typing import AbstractSet, Any, Dict, Union
+from pydantic import BaseModel
+from filip.models.ngsi_v2.context import ContextEntity
+from filip.models.ngsi_v2.registrations import Registration
+from filip.models.ngsi_v2.subscriptions import Subscription
+
+# Fields that are ignored when checking if two subscriptions are equal
+SUBSCRIPTION_COMPARISON_EXCLUDE = {
+    "notification": {
+        "lastSuccess": True,
+        "lastFailure": True,
+        "lastSuccessCode": True,
+        "lastFailureReason": True,
+        "mqtt": {"passwd"},
+        "mqttCustom": {"passwd"},
+    }
+}
+
+# Keys that are maintained by the server and ignored at any nesting level
+SUBSCRIPTION_VOLATILE_KEYS = frozenset({"timesSent", "lastNotification"})
+ENTITY_VOLATILE_KEYS = frozenset({"dateCreated", "dateModified"})
+
+
+def canonicalize(
+    value: Any,
+    *,
+    set_like_lists: bool = True,
+    ignore_empty: bool = True,
+    exclude_keys: AbstractSet[str] = frozenset(),
+) -> Any:
+    """
+    Recursively brings a json-compatible value into a canonical form.
+
+    Args:
+        value: Value to canonicalize, e.g. the output of
+            `model_dump(mode="json")`
+        set_like_lists: If True, the order of list items is ignored.
+        ignore_empty: If True, empty values (None, False, 0, "", [] and {})
+            are treated as if they were not set at all.
+        exclude_keys: Dictionary keys that are dropped at any level
+
+    Returns:
+        Canonical form of the value
+    """
+    if isinstance(value, dict):
+        canonical = {}
+        for key, item in value.items():
+            if key in exclude_keys:
+                continue
+            item = canonicalize(
+                item,
+                set_like_lists=set_like_lists,
+                ignore_empty=ignore_empty,
+                exclude_keys=exclude_keys,
+            )
+            if item is not None or not ignore_empty:
+                canonical[key] = item
+        if ignore_empty and not canonical:
+            return None
+        return canonical
+    if isinstance(value, (list, tuple)):
+        items = [
+            canonicalize(
+                item,
+                set_like_lists=set_like_lists,
+                ignore_empty=ignore_empty,
+                exclude_keys=exclude_keys,
+            )
+            for item in value
+        ]
+        if ignore_empty and all(item is None for item in items):
+            return None
+        if set_like_lists:
+            items.sort(key=lambda item: json.dumps(item, sort_keys=True, default=str))
+        return items
+    if ignore_empty and not value:
+        return None
+    return value
+
+
+def canonical_hash(
+    value: Union[BaseModel, Any],
+    *,
+    include: Union[AbstractSet, Dict] = None,
+    exclude: Union[AbstractSet, Dict] = None,
+    set_like_lists: bool = True,
+    ignore_empty: bool = True,
+    exclude_keys: AbstractSet[str] = frozenset(),
+) -> str:
+    """
+    Computes a stable hash of the canonical form of a model or value.
+
+    Args:
+        value: Pydantic model or json-compatible value
+        include: Fields of the model to include, see `model_dump`
+        exclude: Fields of the model to exclude, see `model_dump`
+        set_like_lists: see `canonicalize`
+        ignore_empty: see `canonicalize`
+        exclude_keys: see `canonicalize`
+
+    Returns:
+        str: Hex digest of the canonical form
+    """
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json", include=include, exclude=exclude)
+    canonical = canonicalize(
+        value,
+        set_like_lists=set_like_lists,
+        ignore_empty=ignore_empty,
+        exclude_keys=exclude_keys,
+    )
+    return hashlib.sha256(
+        json.dumps(canonical, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def subscription_hash(subscription: Subscription) -> str:
+    """
+    Hash of the subject and notification of a subscription. Subscriptions
+    with the same hash are considered duplicates by the context broker
+    clients. The order of list items, empty values, passwords and notification
+    statistics are ignored.
+
+    Args:
+        subscription: Subscription to hash
+
+    Returns:
+        str: Hex digest
+    """
+    return canonical_hash(
+        subscription,
+        include={"subject", "notification"},
+        exclude=SUBSCRIPTION_COMPARISON_EXCLUDE,
+        exclude_keys=SUBSCRIPTION_VOLATILE_KEYS,
+    )
+
+
+def registration_hash(registration: Registration) -> str:
+    """
+    Hash of the provider and the provided data of a registration. The order
+    of list items and empty values are ignored.
+
+    Args:
+        registration: Registration to hash
+
+    Returns:
+        str: Hex digest
+    """
+    return canonical_hash(registration, include={"provider", "dataProvided"})
+
+
+def entity_hash(entity: Union[ContextEntity, Dict]) -> str:
+    """
+    Hash of a context entity including all of its attributes. In contrast to
+    subscriptions, list values and empty values of entities are significant.
+    Only server-side timestamps are ignored.
+
+    Args:
+        entity: Context entity to hash, or its json-compatible dump
+
+    Returns:
+        str: Hex digest
+    """
+    return canonical_hash(
+        entity,
+        set_like_lists=False,
+        ignore_empty=False,
+        exclude_keys=ENTITY_VOLATILE_KEYS,
+    )
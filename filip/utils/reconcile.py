@@ -0,0 +1,543 @@
+"""
+Declarative reconciliation of a complete tenant state. Service groups,
+devices, context entities and subscriptions are compared with their live
+state and converged with as few requests as possible.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from pydantic import BaseModel, Field, PositiveInt
+from filip.clients.ngsi_v2 import ContextBrokerClient, IoTAClient
+from filip.models.ngsi_v2.context import ActionType, ContextEntity
+from filip.models.ngsi_v2.iot import Device, ServiceGroup
+from filip.models.ngsi_v2.subscriptions import Subscription
+from filip.utils.canonical import entity_hash, subscription_hash
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceKind(str, Enum):
+    """
+    Kinds of resources handled by the reconciler. The order of the members
+    is the order in which changes are applied.
+    """
+
+    SERVICE_GROUP = "service_group"
+    DEVICE = "device"
+    ENTITY = "entity"
+    SUBSCRIPTION = "subscription"
+
+
+class ReconciliationAction(str, Enum):
+    """
+    Actions required to converge a single resource
+    """
+
+    CREATE = "create"
+    RECREATE = "recreate"
+    UPDATE = "update"
+    DELETE = "delete"
+    UNCHANGED = "unchanged"
+
+
+class DesiredState(BaseModel):
+    """
+    Complete desired state of a tenant
+    """
+
+    service_groups: List[ServiceGroup] = Field(
+        default=[], description="Service groups of the IoT-Agent"
+    )
+    devices: List[Device] = Field(default=[], description="Devices of the IoT-Agent")
+    entities: List[ContextEntity] = Field(
+        default=[], description="Context entities that are not managed by devices"
+    )
+    subscriptions: List[Subscription] = Field(
+        default=[], description="Subscriptions of the context broker"
+    )
+
+
+class PlannedChange(BaseModel):
+    """
+    Change of a single resource
+    """
+
+    kind: ResourceKind
+    action: ReconciliationAction
+    identifier: str
+    resource: Optional[Any] = Field(default=None, exclude=True, repr=False)
+
+
+class ReconciliationPlan(BaseModel):
+    """
+    Dependency-ordered list of changes
+    """
+
+    changes: List[PlannedChange] = []
+
+    def get_changes(
+        self, kind: ResourceKind, action: ReconciliationAction
+    ) -> List[PlannedChange]:
+        """
+        Returns all changes of a kind of resource with the given action
+        """
+        return [
+            change
+            for change in self.changes
+            if change.kind == kind and change.action == action
+        ]
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the number of changes per kind of resource and action
+        """
+        summary = {kind.value: {} for kind in ResourceKind}
+        for change in self.changes:
+            actions = summary[change.kind.value]
+            actions[change.action.value] = actions.get(change.action.value, 0) + 1
+        return summary
+
+    def __str__(self):
+        symbols = {
+            ReconciliationAction.CREATE: "+",
+            ReconciliationAction.RECREATE: "±",
+            ReconciliationAction.UPDATE: "~",
+            ReconciliationAction.DELETE: "-",
+        }
+        lines = [
+            f"{symbols[change.action]} {change.kind.value} {change.identifier}"
+            for change in self.changes
+            if change.action != ReconciliationAction.UNCHANGED
+        ]
+        return "\n".join(lines) or "No changes"
+
+
+class ReconciliationReport(BaseModel):
+    """
+    Result of a reconciliation run
+    """
+
+    plan: ReconciliationPlan
+    dry_run: bool
+    timings: Dict[str, float] = Field(
+        default={}, description="Duration of the single phases in seconds"
+    )
+
+
+class StateReconciler:
+    """
+    Converges the state of a tenant towards a desired state.
+
+    The current state is fetched with one listing per kind of resource.
+    Afterwards, a plan is computed and applied in dependency order, i.e.
+    service groups before devices before entities before subscriptions.
+    Independent requests are sent in parallel and entity changes are
+    written with chunked batch operations.
+
+    Example::
+
+        reconciler = StateReconciler(cb_client=cb_client,
+                                     iota_client=iota_client)
+        state = DesiredState(devices=devices, subscriptions=subscriptions)
+        report = reconciler.reconcile(state, dry_run=True)
+        print(report.plan)
+
+    Args:
+        cb_client: Context broker client of the tenant
+        iota_client: IoT-Agent client of the tenant
+        max_workers: Number of parallel requests
+        chunk_size: Maximal number of entities per batch operation
+    """
+
+    def __init__(
+        self,
+        cb_client: ContextBrokerClient,
+        iota_client: IoTAClient = None,
+        max_workers: PositiveInt = 1,
+        chunk_size: PositiveInt = 100,
+    ):
+        self.cb_client = cb_client
+        self.iota_client = iota_client
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._timings: Dict[str, float] = {}
+
+    def reconcile(
+        self, desired: DesiredState, dry_run: bool = False, prune: bool = False
+    ) -> ReconciliationReport:
+        """
+        Computes the plan for the desired state and applies it.
+
+        Args:
+            desired: Desired state of the tenant
+            dry_run: If True, the plan is only computed but not applied
+            prune: If True, resources that are not part of the desired state
+                are deleted. Entities managed by desired devices are kept.
+
+        Returns:
+            ReconciliationReport
+        """
+        self._timings = {}
+        plan = self.plan(desired=desired, prune=prune)
+        if not dry_run:
+            self.apply(plan=plan)
+        logger.info("Reconciliation plan: %s", plan.summary())
+        return ReconciliationReport(
+            plan=plan, dry_run=dry_run, timings=dict(self._timings)
+        )
+
+    def plan(self, desired: DesiredState, prune: bool = False) -> ReconciliationPlan:
+        """
+        Fetches the current state and computes the changes required to
+        converge it towards the desired state.
+
+        Args:
+            desired: Desired state of the tenant
+            prune: If True, resources that are not part of the desired state
+                are deleted.
+
+        Returns:
+            ReconciliationPlan
+        """
+        if (desired.service_groups or desired.devices) and self.iota_client is None:
+            raise ValueError("An IoTAClient is required for groups and devices!")
+
+        with self._timer("fetch"):
+            live_groups = []
+            live_devices = []
+            if self.iota_client is not None:
+                live_groups = self.iota_client.get_group_list()
+                live_devices = self.iota_client.get_device_list()
+            live_entities = self.cb_client.get_entity_list()
+            live_subscriptions = self.cb_client.get_subscription_list()
+
+        with self._timer("plan"):
+            changes = []
+            changes.extend(self._plan_groups(desired, live_groups, prune))
+            changes.extend(self._plan_devices(desired, live_devices, prune))
+            changes.extend(self._plan_entities(desired, live_entities, prune))
+            changes.extend(self._plan_subscriptions(desired, live_subscriptions, prune))
+        return ReconciliationPlan(changes=changes)
+
+    def apply(self, plan: ReconciliationPlan) -> None:
+        """
+        Applies a plan. Creations and updates are applied in dependency
+        order, deletions in reverse order.
+
+        Args:
+            plan: Plan computed by `plan`
+
+        Returns:
+            None
+        """
+        with self._timer(ResourceKind.SERVICE_GROUP.value):
+            self._apply_groups(plan)
+        with self._timer(ResourceKind.DEVICE.value):
+            self._apply_devices(plan)
+        with self._timer(ResourceKind.ENTITY.value):
+            self._apply_entities(plan)
+        with self._timer(ResourceKind.SUBSCRIPTION.value):
+            self._apply_subscriptions(plan)
+        with self._timer("prune"):
+            self._apply_deletions(plan)
+
+    @contextmanager
+    def _timer(self, phase: str):
+        """
+        Measures the duration of a phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._timings[phase] = self._timings.get(phase, 0.0) + (
+                time.perf_counter() - start
+            )
+
+    def _run_concurrently(self, func: Callable, items: Iterable) -> None:
+        """
+        Calls a function for all items on a thread pool and propagates errors
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(func, item) for item in items]:
+                future.result()
+
+    def _chunks(self, items: List):
+        """
+        Yields successive chunks of a list
+        """
+        for i in range(0, len(items), self.chunk_size):
+            yield items[i : i + self.chunk_size]
+
+    # Planning
+    @staticmethod
+    def _group_key(group: ServiceGroup) -> str:
+        return f"{group.resource}:{group.apikey}"
+
+    @staticmethod
+    def _group_dump(group: ServiceGroup) -> Dict:
+        return group.model_dump(exclude={"service", "subservice"}, exclude_none=True)
+
+    def _plan_groups(
+        self, desired: DesiredState, live_groups: List[ServiceGroup], prune: bool
+    ) -> List[PlannedChange]:
+        live = {self._group_key(group): group for group in live_groups}
+        changes = []
+        for group in desired.service_groups:
+            key = self._group_key(group)
+            if key not in live:
+                action = ReconciliationAction.CREATE
+            elif self._group_dump(live.pop(key)) != self._group_dump(group):
+                action = ReconciliationAction.UPDATE
+            else:
+                action = ReconciliationAction.UNCHANGED
+            changes.append(
+                PlannedChange(
+                    kind=ResourceKind.SERVICE_GROUP,
+                    action=action,
+                    identifier=key,
+                    resource=group,
+                )
+            )
+        if prune:
+            changes.extend(
+                PlannedChange(
+                    kind=ResourceKind.SERVICE_GROUP,
+                    action=ReconciliationAction.DELETE,
+                    identifier=key,
+                    resource=group,
+                )
+                for key, group in live.items()
+            )
+        return changes
+
+    def _plan_devices(
+        self, desired: DesiredState, live_devices: List[Device], prune: bool
+    ) -> List[PlannedChange]:
+        if self.iota_client is None or (not desired.devices and not prune):
+            return []
+        device_plan = self.iota_client.plan_device_changes(
+            devices=desired.devices, live_devices=live_devices
+        )
+        devices = {device.device_id: device for device in desired.devices}
+        changes = [
+            PlannedChange(
+                kind=ResourceKind.DEVICE,
+                action=ReconciliationAction(action),
+                identifier=device_id,
+                resource=devices[device_id],
+            )
+            for action, device_ids in device_plan.items()
+            for device_id in device_ids
+        ]
+        if prune:
+            changes.extend(
+                PlannedChange(
+                    kind=ResourceKind.DEVICE,
+                    action=ReconciliationAction.DELETE,
+                    identifier=device.device_id,
+                    resource=device,
+                )
+                for device in live_devices
+                if device.device_id not in devices
+            )
+        return changes
+
+    @staticmethod
+    def _entity_key(entity_id: str, entity_type: str) -> str:
+        return f"{entity_type}:{entity_id}"
+
+    def _plan_entities(
+        self, desired: DesiredState, live_entities: List[ContextEntity], prune: bool
+    ) -> List[PlannedChange]:
+        live = {
+            self._entity_key(entity.id, entity.type): entity.model_dump(mode="json")
+            for entity in live_entities
+        }
+        changes = []
+        for entity in desired.entities:
+            key = self._entity_key(entity.id, entity.type)
+            entity_dict = entity.model_dump(mode="json")
+            live_entity = live.pop(key, None)
+            if live_entity is None:
+                action = ReconciliationAction.CREATE
+            # only the attributes of the desired entity are compared, live
+            # entities may contain additional attributes, e.g. from devices
+            elif entity_hash(entity_dict) != entity_hash(
+                {name: live_entity.get(name) for name in entity_dict}
+            ):
+                action = ReconciliationAction.UPDATE
+            else:
+                action = ReconciliationAction.UNCHANGED
+            changes.append(
+                PlannedChange(
+                    kind=ResourceKind.ENTITY,
+                    action=action,
+                    identifier=key,
+                    resource=entity,
+                )
+            )
+        if prune:
+            for device in desired.devices:
+                live.pop(self._entity_key(device.entity_name, device.entity_type), None)
+            changes.extend(
+                PlannedChange(
+                    kind=ResourceKind.ENTITY,
+                    action=ReconciliationAction.DELETE,
+                    identifier=key,
+                    resource=ContextEntity(id=entity["id"], type=entity["type"]),
+                )
+                for key, entity in live.items()
+            )
+        return changes
+
+    def _plan_subscriptions(
+        self,
+        desired: DesiredState,
+        live_subscriptions: List[Subscription],
+        prune: bool,
+    ) -> List[PlannedChange]:
+        live = {sub.id: sub for sub in live_subscriptions}
+        # live duplicates share a fingerprint, only the first one is kept.
+        # The subscription index of the context broker client keeps the same
+        live_ids_by_fingerprint: Dict[str, List[str]] = {}
+        for sub in live_subscriptions:
+            live_ids_by_fingerprint.setdefault(subscription_hash(sub), []).append(
+                sub.id
+            )
+        changes = []
+        planned = set()
+        for subscription in desired.subscriptions:
+            fingerprint = subscription_hash(subscription)
+            if fingerprint in planned:
+                continue
+            planned.add(fingerprint)
+            live_ids = live_ids_by_fingerprint.get(fingerprint)
+            live_subscription = live.pop(live_ids[0]) if live_ids else None
+            changes.append(
+                PlannedChange(
+                    kind=ResourceKind.SUBSCRIPTION,
+                    action=(
+                        ReconciliationAction.CREATE
+                        if live_subscription is None
+                        else ReconciliationAction.UNCHANGED
+                    ),
+                    identifier=(
+                        fingerprint
+                        if live_subscription is None
+                        else live_subscription.id
+                    ),
+                    resource=subscription,
+                )
+            )
+        if prune:
+            changes.extend(
+                PlannedChange(
+                    kind=ResourceKind.SUBSCRIPTION,
+                    action=ReconciliationAction.DELETE,
+                    identifier=sub.id,
+                    resource=sub,
+                )
+                for sub in live.values()
+            )
+        return changes
+
+    # Application
+    def _apply_groups(self, plan: ReconciliationPlan) -> None:
+        created = plan.get_changes(
+            ResourceKind.SERVICE_GROUP, ReconciliationAction.CREATE
+        )
+        if created:
+            # according to the plan none of the created service groups exists
+            self.iota_client.post_groups(
+                service_groups=[change.resource for change in created],
+                existing_group_keys=set(),
+            )
+        self._run_concurrently(
+            lambda change: self.iota_client.update_group(
+                service_group=change.resource, fields=None, add=False
+            ),
+            plan.get_changes(ResourceKind.SERVICE_GROUP, ReconciliationAction.UPDATE),
+        )
+
+    def _apply_devices(self, plan: ReconciliationPlan) -> None:
+        device_plan = {
+            action.value: [
+                change.identifier
+                for change in plan.get_changes(ResourceKind.DEVICE, action)
+            ]
+            for action in (
+                ReconciliationAction.CREATE,
+                ReconciliationAction.RECREATE,
+                ReconciliationAction.UPDATE,
+                ReconciliationAction.UNCHANGED,
+            )
+        }
+        devices = [
+            change.resource
+            for change in plan.changes
+            if change.kind == ResourceKind.DEVICE
+            and change.action != ReconciliationAction.DELETE
+        ]
+        if len(devices) == len(device_plan[ReconciliationAction.UNCHANGED.value]):
+            return
+        self.iota_client.patch_devices(
+            devices=devices,
+            cb_client=self.cb_client,
+            max_workers=self.max_workers,
+            chunk_size=self.chunk_size,
+            plan=device_plan,
+        )
+
+    def _apply_entities(self, plan: ReconciliationPlan) -> None:
+        entities = [
+            change.resource
+            for change in plan.changes
+            if change.kind == ResourceKind.ENTITY
+            and change.action
+            in (ReconciliationAction.CREATE, ReconciliationAction.UPDATE)
+        ]
+        for chunk in self._chunks(entities):
+            self.cb_client.update(entities=chunk, action_type=ActionType.APPEND)
+
+    def _apply_subscriptions(self, plan: ReconciliationPlan) -> None:
+        created = plan.get_changes(
+            ResourceKind.SUBSCRIPTION, ReconciliationAction.CREATE
+        )
+        if created:
+            self.cb_client.post_subscriptions(
+                subscriptions=[change.resource for change in created],
+                max_workers=self.max_workers,
+                # the plan is based on a fresh listing, the index may be stale
+                refresh_index=True,
+            )
+
+    def _apply_deletions(self, plan: ReconciliationPlan) -> None:
+        self._run_concurrently(
+            lambda change: self.cb_client.delete_subscription(change.identifier),
+            plan.get_changes(ResourceKind.SUBSCRIPTION, ReconciliationAction.DELETE),
+        )
+        entities = [
+            change.resource
+            for change in plan.get_changes(
+                ResourceKind.ENTITY, ReconciliationAction.DELETE
+            )
+        ]
+        for chunk in self._chunks(entities):
+            self.cb_client.update(entities=chunk, action_type=ActionType.DELETE)
+        self._run_concurrently(
+            lambda change: self.iota_client.delete_device(
+                device_id=change.identifier, cb_client=self.cb_client
+            ),
+            plan.get_changes(ResourceKind.DEVICE, ReconciliationAction.DELETE),
+        )
+        self._run_concurrently(
+            lambda change: self.iota_client.delete_group(
+                resource=change.resource.resource, apikey=change.resource.apikey
+            ),
+            plan.get_changes(ResourceKind.SERVICE_GROUP, ReconciliationAction.DELETE),
+        )
@@ -0,0 +1,149 @@
+"""
+Central JSON serialization for the clients and encoders of FiLiP.
+
+If `orjson` is installed it is used as backend, otherwise FiLiP falls back to
+the json module of the standard library. The backend can be selected via the
+`JSON_BACKEND` setting or at runtime with `set_json_backend`. Both backends
+produce compact output and handle datetime objects, enums, sets and pydantic
+models in the same way.
+"""
+
+import json
+import logging
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Any, Callable, Dict, Literal, Union
+from pydantic import BaseModel
+from filip.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(name=__name__)
+
+JsonBackend = Literal["orjson", "json"]
+
+
+def json_default(obj: Any) -> Any:
+    """
+    Converts objects that are not natively json serializable. Used as
+    `default` hook by both backends.
+
+    Args:
+        obj: Object to convert
+
+    Returns:
+        Json serializable representation of the object
+    """
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+def _std_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    return json.dumps(
+        obj,
+        default=json_default,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        sort_keys=sort_keys,
+    ).encode()
+
+
+def _orjson_dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=json_default, option=option)
+
+
+_BACKENDS: Dict[str, Dict[str, Callable]] = {
+    "json": {"dumps": _std_dumps, "loads": json.loads},
+}
+if orjson is not None:
+    _BACKENDS["orjson"] = {"dumps": _orjson_dumps, "loads": orjson.loads}
+
+_backend: Dict[str, Callable] = _BACKENDS["json"]
+json_backend: JsonBackend = "json"
+
+
+def set_json_backend(backend: Union[JsonBackend, Literal["auto"]] = "auto") -> None:
+    """
+    Selects the json backend of FiLiP
+
+    Args:
+        backend: 'orjson', 'json' or 'auto'. 'auto' selects orjson if it is
+            installed.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError: if the requested backend is not available
+    """
+    global _backend, json_backend
+    if backend == "auto":
+        backend = "orjson" if "orjson" in _BACKENDS else "json"
+    if backend not in _BACKENDS:
+        raise ValueError(
+            f"Json backend '{backend}' is not available. "
+            f"Available backends: {list(_BACKENDS)}"
+        )
+    _backend = _BACKENDS[backend]
+    json_backend = backend
+    logger.debug("Using json backend '%s'", backend)
+
+
+def dumpb(obj: Any, sort_keys: bool = False) -> bytes:
+    """
+    Serializes an object into compact json bytes
+
+    Args:
+        obj: Object to serialize
+        sort_keys: If True, dictionary keys are sorted
+
+    Returns:
+        utf-8 encoded json
+    """
+    return _backend["dumps"](obj, sort_keys)
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> str:
+    """
+    Serializes an object into a compact json string
+
+    Args:
+        obj: Object to serialize
+        sort_keys: If True, dictionary keys are sorted
+
+    Returns:
+        json string
+    """
+    return _backend["dumps"](obj, sort_keys).decode()
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """
+    Deserializes json
+
+    Args:
+        data: json document
+
+    Returns:
+        Deserialized object
+
+    Raises:
+        ValueError: if the document is not valid json
+    """
+    return _backend["loads"](data)
+
+
+set_json_backend(settings.JSON_BACKEND)
@@ -5,6 +5,7 @@ Helper functions to prohibit boiler plate code
 import logging
 import re
 import warnings
+from functools import lru_cache
 from aenum import Enum
 from typing import Dict, Any, List
 from pydantic import AnyHttpUrl, validate_call
@@ -238,9 +239,31 @@ jexl_transformation_functions = {
 }
 
 
+# Shared parser, because building the grammar of a JEXL instance is expensive
+_jexl = JEXL()
+
+
+@lru_cache(maxsize=1024)
+def parse_jexl_expression(expression: str):
+    """
+    Parses a JEXL expression with a shared parser. Results are cached by
+    expression, hence the returned syntax tree must not be modified.
+
+    Args:
+        expression: JEXL expression
+
+    Returns:
+        Parsed expression
+
+    Raises:
+        ParseError: if the expression is invalid
+    """
+    return _jexl.parse(expression)
+
+
 def validate_jexl_expression(expression, attribute_name, device_id):
     try:
-        jexl_expression = JEXL().parse(expression)
+        jexl_expression = parse_jexl_expression(expression)
         if isinstance(jexl_expression, Transform):
             if jexl_expression.name not in jexl_transformation_functions.keys():
                 warnings.warn(f"{jexl_expression.name} might not supported")
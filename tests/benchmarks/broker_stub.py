@@ -0,0 +1,277 @@
+"""
+Minimal in-process MQTT broker for benchmarks and offline tests. It
+supports MQTT 3.1.1 and 5.0 with QoS 0-2, plain subscriptions with `+` and
+`#` wildcards and forwards messages with QoS 0. Authentication, retained
+messages, sessions and will messages are not supported.
+"""
+
+import socketserver
+import struct
+import threading
+from collections import Counter
+from typing import List, Tuple
+
+
+# control packet types
+CONNECT = 1
+PUBLISH = 3
+PUBREL = 6
+SUBSCRIBE = 8
+UNSUBSCRIBE = 10
+PINGREQ = 12
+DISCONNECT = 14
+
+
+def encode_length(length: int) -> bytes:
+    """
+    Encodes the remaining length of a packet as variable byte integer
+    """
+    out = bytearray()
+    while True:
+        length, digit = divmod(length, 128)
+        out.append(digit | 0x80 if length else digit)
+        if not length:
+            return bytes(out)
+
+
+def decode_length(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    Decodes a variable byte integer
+
+    Returns:
+        Value and position after the integer
+    """
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value += (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """
+    Checks if a topic matches a subscription filter
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class _Session(socketserver.BaseRequestHandler):
+    """
+    Connection of a single client
+    """
+
+    server: "_Server"
+
+    def setup(self) -> None:
+        self.v5 = False
+        self.send_lock = threading.Lock()
+
+    def send(self, packet: bytes) -> None:
+        with self.send_lock:
+            self.request.sendall(packet)
+
+    def read_exactly(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed")
+            data += chunk
+        return bytes(data)
+
+    def read_packet(self) -> Tuple[int, bytes]:
+        header = self.read_exactly(1)[0]
+        length, shift = 0, 0
+        while True:
+            byte = self.read_exactly(1)[0]
+            length += (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return header, self.read_exactly(length)
+
+    def handle(self) -> None:
+        try:
+            while True:
+                header, data = self.read_packet()
+                packet_type = header >> 4
+                if packet_type == CONNECT:
+                    protocol_length = struct.unpack("!H", data[:2])[0]
+                    self.v5 = data[2 + protocol_length] == 5
+                    # session present 0, return code 0 (+ empty properties)
+                    self.send(
+                        b"\x20\x03\x00\x00\x00" if self.v5 else b"\x20\x02\x00\x00"
+                    )
+                elif packet_type == PUBLISH:
+                    self.on_publish(header, data)
+                elif packet_type == PUBREL:
+                    self.send(b"\x70\x02" + data[:2])
+                elif packet_type == SUBSCRIBE:
+                    self.on_subscribe(data)
+                elif packet_type == UNSUBSCRIBE:
+                    self.on_unsubscribe(data)
+                elif packet_type == PINGREQ:
+                    self.send(b"\xd0\x00")
+                elif packet_type == DISCONNECT:
+                    return
+        except (ConnectionError, OSError):
+            return
+        finally:
+            self.server.remove_session(self)
+
+    def on_publish(self, header: int, data: bytes) -> None:
+        qos = (header >> 1) & 0x03
+        topic_length = struct.unpack("!H", data[:2])[0]
+        pos = 2 + topic_length
+        topic = data[2:pos].decode()
+        if qos:
+            packet_id = data[pos : pos + 2]
+            pos += 2
+            self.send((b"\x40\x02" if qos == 1 else b"\x50\x02") + packet_id)
+        if self.v5:
+            properties_length, pos = decode_length(data, pos)
+            pos += properties_length
+        self.server.deliver(topic, data[pos:])
+
+    def on_subscribe(self, data: bytes) -> None:
+        pos = 2
+        if self.v5:
+            properties_length, pos = decode_length(data, pos)
+            pos += properties_length
+        granted = bytearray()
+        while pos < len(data):
+            length = struct.unpack("!H", data[pos : pos + 2])[0]
+            topic_filter = data[pos + 2 : pos + 2 + length].decode()
+            pos += 3 + length
+            self.server.add_subscription(self, topic_filter)
+            granted.append(0)
+        body = data[:2] + (b"\x00" if self.v5 else b"") + bytes(granted)
+        self.send(b"\x90" + encode_length(len(body)) + body)
+
+    def on_unsubscribe(self, data: bytes) -> None:
+        pos = 2
+        if self.v5:
+            properties_length, pos = decode_length(data, pos)
+            pos += properties_length
+        count = 0
+        while pos < len(data):
+            length = struct.unpack("!H", data[pos : pos + 2])[0]
+            self.server.remove_subscription(
+                self, data[pos + 2 : pos + 2 + length].decode()
+            )
+            pos += 2 + length
+            count += 1
+        body = data[:2] + ((b"\x00" + b"\x00" * count) if self.v5 else b"")
+        self.send(b"\xb0" + encode_length(len(body)) + body)
+
+    def forward(self, topic: str, payload: bytes) -> None:
+        topic_bytes = topic.encode()
+        body = (
+            struct.pack("!H", len(topic_bytes))
+            + topic_bytes
+            + (b"\x00" if self.v5 else b"")
+            + payload
+        )
+        try:
+            self.send(b"\x30" + encode_length(len(body)) + body)
+        except OSError:
+            pass
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _Session)
+        self.lock = threading.Lock()
+        self.subscriptions: List[Tuple[_Session, str]] = []
+        self.received = Counter()
+
+    def add_subscription(self, session: _Session, topic_filter: str) -> None:
+        with self.lock:
+            self.subscriptions.append((session, topic_filter))
+
+    def remove_subscription(self, session: _Session, topic_filter: str) -> None:
+        with self.lock:
+            self.subscriptions = [
+                sub for sub in self.subscriptions if sub != (session, topic_filter)
+            ]
+
+    def remove_session(self, session: _Session) -> None:
+        with self.lock:
+            self.subscriptions = [
+                sub for sub in self.subscriptions if sub[0] is not session
+            ]
+
+    def deliver(self, topic: str, payload: bytes) -> None:
+        with self.lock:
+            self.received[topic] += 1
+            receivers = [
+                session
+                for session, topic_filter in self.subscriptions
+                if topic_matches(topic_filter, topic)
+            ]
+        for session in receivers:
+            session.forward(topic, payload)
+
+
+class BrokerStub:
+    """
+    In-process MQTT broker stand-in. Use it as context manager::
+
+        with BrokerStub() as broker:
+            client.connect(host=broker.host, port=broker.port)
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on. 0 selects a free port.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = _Server((host, port))
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    @property
+    def received(self) -> Counter:
+        """
+        Number of received messages per topic
+        """
+        return self._server.received
+
+    def start(self) -> "BrokerStub":
+        """
+        Starts serving in a background thread
+        """
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="BrokerStub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops the broker and closes the listening socket
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> "BrokerStub":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
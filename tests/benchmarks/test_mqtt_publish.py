@@ -0,0 +1,250 @@
+"""
+Benchmarks for publishing measurements with the IoTAMQTTClient. The
+messages are sent to an in-process broker stub, hence no FIWARE services are
+required. Each scenario reports the throughput, the latency of single
+`publish` calls (encoding, topic creation and paho queueing) and the peak
+memory allocated per message.
+
+Run the benchmarks with::
+
+    python -m unittest tests.benchmarks.test_mqtt_publish -v
+
+The number of messages and the memory budget can be adjusted via the
+environment variables `BENCHMARK_MESSAGES` and
+`BENCHMARK_MAX_BYTES_PER_MESSAGE`.
+"""
+
+import os
+import time
+import tracemalloc
+import unittest
+from typing import Callable, List, NamedTuple, Optional
+from paho.mqtt.client import MQTTv5
+from filip.clients.mqtt import IoTAMQTTClient
+from filip.models.mqtt import PublishStats
+from filip.models.ngsi_v2.iot import (
+    Device,
+    DeviceAttribute,
+    DeviceCommand,
+    PayloadProtocol,
+    ServiceGroup,
+)
+from tests.benchmarks.broker_stub import BrokerStub
+
+MESSAGES = int(os.getenv("BENCHMARK_MESSAGES", "5000"))
+MAX_BYTES_PER_MESSAGE = int(os.getenv("BENCHMARK_MAX_BYTES_PER_MESSAGE", "65536"))
+FLEET_SIZE = 100
+ATTRIBUTES = 10
+APIKEY = "benchmark"
+
+
+class BenchmarkResult(NamedTuple):
+    """
+    Result of a single benchmark scenario
+    """
+
+    scenario: str
+    stats: PublishStats
+    bytes_per_message: Optional[float] = None
+
+    def __str__(self):
+        stats = self.stats
+        memory = "n/a"
+        if self.bytes_per_message is not None:
+            memory = f"{self.bytes_per_message:.0f}"
+        return (
+            f"{self.scenario:<30} {stats.throughput:>8.0f} msg/s "
+            f"p50 {stats.latency_p50 * 1e6:>8.1f} us "
+            f"p99 {stats.latency_p99 * 1e6:>8.1f} us "
+            f"{memory:>6} B/msg"
+        )
+
+
+def create_fleet(protocol: PayloadProtocol) -> List[Device]:
+    """
+    Creates synthetic device configurations with numeric attributes and a
+    single command
+    """
+    return [
+        Device(
+            device_id=f"{protocol.name.lower()}_{i}",
+            entity_name=f"urn:ngsi-ld:Sensor:{protocol.name.lower()}_{i}",
+            entity_type="Sensor",
+            protocol=protocol,
+            transport="MQTT",
+            apikey=APIKEY,
+            attributes=[
+                DeviceAttribute(name=f"attr_{j}", object_id=f"a{j}", type="Number")
+                for j in range(ATTRIBUTES)
+            ],
+            commands=[DeviceCommand(name="heater", type="Boolean")],
+        )
+        for i in range(FLEET_SIZE)
+    ]
+
+
+def measure_memory(func: Callable, calls: List[dict], repeat: int = 200) -> float:
+    """
+    Measures the mean peak of memory allocated by single calls
+
+    Args:
+        func: Function to measure
+        calls: Keyword arguments of the calls. Only the first `repeat` calls
+            are measured, because tracing slows down execution.
+        repeat: Number of calls to measure
+
+    Returns:
+        Mean peak of allocated bytes per call
+    """
+    calls = calls[:repeat]
+    total = 0
+    tracemalloc.start()
+    try:
+        for kwargs in calls:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            func(**kwargs)
+            total += tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return total / len(calls)
+
+
+class TestMQTTPublishBenchmark(unittest.TestCase):
+    """
+    Benchmark of the publish paths of the IoTAMQTTClient
+    """
+
+    results: List[BenchmarkResult] = []
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.broker = BrokerStub().start()
+        cls.devices = create_fleet(PayloadProtocol.IOTA_JSON) + create_fleet(
+            PayloadProtocol.IOTA_UL
+        )
+        cls.mqttc = IoTAMQTTClient(
+            protocol=MQTTv5,
+            devices=cls.devices,
+            service_groups=[ServiceGroup(apikey=APIKEY, resource="/iot/json")],
+        )
+        cls.mqttc.connect(host=cls.broker.host, port=cls.broker.port)
+        cls.mqttc.loop_start()
+
+    def run_scenario(
+        self, scenario: str, func: Callable, calls: List[dict]
+    ) -> BenchmarkResult:
+        """
+        Runs the calls, waits until the broker received all messages and
+        stores the result
+
+        Args:
+            scenario: Name of the scenario
+            func: Publish function
+            calls: Keyword arguments of the publish calls
+
+        Returns:
+            Result of the scenario
+        """
+        expected = sum(self.broker.received.values()) + len(calls)
+        latencies = []
+        perf_counter = time.perf_counter
+        start_time = perf_counter()
+        for kwargs in calls:
+            start = perf_counter()
+            func(**kwargs)
+            latencies.append(perf_counter() - start)
+        self.wait_for_broker(expected)
+
+        stats = PublishStats(
+            messages=len(calls),
+            published=len(calls),
+            duration=perf_counter() - start_time,
+        )
+        stats.set_latencies(latencies)
+        bytes_per_message = measure_memory(func, calls)
+        self.wait_for_broker(expected + min(len(calls), 200))
+        result = BenchmarkResult(
+            scenario=scenario, stats=stats, bytes_per_message=bytes_per_message
+        )
+        self.results.append(result)
+        self.assertLessEqual(result.bytes_per_message, MAX_BYTES_PER_MESSAGE)
+        return result
+
+    def wait_for_broker(self, expected: int, timeout: float = 60) -> None:
+        """
+        Waits until the broker received the expected number of messages
+        """
+        deadline = time.perf_counter() + timeout
+        while sum(self.broker.received.values()) < expected:
+            self.assertLess(time.perf_counter(), deadline, "Broker timed out")
+            time.sleep(0.001)
+
+    def fleet_calls(self, protocol: PayloadProtocol, **kwargs) -> List[dict]:
+        """
+        Creates publish arguments that cycle through the devices of a protocol
+        """
+        devices = [device for device in self.devices if device.protocol == protocol]
+        return [
+            dict(device_id=devices[i % len(devices)].device_id, **kwargs)
+            for i in range(MESSAGES)
+        ]
+
+    def test_single(self):
+        """
+        Single measurements
+        """
+        for protocol in (PayloadProtocol.IOTA_JSON, PayloadProtocol.IOTA_UL):
+            calls = self.fleet_calls(protocol, attribute_name="attr_0", payload=20.5)
+            self.run_scenario(f"single {protocol.name}", self.mqttc.publish, calls)
+
+    def test_multi(self):
+        """
+        Multi measurements with all attributes
+        """
+        payload = {f"attr_{j}": j + 0.5 for j in range(ATTRIBUTES)}
+        for protocol in (PayloadProtocol.IOTA_JSON, PayloadProtocol.IOTA_UL):
+            calls = self.fleet_calls(protocol, payload=payload)
+            for kwargs in calls:
+                kwargs["payload"] = dict(payload)
+            self.run_scenario(f"multi {protocol.name}", self.mqttc.publish, calls)
+
+    def test_command_ack(self):
+        """
+        Command acknowledgements
+        """
+        for protocol in (PayloadProtocol.IOTA_JSON, PayloadProtocol.IOTA_UL):
+            calls = self.fleet_calls(
+                protocol, command_name="heater", payload={"heater": True}
+            )
+            self.run_scenario(f"command ack {protocol.name}", self.mqttc.publish, calls)
+
+    def test_publish_many(self):
+        """
+        Bulk multi measurements with QoS 1
+        """
+        payload = {f"attr_{j}": j + 0.5 for j in range(ATTRIBUTES)}
+        devices = [
+            device.device_id
+            for device in self.devices
+            if device.protocol == PayloadProtocol.IOTA_JSON
+        ]
+        messages = [(devices[i % len(devices)], dict(payload)) for i in range(MESSAGES)]
+        stats = self.mqttc.publish_many(messages, qos=1, timeout=10)
+        self.assertEqual(stats.published, MESSAGES)
+        self.results.append(
+            BenchmarkResult(scenario="publish_many QoS 1 IOTA_JSON", stats=stats)
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.mqttc.loop_stop()
+        cls.mqttc.disconnect()
+        cls.broker.stop()
+        print(f"\nMQTT publish benchmark ({MESSAGES} messages per scenario)")
+        for result in cls.results:
+            print(result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Benchmarks for the Ultralight encoder of the IoTAMQTTClient. The codec is
+compared with its previous implementation, that parsed every value with a
+pydantic validated call.
+
+Run the benchmarks with::
+
+    python -m unittest tests.benchmarks.test_ultralight_codec -v
+
+The number of iterations can be adjusted via the environment variable
+`BENCHMARK_ITERATIONS`.
+"""
+
+import os
+import unittest
+from time import perf_counter_ns
+from typing import Any, Callable, Dict, List, Union
+from pydantic import validate_call
+from filip.clients.mqtt.encoder import Ultralight
+from filip.models.mqtt import IoTAMQTTMessageType
+
+ITERATIONS = int(os.getenv("BENCHMARK_ITERATIONS", "10000"))
+ATTRIBUTES = 20
+
+
+class LegacyUltralight:
+    """
+    Ultralight codec as implemented before the fast path. It serves as
+    reference for the benchmark.
+    """
+
+    @staticmethod
+    @validate_call
+    def eval_value(value: Union[bool, float, str]):
+        return value
+
+    def decode(self, payload: str) -> Dict:
+        payload = payload.split("@")
+        payload = payload[1].split("|")
+        return {
+            payload[i]: self.eval_value(payload[i + 1])
+            for i in range(0, len(payload), 2)
+        }
+
+    @staticmethod
+    def encode_multi(payload: Dict[str, Any]) -> str:
+        timestamp = str(payload.pop("timeInstant", ""))
+        data = "|".join([f"{key}|{value}" for key, value in payload.items()])
+        return "|".join([timestamp, data]).strip("|")
+
+
+def measure(func: Callable, *args) -> float:
+    """
+    Measures the mean duration of a call
+
+    Args:
+        func: Function to measure
+        *args: Arguments of the calls
+
+    Returns:
+        Mean duration in nanoseconds
+    """
+    start = perf_counter_ns()
+    for _ in range(ITERATIONS):
+        func(*args)
+    return (perf_counter_ns() - start) / ITERATIONS
+
+
+class TestUltralightBenchmark(unittest.TestCase):
+    """
+    Benchmark of the Ultralight encoder against the previous implementation
+    """
+
+    results: List[str] = []
+
+    def setUp(self) -> None:
+        self.encoder = Ultralight()
+        self.legacy = LegacyUltralight()
+
+    def test_encode(self):
+        """
+        Encoding of multi measurements
+        """
+        payload = {f"attr_{i}": i * 0.5 for i in range(ATTRIBUTES)}
+        legacy = measure(self.legacy.encode_multi, dict(payload))
+        fast = measure(
+            self.encoder.encode_msg, "dev", payload, IoTAMQTTMessageType.MULTI
+        )
+        self.results.append(f"encode multi {legacy:>10.0f} ns {fast:>10.0f} ns")
+
+    def test_decode_command(self):
+        """
+        Decoding of commands
+        """
+        # the previous implementation only supports commands without
+        # parameters and keeps the values as strings
+        command = "dev@heater|21.5"
+        self.assertEqual(
+            self.encoder.decode_command(command), ("dev", {"heater": 21.5})
+        )
+        self.assertEqual(self.legacy.decode(command), {"heater": "21.5"})
+
+        legacy = measure(self.legacy.decode, command)
+        fast = measure(self.encoder.decode_command, command)
+        self.results.append(f"decode command {legacy:>8.0f} ns {fast:>10.0f} ns")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        print(f"\nUltralight codec benchmark ({ITERATIONS} iterations)")
+        print(f"{'':<14} {'legacy':>11} {'current':>13}")
+        for result in cls.results:
+            print(result)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for the asyncio variant of the IoTAMQTTClient
+"""
+
+import asyncio
+import json
+import unittest
+from paho.mqtt.client import MQTTv5
+from filip.clients.mqtt import AsyncIoTAMQTTClient
+from filip.models.ngsi_v2.iot import (
+    Device,
+    DeviceAttribute,
+    DeviceCommand,
+    ServiceGroup,
+)
+from tests.config import settings
+
+
+class TestAsyncMQTTClient(unittest.IsolatedAsyncioTestCase):
+    """
+    Test case for AsyncIoTAMQTTClient
+    """
+
+    async def asyncSetUp(self) -> None:
+        self.service_group = ServiceGroup(
+            apikey=settings.FIWARE_SERVICEPATH.strip("/"), resource="/iot/json"
+        )
+        self.device = Device(
+            device_id="my_async_device",
+            entity_name="my_async_device",
+            entity_type="Thing",
+            protocol="IoTA-JSON",
+            transport="MQTT",
+            apikey=self.service_group.apikey,
+            attributes=[
+                DeviceAttribute(name="temperature", object_id="t", type="Number")
+            ],
+            commands=[DeviceCommand(name="heater", type="Boolean")],
+        )
+        self.mqttc = AsyncIoTAMQTTClient(
+            protocol=MQTTv5,
+            devices=[self.device],
+            service_groups=[self.service_group],
+        )
+        await self.mqttc.connect(
+            host=settings.MQTT_BROKER_URL.host, port=settings.MQTT_BROKER_URL.port
+        )
+
+    async def test_publish(self):
+        """
+        Test awaiting single and bulk publishes
+        """
+        await self.mqttc.publish(
+            device_id=self.device.device_id, payload={"temperature": 20}, qos=1
+        )
+        await self.mqttc.publish(
+            device_id=self.device.device_id,
+            attribute_name="temperature",
+            payload=20,
+        )
+        with self.assertRaises(KeyError):
+            await self.mqttc.publish(device_id="unknown", payload={"t": 20})
+
+        stats = await self.mqttc.publish_many(
+            [(self.device.device_id, {"t": i}) for i in range(200)],
+            qos=1,
+            max_inflight=10,
+        )
+        self.assertEqual(stats.messages, 200)
+        self.assertEqual(stats.published, 200)
+        self.assertIsNotNone(stats.latency_p99)
+
+    async def test_commands(self):
+        """
+        Test consuming commands as async iterator
+        """
+
+        async def consume():
+            return [command async for command in self.mqttc.commands()]
+
+        consumer = asyncio.create_task(consume())
+        # wait for the subscription
+        await asyncio.sleep(0.5)
+        topic = f"/{self.device.apikey}/{self.device.device_id}/cmd"
+        for value in (True, False):
+            await self.mqttc.publish(
+                topic=topic, payload=json.dumps({"heater": value}), qos=1
+            )
+        await asyncio.sleep(0.5)
+        await self.mqttc.disconnect()
+        commands = await asyncio.wait_for(consumer, timeout=5)
+
+        self.assertEqual(
+            [command.payload for command in commands],
+            [{"heater": True}, {"heater": False}],
+        )
+        self.assertEqual(commands[0].device_id, self.device.device_id)
+        with self.assertRaises(RuntimeError):
+            await self.mqttc.publish(topic=topic, payload="{}")
+
+    async def asyncTearDown(self) -> None:
+        await self.mqttc.disconnect()
@@ -1,9 +1,10 @@
+import json
 import logging
 import time
 import datetime
 import unittest
 from random import randrange, Random
-from paho.mqtt.client import MQTT_CLEAN_START_FIRST_ONLY, MQTTv5
+from paho.mqtt.client import MQTT_CLEAN_START_FIRST_ONLY, MQTTMessage, MQTTv5
 from filip.custom_types import AnyMqttUrl
 from filip.models import FiwareHeader
 from filip.models.ngsi_v2.context import NamedCommand
@@ -194,6 +195,142 @@ class TestMQTTClient(unittest.TestCase):
             tmp_mqttc.publish(device_id=tmp_id, payload={"t": Random().randint(0, 50)})
             tmp_mqttc.delete_device(device_id=tmp_id)
 
+    def test_publish_plan(self):
+        """
+        Test the compiled publish plans and their invalidation
+        """
+        mqttc = IoTAMQTTClient(
+            devices=[self.device_json, self.device_ul],
+            service_groups=[self.service_group_json],
+        )
+        plan = mqttc.get_publish_plan(device_id=self.device_json.device_id)
+        topic, payload = plan.encode_multi(payload={"temperature": 20})
+        self.assertEqual(
+            topic, "/json/" + self.device_json.apikey + "/my_json_device/attrs"
+        )
+        self.assertEqual(json.loads(payload), {"t": 20})
+        self.assertEqual(
+            plan.encode_single(attribute_name="temperature", payload=20)[0],
+            "/json/" + self.device_json.apikey + "/my_json_device/attrs/t",
+        )
+        with self.assertRaises(KeyError):
+            plan.encode_multi(payload={"humidity": 20})
+        self.assertIs(
+            plan, mqttc.get_publish_plan(device_id=self.device_json.device_id)
+        )
+
+        # plans are rebuilt after updating the device
+        device = self.device_json.model_copy(deep=True)
+        device.add_attribute(DeviceAttribute(name="humidity", type="Number"))
+        mqttc.update_device(device=device)
+        plan = mqttc.get_publish_plan(device_id=device.device_id)
+        self.assertEqual(
+            json.loads(plan.encode_multi(payload={"humidity": 20})[1]), {"humidity": 20}
+        )
+
+        # the client is not connected, hence all messages fail
+        stats = mqttc.publish_many(
+            [
+                (self.device_json.device_id, {"t": 20}),
+                (self.device_ul.device_id, {"temperature": 20}),
+            ]
+        )
+        self.assertEqual(stats.messages, 2)
+        self.assertEqual(stats.failed, 2)
+        with self.assertRaises(KeyError):
+            mqttc.publish_many([("unknown_device", {"t": 20})])
+
+    def test_publish_many(self):
+        """
+        Test bulk publishing with an in-flight window
+        """
+        devices = []
+        for i in range(100):
+            device = self.device_json.model_copy(deep=True)
+            device.device_id = f"{self.device_json.device_id}_{i}"
+            devices.append(device)
+        mqttc = IoTAMQTTClient(
+            protocol=MQTTv5, devices=devices, service_groups=[self.service_group_json]
+        )
+        mqtt_broker_url = settings.MQTT_BROKER_URL
+        mqttc.connect(host=mqtt_broker_url.host, port=mqtt_broker_url.port)
+        mqttc.loop_start()
+
+        messages = [(device.device_id, {"t": i}) for i, device in enumerate(devices)]
+        for qos in [0, 1, 2]:
+            stats = mqttc.publish_many(messages, qos=qos, max_inflight=10, timeout=10)
+            self.assertEqual(stats.messages, len(devices))
+            self.assertEqual(stats.published, len(devices))
+            self.assertEqual(stats.failed, 0)
+            self.assertLessEqual(stats.latency_p50, stats.latency_max)
+
+        mqttc.loop_stop()
+        mqttc.disconnect()
+
+    def test_command_dispatcher(self):
+        """
+        Test routing of commands by apikey and device_id with a worker pool
+        """
+        mqttc = IoTAMQTTClient(
+            devices=[self.device_json, self.device_ul], command_workers=2
+        )
+        dispatcher = mqttc.command_dispatcher
+        received = []
+        raw = []
+        unrouted = []
+
+        def handler(client, apikey, device_id, payload):
+            if payload["heater"] is None:
+                raise ValueError("Invalid command")
+            received.append((apikey, device_id, payload))
+
+        def message(topic: str, payload: bytes) -> MQTTMessage:
+            msg = MQTTMessage(topic=topic.encode())
+            msg.payload = payload
+            return msg
+
+        mqttc.add_command_handler(device_id=self.device_json.device_id, handler=handler)
+        mqttc.add_command_callback(
+            device_id=self.device_ul.device_id,
+            callback=lambda client, obj, msg: raw.append(msg.payload),
+        )
+        mqttc.on_message = lambda client, obj, msg: unrouted.append(msg.topic)
+
+        json_topic = f"/{self.device_json.apikey}/{self.device_json.device_id}/cmd"
+        ul_topic = f"/{self.device_ul.apikey}/{self.device_ul.device_id}/cmd"
+        dispatcher.on_message(mqttc, None, message(json_topic, b'{"heater": null}'))
+        for i in range(100):
+            dispatcher.on_message(
+                mqttc, None, message(json_topic, json.dumps({"heater": i}).encode())
+            )
+        dispatcher.on_message(mqttc, None, message(ul_topic, b"my_ul_device@heater|1"))
+        dispatcher.on_message(mqttc, None, message("/unknown/device/cmd", b"{}"))
+        dispatcher.join()
+
+        # commands of a device are handled in order despite the errors
+        self.assertEqual(
+            received,
+            [
+                (self.device_json.apikey, self.device_json.device_id, {"heater": i})
+                for i in range(100)
+            ],
+        )
+        self.assertEqual(raw, [b"my_ul_device@heater|1"])
+        self.assertEqual(unrouted, ["/unknown/device/cmd"])
+
+        # routes follow updates of the apikey
+        device = self.device_json.model_copy(deep=True)
+        device.apikey = "new_apikey"
+        mqttc.update_device(device=device)
+        self.assertIsNone(
+            dispatcher.get_route(self.device_json.apikey, device.device_id)
+        )
+        self.assertIsNotNone(dispatcher.get_route("new_apikey", device.device_id))
+
+        mqttc.delete_device(device_id=device.device_id)
+        self.assertEqual(len(dispatcher), 1)
+        dispatcher.close()
+
     def test_init(self):
         devices = [self.device_json, self.device_ul]
         mqttc = IoTAMQTTClient(
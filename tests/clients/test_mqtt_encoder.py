@@ -0,0 +1,180 @@
+"""
+Tests for the encoders of the IoTAMQTTClient
+"""
+
+import json
+import unittest
+from datetime import datetime, timezone
+from paho.mqtt.client import MQTTMessage
+from filip.clients.mqtt.encoder import Json, MessagePack, Ultralight
+from filip.clients.mqtt.encoder import messagepack
+from filip.models.mqtt import IoTAMQTTMessageType
+
+
+class TestUltralight(unittest.TestCase):
+    """
+    Test case for the ultralight encoder
+    """
+
+    def setUp(self) -> None:
+        self.encoder = Ultralight()
+
+    def test_encode(self):
+        """
+        Test encoding of measurements and command acknowledgements
+        """
+        self.assertEqual(
+            self.encoder.encode_msg(
+                device_id="dev",
+                payload={"t": 20.5, "on": True, "name": "room"},
+                msg_type=IoTAMQTTMessageType.MULTI,
+            ),
+            b"t|20.5|on|true|name|room",
+        )
+        self.assertEqual(
+            self.encoder.encode_msg(
+                device_id="dev",
+                payload={
+                    "t": 20,
+                    "timeInstant": datetime(2024, 1, 1, tzinfo=timezone.utc),
+                },
+                msg_type=IoTAMQTTMessageType.MULTI,
+            ),
+            b"2024-01-01T00:00:00.000Z|t|20",
+        )
+        self.assertEqual(
+            self.encoder.encode_msg(
+                device_id="dev", payload=False, msg_type=IoTAMQTTMessageType.SINGLE
+            ),
+            b"false",
+        )
+        self.assertEqual(
+            self.encoder.encode_msg(
+                device_id="dev",
+                payload={"heater": True},
+                msg_type=IoTAMQTTMessageType.CMDEXE,
+            ),
+            b"dev@heater|true",
+        )
+        with self.assertRaises(ValueError):
+            self.encoder.encode_msg(
+                device_id="dev",
+                payload={"name": "a|b"},
+                msg_type=IoTAMQTTMessageType.MULTI,
+            )
+
+    def test_decode(self):
+        """
+        Test decoding of commands and measurements including type coercion
+        """
+        msg = MQTTMessage(topic=b"/apikey/dev/cmd")
+        msg.payload = b"dev@heater|true"
+        self.assertEqual(
+            self.encoder.decode_message(msg=msg), ("apikey", "dev", {"heater": True})
+        )
+        self.assertEqual(
+            self.encoder.decode_command("dev@move|x=1|y=-2.5|mode=fast"),
+            ("dev", {"move": {"x": 1, "y": -2.5, "mode": "fast"}}),
+        )
+        self.assertEqual(
+            self.encoder.decode_measurements("2024-01-01T00:00:00Z|t|20|n|abc#h|1.5"),
+            [
+                {"timeInstant": "2024-01-01T00:00:00Z", "t": 20, "n": "abc"},
+                {"h": 1.5},
+            ],
+        )
+        payload = {"t": 20.5, "on": False, "name": "room"}
+        encoded = self.encoder.encode_msg(
+            device_id="dev", payload=payload, msg_type=IoTAMQTTMessageType.MULTI
+        )
+        self.assertEqual(self.encoder.decode_measurements(encoded), [payload])
+
+
+class TestJson(unittest.TestCase):
+    """
+    Test case for the json encoder
+    """
+
+    def test_encode_timestamp(self):
+        """
+        Test that timestamps are converted to ISO 8601 with z suffix
+        """
+        encoded = Json().encode_msg(
+            device_id="dev",
+            payload={"t": 20, "timeInstant": "2024-01-01T01:00:00+01:00"},
+            msg_type=IoTAMQTTMessageType.MULTI,
+        )
+        self.assertEqual(
+            json.loads(encoded), {"t": 20, "timeInstant": "2024-01-01T00:00:00.000Z"}
+        )
+
+
+@unittest.skipIf(messagepack.msgpack is None, "msgpack is not installed")
+class TestMessagePack(unittest.TestCase):
+    """
+    Test case for the MessagePack encoder
+    """
+
+    def setUp(self) -> None:
+        self.encoder = MessagePack()
+
+    def test_roundtrip(self):
+        """
+        Test encoding of measurements and decoding of commands
+        """
+        payload = {"t": 20.5, "on": True, "samples": [1, 2, 3]}
+        encoded = self.encoder.encode_msg(
+            device_id="dev", payload=dict(payload), msg_type=IoTAMQTTMessageType.MULTI
+        )
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(self.encoder.decode_payload(encoded), payload)
+        self.assertLess(len(encoded), len(json.dumps(payload)))
+
+        msg = MQTTMessage(topic=b"/apikey/dev/cmd")
+        msg.payload = self.encoder.encode_msg(
+            device_id="dev",
+            payload={"heater": {"power": 2}},
+            msg_type=IoTAMQTTMessageType.CMDEXE,
+        )
+        self.assertEqual(
+            self.encoder.decode_message(msg=msg),
+            ("apikey", "dev", {"heater": {"power": 2}}),
+        )
+        with self.assertRaises(ValueError):
+            self.encoder.decode_payload(b"\xc1")
+
+    @unittest.skipIf(messagepack.np is None, "numpy is not installed")
+    def test_arrays(self):
+        """
+        Test encoding of array valued measurements
+        """
+        np = messagepack.np
+        samples = np.linspace(0, 1, 500, dtype=np.float32).reshape(100, 5)
+        encoded = self.encoder.encode_msg(
+            device_id="dev",
+            payload={"vibration": samples, "mean": samples.mean()},
+            msg_type=IoTAMQTTMessageType.MULTI,
+        )
+        # raw samples plus a small header
+        self.assertLess(len(encoded), samples.nbytes + 64)
+        decoded = self.encoder.decode_payload(encoded)
+        self.assertEqual(decoded["vibration"].dtype, samples.dtype)
+        np.testing.assert_array_equal(decoded["vibration"], samples)
+        self.assertAlmostEqual(decoded["mean"], float(samples.mean()), places=5)
+
+        # non-contiguous arrays are supported as well
+        decoded = self.encoder.decode_payload(self.encoder.pack(samples[:, 1]))
+        np.testing.assert_array_equal(decoded, samples[:, 1])
+
+        # 0-d and empty arrays keep their shape
+        for array in (
+            np.array(5),
+            np.zeros((0, 3), dtype=np.float32),
+            np.zeros((3, 0))[::2],
+        ):
+            decoded = self.encoder.decode_payload(self.encoder.pack(array))
+            self.assertEqual(decoded.shape, array.shape)
+            self.assertEqual(decoded.dtype, array.dtype)
+            np.testing.assert_array_equal(decoded, array)
+        with self.assertRaises(ValueError):
+            self.encoder.pack(np.array([object()]))
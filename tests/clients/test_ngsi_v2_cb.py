@@ -1184,6 +1184,48 @@ class TestContextBroker(unittest.TestCase):
         sub_id_5 = self.client.post_subscription(subscription_5)
         self.assertNotEqual(sub_id_1, sub_id_5)
 
+    def test_post_subscriptions(self):
+        """
+        Test the bulk creation of subscriptions with duplicate detection.
+        """
+        mqtt_custom = MqttCustom(url="mqtt://mqtt-broker:1883", topic="does/not/matter")
+        subject = Subject(entities=[{"idPattern": ".*"}])
+        subscriptions = [
+            Subscription(
+                notification=Notification(attrs=[f"a{i}", "b"], mqttCustom=mqtt_custom),
+                subject=subject,
+            )
+            for i in range(10)
+        ]
+        existing_id = self.client.post_subscription(subscriptions[0])
+
+        # the last subscription is a duplicate with a different list order
+        duplicate = Subscription(
+            notification=Notification(attrs=["b", "a1"], mqttCustom=mqtt_custom),
+            subject=subject,
+        )
+        sub_ids = self.client.post_subscriptions(
+            subscriptions + [duplicate], max_workers=4
+        )
+        self.assertEqual(len(sub_ids), len(subscriptions) + 1)
+        self.assertEqual(sub_ids[0], existing_id)
+        self.assertEqual(sub_ids[1], sub_ids[-1])
+        self.assertEqual(len(set(sub_ids)), len(subscriptions))
+        self.assertEqual(len(self.client.get_subscription_list()), len(subscriptions))
+
+        # updates do not change the given subscriptions
+        self.assertEqual(
+            self.client.post_subscriptions(subscriptions, update=True), sub_ids[:-1]
+        )
+        self.assertTrue(all(sub.id is None for sub in subscriptions))
+
+        # the warm index is used and kept in sync with deletions
+        self.assertEqual(self.client.post_subscriptions(subscriptions), sub_ids[:-1])
+        self.client.delete_subscription(sub_ids[0])
+        new_ids = self.client.post_subscriptions(subscriptions[:1])
+        self.assertNotEqual(new_ids[0], sub_ids[0])
+        self.assertEqual(len(self.client.get_subscription_list()), len(subscriptions))
+
     @clean_test(
         fiware_service=settings.FIWARE_SERVICE,
         fiware_servicepath=settings.FIWARE_SERVICEPATH,
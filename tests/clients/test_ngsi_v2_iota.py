@@ -431,6 +431,93 @@ class TestAgent(unittest.TestCase):
             )
             cb_client.close()
 
+    def test_patch_devices(self):
+        """
+        Test the methode: patch_devices of the iota client
+        """
+        cb_client = ContextBrokerClient(
+            url=settings.CB_URL, fiware_header=self.fiware_header
+        )
+        devices = []
+        for i in range(10):
+            device = Device(**self.device)
+            device.device_id = f"test_device_{i}"
+            device.entity_name = f"test_entity_{i}"
+            device.add_attribute(
+                StaticDeviceAttribute(name="Stat1", value="test", type=DataType.TEXT)
+            )
+            devices.append(device)
+
+        plan = self.client.patch_devices(devices=devices, cb_client=cb_client)
+        self.assertEqual(len(plan["create"]), len(devices))
+        self.assertEqual(len(self.client.get_device_list()), len(devices))
+
+        # change attributes of one device and the settings of another one
+        devices[0].get_attribute("Stat1").value = "new_test"
+        devices[1].apikey = "zuiop"
+        plan = self.client.patch_devices(
+            devices=devices, cb_client=cb_client, max_workers=4, chunk_size=3
+        )
+        self.assertEqual(plan["update"], [devices[0].device_id])
+        self.assertEqual(plan["recreate"], [devices[1].device_id])
+        self.assertEqual(len(plan["unchanged"]), len(devices) - 2)
+
+        live_entity = cb_client.get_entity(entity_id=devices[0].entity_name)
+        self.assertEqual(live_entity.get_attribute("Stat1").value, "new_test")
+        live_device = self.client.get_device(device_id=devices[1].device_id)
+        self.assertEqual(live_device.apikey, "zuiop")
+
+        # a second call does not change anything
+        plan = self.client.patch_devices(devices=devices, cb_client=cb_client)
+        self.assertEqual(len(plan["unchanged"]), len(devices))
+
+        # renaming the entity deletes the entity with the old name
+        old_entity_name = devices[2].entity_name
+        devices[2].entity_name = "test_entity_renamed"
+        plan = self.client.patch_devices(devices=devices, cb_client=cb_client)
+        self.assertEqual(plan["recreate"], [devices[2].device_id])
+        entity_ids = [entity.id for entity in cb_client.get_entity_list()]
+        self.assertNotIn(old_entity_name, entity_ids)
+        self.assertIn("test_entity_renamed", entity_ids)
+        cb_client.close()
+
+    @clean_test(
+        fiware_service=settings.FIWARE_SERVICE,
+        fiware_servicepath=settings.FIWARE_SERVICEPATH,
+        cb_url=settings.CB_URL,
+        iota_url=settings.IOTA_JSON_URL,
+    )
+    def test_post_devices_chunked(self):
+        """
+        Test posting devices in size limited chunks with conflicts
+        """
+        devices = []
+        for i in range(40):
+            device = Device(**self.device)
+            device.device_id = f"test_device_{i}"
+            device.entity_name = f"test_entity_{i}"
+            devices.append(device)
+        self.client.post_devices(devices=devices[:30], max_payload_size=2000)
+        self.assertEqual(len(self.client.get_device_list()), 30)
+
+        # a single duplicate makes the bulk request fail
+        with self.assertRaises(BaseHttpClientException) as context:
+            self.client.post_devices(
+                devices=devices[29:35], update=False, max_payload_size=2000
+            )
+        self.assertEqual(context.exception.response.status_code, 409)
+        # the valid devices of the rejected request are kept
+        self.assertEqual(len(self.client.get_device_list()), 35)
+
+        # existing devices are isolated and updated
+        devices[0].add_attribute(
+            StaticDeviceAttribute(name="Stat1", value="test", type=DataType.TEXT)
+        )
+        self.client.post_devices(devices=devices, update=True, max_payload_size=2000)
+        self.assertEqual(len(self.client.get_device_list()), 40)
+        live_device = self.client.get_device(device_id=devices[0].device_id)
+        self.assertEqual(live_device.get_attribute("Stat1").value, "test")
+
     @clean_test(
         fiware_service=settings.FIWARE_SERVICE,
         fiware_servicepath=settings.FIWARE_SERVICEPATH,
@@ -20,10 +20,13 @@ from filip.models.ngsi_v2.iot import (
     ExpressionLanguage,
     PayloadProtocol,
     DeviceAttribute,
+    DeviceList,
+    VALIDATE_EXPRESSIONS,
 )
 from filip.clients.ngsi_v2 import ContextBrokerClient, IoTAClient
 
 from filip.utils.cleanup import clear_all, clean_test
+from filip.utils.validators import parse_jexl_expression
 from tests.config import settings
 
 
@@ -299,6 +302,31 @@ class TestContextv2IoTModels(unittest.TestCase):
         )
         self.assertEqual(device4.expressionLanguage, ExpressionLanguage.JEXL)
 
+    def test_expression_cache(self):
+        """
+        Test that expressions are parsed once and their validation can be
+        skipped via the validation context
+        """
+        device = {
+            "device_id": "dummy:01",
+            "entity_name": "entity:01",
+            "entity_type": "MyEntity",
+            "attributes": [
+                {"name": "t", "type": "Number", "expression": "t * 2 + 1"},
+            ],
+        }
+        parse_jexl_expression.cache_clear()
+        devices = DeviceList.model_validate({"devices": [device] * 10}).devices
+        self.assertEqual(len(devices), 10)
+        cache_info = parse_jexl_expression.cache_info()
+        self.assertEqual(cache_info.misses, 1)
+        self.assertEqual(cache_info.hits, 9)
+
+        device["attributes"][0]["expression"] = "t *"
+        with self.assertRaises(pyjexl.jexl.ParseError):
+            Device.model_validate(device)
+        Device.model_validate(device, context={VALIDATE_EXPRESSIONS: False})
+
     def test_add_device_attributes(self):
         """
         Test the device model regarding the behavior with devices attributes.
@@ -409,6 +437,65 @@ class TestContextv2IoTModels(unittest.TestCase):
                 attr2_object_id="t",
             )
 
+    def test_get_attribute(self):
+        """
+        Test the attribute index of devices and its invalidation
+        """
+        attributes = [
+            DeviceAttribute(name=f"attr_{i}", object_id=f"a{i}", type="Number")
+            for i in range(300)
+        ]
+        device = Device(
+            device_id="dummy:01",
+            entity_name="entity:01",
+            entity_type="MyEntity",
+            attributes=attributes,
+            commands=[DeviceCommand(name="heater")],
+            internal_attributes=[{"name": "internal"}],
+        )
+        self.assertIs(device.get_attribute("attr_299"), attributes[299])
+        self.assertEqual(device.get_command("heater").name, "heater")
+        self.assertEqual(device.get_attribute("internal"), {"name": "internal"})
+
+        # index is updated by the device methods and in place modifications
+        device.add_attribute(DeviceAttribute(name="added", type="Number"))
+        self.assertEqual(device.get_attribute("added").name, "added")
+        device.delete_attribute(device.get_attribute("added"))
+        with self.assertRaises(KeyError):
+            device.get_attribute("added")
+        device.attributes.append(DeviceAttribute(name="appended", type="Number"))
+        self.assertEqual(device.get_attribute("appended").name, "appended")
+        device.attributes[0].name = "renamed"
+        self.assertIs(device.get_attribute("renamed"), attributes[0])
+        with self.assertRaises(KeyError):
+            device.get_attribute("attr_0")
+
+        # replaced elements are detected
+        device.attributes[1] = DeviceAttribute(name="attr_1", type="Text")
+        self.assertEqual(device.get_attribute("attr_1").type, "Text")
+        device.attributes[2] = DeviceAttribute(name="replaced", type="Text")
+        self.assertEqual(device.get_attribute("replaced").type, "Text")
+        with self.assertRaises(KeyError):
+            device.get_attribute("attr_2")
+
+        # the index does not affect the equality of devices
+        device_copy = device.model_copy(deep=True)
+        device_copy.get_attribute("renamed")
+        self.assertEqual(device, device_copy)
+        device.update_attribute(device.get_attribute("attr_3"))
+        self.assertEqual(device, device_copy)
+        self.assertEqual([device_copy].index(device), 0)
+
+        # duplicates are detected among many attributes
+        with self.assertRaises(ValueError):
+            Device(
+                device_id="dummy:01",
+                entity_name="entity:01",
+                entity_type="MyEntity",
+                attributes=attributes
+                + [DeviceAttribute(name="other", object_id="a5", type="Number")],
+            )
+
     def tearDown(self) -> None:
         """
         Cleanup test server
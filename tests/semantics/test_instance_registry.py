@@ -0,0 +1,202 @@
+"""
+Tests the binary snapshot and change log of the semantic instance registry
+"""
+
+import unittest
+from io import BytesIO
+from types import SimpleNamespace
+
+from filip.models.ngsi_v2.context import ContextEntity
+from filip.semantics import semantics_manager
+from filip.semantics.semantics_manager import InstanceRegistry
+from filip.semantics.semantics_models import InstanceHeader, InstanceIdentifier
+
+
+class FakeInstance:
+    """
+    Minimal stand-in for a SemanticClass instance, that only provides the
+    interface used by the registry
+    """
+
+    def __init__(self, registry: InstanceRegistry, entity: ContextEntity):
+        self.registry = registry
+        self.header = InstanceHeader()
+        self.entity = entity
+        self.old_state = SimpleNamespace(state=None)
+
+    def get_identifier(self) -> InstanceIdentifier:
+        return InstanceIdentifier(
+            id=self.entity.id, type=self.entity.type, header=self.header
+        )
+
+    def set_value(self, value: int):
+        self.entity = ContextEntity(
+            id=self.entity.id,
+            type=self.entity.type,
+            value={"type": "Number", "value": value},
+        )
+        self.registry.mark_dirty(self.get_identifier())
+
+    def get_value(self) -> int:
+        return self.entity.get_attribute("value").value
+
+    def is_dirty(self) -> bool:
+        return self.old_state.state is None or self.registry.is_marked_dirty(
+            self.get_identifier()
+        )
+
+    def build_context_entity(self) -> ContextEntity:
+        return self.entity
+
+    def __hash__(self):
+        return hash((self.entity.id, self.get_value()))
+
+
+class FakeManager:
+    """
+    Minimal stand-in for a SemanticsManager, that builds FakeInstances
+    """
+
+    def __init__(self, registry: InstanceRegistry):
+        self.registry = registry
+
+    def _context_entity_to_semantic_class(self, context_entity, header):
+        instance = FakeInstance(self.registry, context_entity)
+        instance.header = header
+        # like SemanticClasses, the instance registers itself on construction
+        self.registry.register(instance)
+        return instance
+
+
+@unittest.skipIf(semantics_manager.msgpack is None, "msgpack is not installed")
+class TestInstanceRegistryState(unittest.TestCase):
+    """
+    Tests the round trip of the registry state through dump, dump_changes
+    and load_stream
+    """
+
+    def setUp(self) -> None:
+        self.registry = InstanceRegistry()
+        self.manager = FakeManager(self.registry)
+        self.stream = BytesIO()
+
+    def add_instance(self, instance_id: str, value: int, loaded: bool):
+        """
+        Register an instance, if loaded it has an old_state equal to the
+        current state
+        """
+        instance = FakeInstance(
+            self.registry,
+            ContextEntity(
+                id=instance_id,
+                type="Thing",
+                value={"type": "Number", "value": value},
+            ),
+        )
+        if loaded:
+            instance.old_state.state = instance.entity
+        self.registry.register(instance)
+        return instance
+
+    def reload(self) -> InstanceRegistry:
+        """
+        Load the written stream into a new registry
+        """
+        registry = InstanceRegistry()
+        self.stream.seek(0)
+        registry.load_stream(self.stream, FakeManager(registry))
+        return registry
+
+    def test_dump_and_load(self):
+        """
+        Test if a snapshot restores instances, old states, dirty flags and
+        deleted identifiers
+        """
+        new = self.add_instance("new", 1, loaded=False)
+        loaded = self.add_instance("loaded", 2, loaded=True)
+        changed = self.add_instance("changed", 3, loaded=True)
+        changed.set_value(4)
+        deleted = self.add_instance("deleted", 5, loaded=True)
+        self.registry.delete(deleted)
+
+        self.registry.dump(self.stream)
+        registry = self.reload()
+
+        self.assertEqual(
+            {i.get_identifier() for i in registry.get_all()},
+            {i.get_identifier() for i in (new, loaded, changed)},
+        )
+        self.assertIsNone(registry.get(new.get_identifier()).old_state.state)
+        self.assertEqual(registry.get(loaded.get_identifier()).get_value(), 2)
+        restored = registry.get(changed.get_identifier())
+        self.assertEqual(restored.get_value(), 4)
+        self.assertEqual(restored.old_state.state.get_attribute("value").value, 3)
+        self.assertTrue(registry.is_marked_dirty(changed.get_identifier()))
+        self.assertFalse(registry.is_marked_dirty(loaded.get_identifier()))
+        self.assertEqual(
+            registry.get_all_deleted_identifiers(), [deleted.get_identifier()]
+        )
+
+    def test_dump_changes(self):
+        """
+        Test if appended changes are replayed on load
+        """
+        first = self.add_instance("first", 1, loaded=True)
+        second = self.add_instance("second", 2, loaded=True)
+        self.registry.dump(self.stream)
+        self.assertEqual(self.registry.dump_changes(self.stream), 0)
+
+        # changed, removed and deleted instances are logged once
+        first.set_value(10)
+        self.registry.delete(second)
+        third = self.add_instance("third", 3, loaded=False)
+        self.assertEqual(self.registry.dump_changes(self.stream), 4)
+        self.assertEqual(self.registry.dump_changes(self.stream), 0)
+
+        # saving an instance is logged, although its hash is equal
+        first.old_state.state = first.entity
+        self.registry.mark_clean(first.get_identifier())
+        self.assertEqual(self.registry.dump_changes(self.stream), 1)
+
+        registry = self.reload()
+        self.assertEqual(
+            {i.get_identifier() for i in registry.get_all()},
+            {first.get_identifier(), third.get_identifier()},
+        )
+        self.assertEqual(registry.get(first.get_identifier()).get_value(), 10)
+        self.assertFalse(registry.is_marked_dirty(first.get_identifier()))
+        self.assertEqual(
+            registry.get_all_deleted_identifiers(), [second.get_identifier()]
+        )
+
+        # the loaded state is the new base of the change log
+        self.assertEqual(registry.dump_changes(BytesIO()), 0)
+
+    def test_appended_snapshot(self):
+        """
+        Test if an appended snapshot replaces everything before it
+        """
+        old = self.add_instance("old", 1, loaded=True)
+        self.registry.dump(self.stream)
+        self.registry.delete(old)
+        new = self.add_instance("new", 2, loaded=True)
+        self.registry.dump(self.stream)
+
+        registry = self.reload()
+        self.assertEqual(
+            [i.get_identifier() for i in registry.get_all()],
+            [new.get_identifier()],
+        )
+        self.assertEqual(registry.get_all_deleted_identifiers(), [old.get_identifier()])
+
+    def test_invalid_stream(self):
+        """
+        Test if streams without a snapshot are rejected
+        """
+        self.add_instance("first", 1, loaded=True)
+        self.registry.dump_changes(self.stream)
+        with self.assertRaises(ValueError):
+            self.reload()
+        self.stream = BytesIO()
+        with self.assertRaises(ValueError):
+            self.reload()
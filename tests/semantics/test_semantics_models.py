@@ -979,6 +979,34 @@
 #         with self.assertRaises(AssertionError) as context:
 #             Class1(id="Kühler")
 #
+#     def test__24_save_and_load_local_state_changes(self):
+#         """
+#         Test if changes, that are appended to a saved local state, are
+#         contained in the loaded state
+#         """
+#         from io import BytesIO
+#         from tests.semantics.models2 import Class3, semantic_manager
+#
+#         class3 = Class3(id="24")
+#         class3.dataProp1.add("test")
+#         class3.device_settings.apikey = "before"
+#
+#         stream = BytesIO()
+#         semantic_manager.save_local_state(stream)
+#
+#         # a change of only the device settings has to be logged
+#         class3.device_settings.apikey = "after"
+#         self.assertEqual(semantic_manager.save_local_state_changes(stream), 1)
+#         self.assertEqual(semantic_manager.save_local_state_changes(stream), 0)
+#
+#         semantic_manager.instance_registry.clear()
+#         stream.seek(0)
+#         semantic_manager.load_local_state(stream)
+#
+#         class3_ = Class3(id="24")
+#         self.assertEqual(class3_.device_settings.apikey, "after")
+#         self.assertTrue("test" in class3_.dataProp1.get_all_raw())
+#
 #     def tearDown(self) -> None:
 #         """
 #         Cleanup test server
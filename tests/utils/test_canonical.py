@@ -0,0 +1,124 @@
+"""
+Tests canonical hashing functions in filip.utils.canonical
+"""
+
+import unittest
+
+from filip.models.ngsi_v2.context import ContextEntity
+from filip.models.ngsi_v2.registrations import Registration
+from filip.models.ngsi_v2.subscriptions import (
+    Condition,
+    MqttCustom,
+    Notification,
+    Subject,
+    Subscription,
+)
+from filip.utils.canonical import (
+    canonicalize,
+    entity_hash,
+    registration_hash,
+    subscription_hash,
+)
+
+
+class TestCanonicalHash(unittest.TestCase):
+
+    def test_canonicalize(self):
+        """
+        Test list ordering and handling of empty values
+        """
+        self.assertEqual(
+            canonicalize({"a": [3, {"b": [2, 1]}, 1], "c": None, "d": []}),
+            {"a": [1, 3, {"b": [1, 2]}]},
+        )
+        self.assertEqual(
+            canonicalize(
+                {"a": [2, 1], "c": 0}, set_like_lists=False, ignore_empty=False
+            ),
+            {"a": [2, 1], "c": 0},
+        )
+        self.assertEqual(
+            canonicalize({"a": {"timesSent": 2}}, exclude_keys={"timesSent"}), None
+        )
+
+    def test_subscription_hash(self):
+        """
+        Test that subscriptions considered equal share their hash
+        """
+        mqtt_custom = MqttCustom(
+            url="mqtt://mqtt-broker:1883",
+            topic="does/not/matter",
+            user="testuser",
+            passwd="password123",
+        )
+        subject = Subject(
+            entities=[{"idPattern": ".*"}],
+            condition=Condition(attrs=["a1", "a2", "a3"]),
+        )
+        subscription = Subscription(
+            notification=Notification(attrs=["a1", "a2", "a3"], mqttCustom=mqtt_custom),
+            subject=subject,
+        )
+        reordered = Subscription(
+            description="Only optional fields differ",
+            notification=Notification(
+                attrs=["a3", "a1", "a2"],
+                mqttCustom=mqtt_custom.model_copy(update={"passwd": "other"}),
+                timesSent=10,
+            ),
+            subject=Subject(
+                entities=[{"idPattern": ".*"}],
+                condition=Condition(attrs=["a2", "a3", "a1"]),
+            ),
+        )
+        different = Subscription(
+            notification=Notification(attrs=["a1", "a2"], mqttCustom=mqtt_custom),
+            subject=subject,
+        )
+        self.assertEqual(subscription_hash(subscription), subscription_hash(reordered))
+        self.assertNotEqual(
+            subscription_hash(subscription), subscription_hash(different)
+        )
+
+    def test_registration_hash(self):
+        """
+        Test that volatile fields of registrations are ignored
+        """
+        registration = Registration.model_validate(
+            {
+                "dataProvided": {
+                    "entities": [{"id": "room1", "type": "Room"}],
+                    "attrs": ["temperature", "humidity"],
+                },
+                "provider": {"http": {"url": "http://localhost:1234"}},
+            }
+        )
+        reordered = Registration.model_validate(
+            {
+                "id": "123",
+                "description": "Same registration",
+                "dataProvided": {
+                    "entities": [{"id": "room1", "type": "Room"}],
+                    "attrs": ["humidity", "temperature"],
+                },
+                "provider": {"http": {"url": "http://localhost:1234"}},
+            }
+        )
+        self.assertEqual(registration_hash(registration), registration_hash(reordered))
+
+    def test_entity_hash(self):
+        """
+        Test that list values of entities keep their order
+        """
+        entity = ContextEntity(
+            id="room1", type="Room", values={"type": "Array", "value": [1, 2]}
+        )
+        same = ContextEntity(
+            id="room1", type="Room", values={"type": "Array", "value": [1, 2]}
+        )
+        reordered = ContextEntity(
+            id="room1", type="Room", values={"type": "Array", "value": [2, 1]}
+        )
+        self.assertEqual(entity_hash(entity), entity_hash(same))
+        self.assertNotEqual(entity_hash(entity), entity_hash(reordered))
+        self.assertEqual(len({entity_hash(e) for e in [entity, same, reordered]}), 2)
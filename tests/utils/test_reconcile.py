@@ -0,0 +1,165 @@
+"""
+Tests the state reconciliation in filip.utils.reconcile
+"""
+
+import unittest
+from uuid import uuid4
+from filip.clients.ngsi_v2 import ContextBrokerClient, IoTAClient
+from filip.models.base import FiwareHeader
+from filip.models.ngsi_v2.context import ContextEntity
+from filip.models.ngsi_v2.iot import Device, DeviceAttribute, ServiceGroup
+from filip.models.ngsi_v2.subscriptions import Subscription
+from filip.utils.cleanup import clear_all
+from filip.utils.reconcile import (
+    DesiredState,
+    ReconciliationAction,
+    ResourceKind,
+    StateReconciler,
+)
+from tests.config import settings
+
+
+class TestStateReconciler(unittest.TestCase):
+
+    def setUp(self) -> None:
+        """
+        Setup test data and clients
+
+        Returns:
+            None
+        """
+        self.fiware_header = FiwareHeader(
+            service=settings.FIWARE_SERVICE, service_path=settings.FIWARE_SERVICEPATH
+        )
+        clear_all(
+            fiware_header=self.fiware_header,
+            cb_url=settings.CB_URL,
+            iota_url=settings.IOTA_JSON_URL,
+        )
+        self.cb_client = ContextBrokerClient(
+            url=settings.CB_URL, fiware_header=self.fiware_header
+        )
+        self.iota_client = IoTAClient(
+            url=settings.IOTA_JSON_URL, fiware_header=self.fiware_header
+        )
+        apikey = str(uuid4())
+        self.state = DesiredState(
+            service_groups=[
+                ServiceGroup(entity_type="Thing", resource="/iot/json", apikey=apikey)
+            ],
+            devices=[
+                Device(
+                    device_id=f"device_{i}",
+                    entity_name=f"Thing:{i}",
+                    entity_type="Thing",
+                    apikey=apikey,
+                    transport="MQTT",
+                    attributes=[DeviceAttribute(name="temperature", type="Number")],
+                )
+                for i in range(5)
+            ],
+            entities=[
+                ContextEntity(
+                    id=f"Room:{i}",
+                    type="Room",
+                    temperature={"type": "Number", "value": 20},
+                )
+                for i in range(5)
+            ],
+            subscriptions=[
+                Subscription.model_validate(
+                    {
+                        "subject": {"entities": [{"idPattern": ".*", "type": "Room"}]},
+                        "notification": {"http": {"url": "http://localhost:1234"}},
+                    }
+                )
+            ],
+        )
+        self.reconciler = StateReconciler(
+            cb_client=self.cb_client,
+            iota_client=self.iota_client,
+            max_workers=4,
+            chunk_size=2,
+        )
+
+    def test_dry_run(self):
+        """
+        Test that a dry run does not change the state
+        """
+        report = self.reconciler.reconcile(self.state, dry_run=True)
+        self.assertTrue(report.dry_run)
+        self.assertEqual(
+            report.plan.summary()[ResourceKind.DEVICE.value],
+            {ReconciliationAction.CREATE.value: 5},
+        )
+        self.assertIn("fetch", report.timings)
+        self.assertEqual(len(self.iota_client.get_device_list()), 0)
+        self.assertEqual(len(self.cb_client.get_entity_list()), 0)
+
+    def test_reconcile(self):
+        """
+        Test that the state converges and a second run is a no-op
+        """
+        report = self.reconciler.reconcile(self.state)
+        self.assertFalse(report.dry_run)
+        self.assertEqual(len(self.iota_client.get_group_list()), 1)
+        self.assertEqual(len(self.iota_client.get_device_list()), 5)
+        self.assertEqual(len(self.cb_client.get_entity_list(entity_types=["Room"])), 5)
+        self.assertEqual(len(self.cb_client.get_subscription_list()), 1)
+
+        self.state.entities[0].get_attribute("temperature").value = 25
+        report = self.reconciler.reconcile(self.state)
+        changes = [
+            change
+            for change in report.plan.changes
+            if change.action != ReconciliationAction.UNCHANGED
+        ]
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0].kind, ResourceKind.ENTITY)
+        self.assertEqual(
+            self.cb_client.get_entity(entity_id="Room:0")
+            .get_attribute("temperature")
+            .value,
+            25,
+        )
+
+        # pruning removes resources that are not desired anymore
+        self.state.entities = self.state.entities[1:]
+        self.state.subscriptions = []
+        self.reconciler.reconcile(self.state, prune=True)
+        self.assertEqual(len(self.cb_client.get_entity_list(entity_types=["Room"])), 4)
+        self.assertEqual(len(self.cb_client.get_subscription_list()), 0)
+        self.assertEqual(len(self.iota_client.get_device_list()), 5)
+
+    def test_prune_duplicate_subscriptions(self):
+        """
+        Test that live subscriptions with the same fingerprint are pruned
+        except for one
+        """
+        live_subscriptions = [
+            self.state.subscriptions[0].model_copy(update={"id": sub_id})
+            for sub_id in ("sub_1", "sub_2", "sub_3")
+        ]
+        changes = self.reconciler._plan_subscriptions(
+            self.state, live_subscriptions, prune=True
+        )
+        self.assertEqual(
+            [(change.action, change.identifier) for change in changes],
+            [
+                (ReconciliationAction.UNCHANGED, "sub_1"),
+                (ReconciliationAction.DELETE, "sub_2"),
+                (ReconciliationAction.DELETE, "sub_3"),
+            ],
+        )
+
+    def tearDown(self) -> None:
+        """
+        Cleanup test server
+        """
+        clear_all(
+            fiware_header=self.fiware_header,
+            cb_url=settings.CB_URL,
+            iota_url=settings.IOTA_JSON_URL,
+        )
+        self.cb_client.close()
+        self.iota_client.close()
@@ -0,0 +1,60 @@
+"""
+Tests for the json backends in filip.utils.serializer
+"""
+
+import unittest
+from datetime import datetime
+from filip.models.ngsi_v2.iot import DeviceAttribute
+from filip.models.mqtt import IoTAMQTTMessageType
+from filip.utils import serializer
+
+
+class TestSerializer(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.backend = serializer.json_backend
+        attribute = DeviceAttribute(name="temperature", type="Number")
+        self.data = {
+            "timestamp": datetime(2024, 1, 1, 12, 30),
+            "attribute": attribute,
+            "type": IoTAMQTTMessageType.MULTI,
+            "tags": {"a"},
+            "nested": {"b": [1, 2.5, None, True], "a": "ä"},
+        }
+        self.expected = {
+            "timestamp": "2024-01-01T12:30:00",
+            "attribute": attribute.model_dump(mode="json"),
+            "type": "multi",
+            "tags": ["a"],
+            "nested": {"b": [1, 2.5, None, True], "a": "ä"},
+        }
+
+    def test_backends(self):
+        """
+        Test that all available backends produce the same output
+        """
+        backends = ["json"]
+        if serializer.orjson is not None:
+            backends.append("orjson")
+        outputs = []
+        for backend in backends:
+            serializer.set_json_backend(backend)
+            self.assertEqual(serializer.json_backend, backend)
+            encoded = serializer.dumps(self.data, sort_keys=True)
+            decoded = serializer.loads(encoded)
+            self.assertEqual(decoded, self.expected)
+            self.assertEqual(serializer.loads(serializer.dumpb(self.data)), decoded)
+            outputs.append(encoded)
+        self.assertEqual(len(set(outputs)), 1)
+
+    def test_invalid_backend(self):
+        """
+        Test that unknown backends are rejected
+        """
+        with self.assertRaises(ValueError):
+            serializer.set_json_backend("unknown")
+        with self.assertRaises(ValueError):
+            serializer.loads(b"{invalid")
+
+    def tearDown(self) -> None:
+        serializer.set_json_backend(self.backend)